@@ -0,0 +1,90 @@
+import os
+import resource
+import threading
+from collections import deque
+
+# Memory of conversion that does not depend on document (tables of stages, pdfminer caches) and default memory
+# of single page used until memory of conversions is observed
+FIXED_MEMORY = 16 * 1024 * 1024
+PAGE_MEMORY = 256 * 1024
+
+def get_document_size(pdf_file):
+  """Function that returns number of pages and size in bytes of pdf file, number of pages is None if file cannot be parsed
+
+  Only pdfminer parser is imported, so the function can be used in process that does not convert documents.
+  """
+  from pdfminer.pdfpage import PDFPage
+
+  file_size = os.path.getsize(pdf_file)
+  try:
+    with open(pdf_file, 'rb') as fp:
+      page_count = sum(1 for _ in PDFPage.get_pages(fp))
+  except Exception:
+    page_count = None
+
+  return page_count, file_size
+
+def reset_peak_memory():
+  """Function that resets peak resident memory of current process (Linux only), returns False if it cannot be reset"""
+  try:
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+    return True
+  except OSError:
+    return False
+
+def get_memory():
+  """Function that returns current and peak resident memory of current process in bytes
+
+  Peak memory is read from /proc (it can be reset by reset_peak_memory), on other systems it is peak memory of
+  the whole lifetime of process and current memory is not known (None).
+  """
+  try:
+    with open('/proc/self/status') as f:
+      values = dict(line.split(':', 1) for line in f if line.startswith(('VmRSS', 'VmHWM')))
+    return int(values['VmRSS'].split()[0]) * 1024, int(values['VmHWM'].split()[0]) * 1024
+  except (OSError, KeyError, ValueError):
+    # Maximum resident set size is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+class MemoryEstimator:
+  """Estimator of memory needed by conversion of document from its number of pages and file size
+
+  Memory of conversion is estimated as fixed memory, memory of every page and size of file (it is memory-mapped and its
+  streams are decoded). Memory of page is learned from peak memory of finished conversions - the 90th percentile
+  of recent conversions is used, so estimates stay on the safe side for documents with complex layout.
+
+  Parameters
+  ----------
+  fixed_memory : int
+      Memory of conversion in bytes that does not depend on document
+  page_memory : int
+      Memory of page in bytes used until conversions are observed
+  history : int
+      Number of recent conversions from which memory of page is learned
+  """
+
+  def __init__(self, fixed_memory = FIXED_MEMORY, page_memory = PAGE_MEMORY, history = 100):
+    self.fixed_memory = fixed_memory
+    self.default_page_memory = page_memory
+    self._page_memory = deque(maxlen = history)
+    self._lock = threading.Lock()
+
+  @property
+  def page_memory(self):
+    """Memory of page in bytes used by estimates"""
+    with self._lock:
+      if len(self._page_memory) == 0:
+        return self.default_page_memory
+      observed = sorted(self._page_memory)
+      return observed[int(0.9 * (len(observed) - 1))]
+
+  def estimate(self, page_count, file_size):
+    """Function that returns estimated memory of conversion in bytes (document that cannot be parsed counts as single page)"""
+    return int(self.fixed_memory + self.page_memory * (page_count or 1) + file_size)
+
+  def observe(self, page_count, file_size, memory):
+    """Function that adds memory in bytes needed by finished conversion of document to observations"""
+    with self._lock:
+      self._page_memory.append(max(0, memory - self.fixed_memory - file_size) / (page_count or 1))
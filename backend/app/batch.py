@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .functions import pdf_to_structured_json
+from .search import SearchIndex, index_directory
+
+def convert_file(input_dir, pdf_name, output_dir, converter = None):
+  """Function that converts single pdf file and saves structured JSON to output directory
+
+  Output file is written under temporary name and renamed when it is complete, so after a crash
+  only fully converted files are present in output directory.
+
+  Parameters
+  ----------
+  input_dir : str
+      Directory with pdf file
+  pdf_name : str
+      File name
+  output_dir : str
+      Directory where structured JSON is saved, it is not saved if not given
+  converter : callable
+      Function called with input directory, file name and report (keyword argument), which returns structured JSON
+      and lists converted pages in 'ProcessedPages' of report. pdf_to_structured_json by default
+
+  Returns
+  -------
+  page_count : int
+      Number of converted pages, None if converter does not list them
+  """
+  report = {}
+  list_of_pargraphs = (converter or pdf_to_structured_json)(input_dir, pdf_name, report = report)
+
+  if output_dir is not None:
+    output_file = os.path.join(output_dir, f"{pdf_name.split('.pdf')[0]}.json")
+    with open(f'{output_file}.tmp', 'w') as f:
+      json.dump(list_of_pargraphs, f)
+    os.replace(f'{output_file}.tmp', output_file)
+
+  # Pages are counted during conversion, pdf file is not parsed again
+  return len(report['ProcessedPages']) if 'ProcessedPages' in report else None
+
+def convert_directory(input_dir, output_dir, max_workers = None, overwrite = False, converter = None, pdf_names = None):
+  """Function that converts all pdf files of directory in parallel worker processes
+
+  Files which structured JSON already exists in output directory are skipped, so interrupted
+  conversion can be resumed by running it again.
+
+  Parameters
+  ----------
+  input_dir : str
+      Directory with pdf files
+  output_dir : str
+      Directory where structured JSON files are saved, they are not saved (and no file is skipped) if not given
+  max_workers : int
+      Number of worker processes, by default number of CPUs
+  overwrite : bool
+      If True, files that were already converted are converted again
+  converter : callable
+      Function converting single file (see convert_file), it has to be picklable. pdf_to_structured_json by default
+  pdf_names : list
+      Names of files that are converted, by default all pdf files of input directory
+
+  Returns
+  -------
+  report : dict
+      Numbers of converted, skipped and failed documents, converted pages (None if converter does not count them),
+      throughput and failures per file
+  """
+  if output_dir is not None: os.makedirs(output_dir, exist_ok = True)
+  if pdf_names is None: pdf_names = [name for name in os.listdir(input_dir) if name.lower().endswith('.pdf')]
+  pdf_names = sorted(pdf_names)
+
+  # Skipping files converted in previous runs
+  to_convert = [name for name in pdf_names
+                if overwrite or output_dir is None or not os.path.exists(os.path.join(output_dir, f"{name.split('.pdf')[0]}.json"))]
+
+  start = time.perf_counter()
+  documents, pages, failures = 0, 0, {}
+  with ProcessPoolExecutor(max_workers = max_workers) as executor:
+    futures = {executor.submit(convert_file, input_dir, name, output_dir, converter): name for name in to_convert}
+    for future in as_completed(futures):
+      try:
+        page_count = future.result()
+        documents += 1
+        pages = pages + page_count if pages is not None and page_count is not None else None
+      except Exception as e:
+        failures[futures[future]] = f'{type(e).__name__}: {e}'
+  elapsed = time.perf_counter() - start
+
+  return {'Documents': documents,
+          'Skipped': len(pdf_names) - len(to_convert),
+          'Failed': len(failures),
+          'Pages': pages,
+          'Seconds': round(elapsed, 2),
+          'DocumentsPerSecond': round(documents / elapsed, 3) if elapsed > 0 else None,
+          'PagesPerSecond': round(pages / elapsed, 3) if elapsed > 0 and pages is not None else None,
+          'Failures': failures}
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Convert all pdf files of directory into structured JSON files')
+  parser.add_argument('input_dir', help = 'directory with pdf files')
+  parser.add_argument('output_dir', help = 'directory where structured JSON files are saved')
+  parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes (default number of CPUs)')
+  parser.add_argument('--overwrite', action = 'store_true', help = 'convert again files that already have structured JSON')
+  parser.add_argument('--index', help = 'path to database file of search index updated with new and changed structured JSON files')
+  args = parser.parse_args(args)
+
+  report = convert_directory(args.input_dir, args.output_dir, max_workers = args.workers, overwrite = args.overwrite)
+
+  # Sections of converted files are added to search index, files that did not change since the last run are skipped
+  if args.index:
+    search_index = SearchIndex(args.index)
+    try:
+      report['Search'] = index_directory(search_index, args.output_dir)
+    finally:
+      search_index.close()
+    print(f"Search index: indexed {report['Search']['Indexed']} files, unchanged {report['Search']['Unchanged']}")
+
+  print(f"Converted {report['Documents']} documents ({report['Pages']} pages) in {report['Seconds']} s, "
+        f"skipped {report['Skipped']}, failed {report['Failed']}")
+  print(f"Throughput: {report['DocumentsPerSecond']} documents/s, {report['PagesPerSecond']} pages/s")
+  for pdf_name, error in report['Failures'].items():
+    print(f'Failed {pdf_name}: {error}')
+
+  return report
+
+if __name__ == '__main__':
+  sys.exit(1 if main()['Failed'] else 0)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+class ResultCache:
+  """Disk cache of converted documents keyed by hash of uploaded pdf bytes and pipeline version
+
+  Results are stored as json files in cache directory. When total size of files exceeds size budget,
+  least recently used results are removed.
+
+  Parameters
+  ----------
+  directory : str
+      Directory where results are stored
+  max_bytes : int
+      Size budget of cache directory in bytes
+  version : str
+      Version of pipeline, results of other versions are never returned
+  """
+
+  def __init__(self, directory, max_bytes, version):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.version = version
+    self.hits, self.misses = 0, 0
+    self._lock = threading.Lock()
+
+    # Index of cached results (key -> file size) ordered from least to most recently used
+    os.makedirs(directory, exist_ok = True)
+    files = [entry for entry in os.scandir(directory) if entry.name.endswith('.json')]
+    files.sort(key = lambda entry: entry.stat().st_mtime)
+    self._index = OrderedDict((entry.name[:-len('.json')], entry.stat().st_size) for entry in files)
+    self._size = sum(self._index.values())
+
+  def key(self, data):
+    """Function that calculates cache key of pdf file content"""
+    hasher = self.hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+  def hasher(self):
+    """Function that returns hash object which gives cache key of pdf file content updated with its chunks (hexdigest is the key)"""
+    return hashlib.sha256(self.version.encode() + b'\0')
+
+  def _path(self, key):
+    return os.path.join(self.directory, f'{key}.json')
+
+  def get(self, data, pdf_name):
+    """Function that returns cached sections of pdf file or None if file was not converted before
+
+    Parameters
+    ----------
+    data : bytes
+        Content of pdf file
+    pdf_name : str
+        Name of document, set as 'FileName' of returned sections
+
+    Returns
+    -------
+    list_of_pargraphs : list
+        List of dictionaries with structured text or None
+    """
+    return self.get_by_key(self.key(data), pdf_name)
+
+  def get_by_key(self, key, pdf_name):
+    """Function that returns cached sections of pdf file with given cache key (see get)"""
+    with self._lock:
+      if key not in self._index:
+        self.misses += 1
+        return None
+      self._index.move_to_end(key)
+
+    try:
+      with open(self._path(key)) as f:
+        list_of_pargraphs = json.load(f)
+      # Modification time keeps recency of use between restarts
+      os.utime(self._path(key))
+    except (OSError, ValueError):
+      # File removed or damaged outside of cache - it is treated as miss
+      with self._lock:
+        self._size -= self._index.pop(key, 0)
+        self.misses += 1
+      return None
+
+    with self._lock:
+      self.hits += 1
+
+    # The same content can be uploaded under different file names
+    for paragraph in list_of_pargraphs:
+      paragraph['FileName'] = pdf_name
+
+    return list_of_pargraphs
+
+  def put(self, data, list_of_pargraphs):
+    """Function that saves sections of pdf file in cache and evicts least recently used results over size budget
+
+    Parameters
+    ----------
+    data : bytes
+        Content of pdf file
+    list_of_pargraphs : list
+        List of dictionaries with structured text
+    """
+    self.put_by_key(self.key(data), list_of_pargraphs)
+
+  def put_by_key(self, key, list_of_pargraphs):
+    """Function that saves sections of pdf file with given cache key (see put), sections can be generated one by one"""
+    path = self._path(key)
+
+    # Writing to temporary file first, so readers never see partially written result. Sections are written one by one
+    # in the same format as json.dump of their list
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+      f.write('[')
+      for position, paragraph in enumerate(list_of_pargraphs):
+        if position > 0: f.write(', ')
+        json.dump(paragraph, f)
+      f.write(']')
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+
+    with self._lock:
+      self._size += size - self._index.pop(key, 0)
+      self._index[key] = size
+
+      # Removing least recently used results, the newest result is always kept
+      while self._size > self.max_bytes and len(self._index) > 1:
+        old_key, old_size = self._index.popitem(last = False)
+        self._size -= old_size
+        try:
+          os.remove(self._path(old_key))
+        except OSError:
+          pass
+
+  def stats(self):
+    """Function that returns cache counters"""
+    with self._lock:
+      return {'Hits': self.hits, 'Misses': self.misses, 'Entries': len(self._index), 'Bytes': self._size}
+
+class PageCache:
+  """Disk cache of line details of single pdf pages keyed by hash of page content and pipeline version
+
+  Cache keeps no state in memory, so it can be shared by worker processes. Size budget is enforced
+  by evict, which removes least recently used pages.
+
+  Parameters
+  ----------
+  directory : str
+      Directory where line details are stored
+  max_bytes : int
+      Size budget of cache directory in bytes
+  version : str
+      Version of pipeline, pages extracted by other versions are never returned
+  """
+
+  def __init__(self, directory, max_bytes, version):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.version = version
+    os.makedirs(directory, exist_ok = True)
+
+  def _path(self, page_hash):
+    key = hashlib.sha256(f'{self.version}\0{page_hash}'.encode()).hexdigest()
+    return os.path.join(self.directory, f'{key}.json')
+
+  def get(self, page_hash):
+    """Function that returns columns of line details of page or None if page was not extracted before"""
+    path = self._path(page_hash)
+    try:
+      with open(path) as f:
+        columns = json.load(f)
+      os.utime(path)
+    except (OSError, ValueError):
+      return None
+    return columns
+
+  def put(self, page_hash, columns):
+    """Function that saves columns of line details of page"""
+    path = self._path(page_hash)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+      json.dump(columns, f)
+    os.replace(tmp_path, path)
+
+  def evict(self):
+    """Function that removes least recently used pages while cache directory is over size budget"""
+    files = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+    stats = {entry.path: entry.stat() for entry in files}
+    size = sum(stat.st_size for stat in stats.values())
+    for path in sorted(stats, key = lambda path: stats[path].st_mtime):
+      if size <= self.max_bytes:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      size -= stats[path].st_size
@@ -1,45 +1,167 @@
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTImage, LTFigure
+import argparse
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from PIL import Image
-
-def extract_images_from_pdf(pdf_path):
-    images = []
-
-    # Extract pages from the PDF
-    for page_layout in extract_pages(pdf_path):
-        # Iterate through the layout objects on the page
-        for element in page_layout:
-            if isinstance(element, LTFigure):
-                # If the element is a figure, iterate through its elements
-                for figure_element in element:
-                    if isinstance(figure_element, LTImage):
-                        try:
-                            # If the element is an image, extract it
-                            image_data = figure_element.stream.get_rawdata()
-                            image_stream = BytesIO(image_data)
-                            image = Image.open(image_stream)
-
-                            # Convert the image to RGB mode
-                            if image.mode == 'CMYK':
-                                image = image.convert('RGB')
-
-                            # Invert the image if necessary
-                            #image = Image.eval(image, lambda x: 255 - x)
-
-                            images.append(image)
-                        except Exception as e:
-                            print(f"Error processing image: {e}")
-
-    return images
-
-# Example usage:
-#pdf_name = 'Insurance_Handbook.pdf'
-pdf_name = 'Factsheet Leben Risiko.pdf'
-extracted_images = extract_images_from_pdf('data/input/' + pdf_name)
-
-# Save the extracted images to files
-for i, image in enumerate(extracted_images):
-    # Save the image as PNG after converting to RGB mode and inverting
+
+from pdfminer.layout import LTImage, LTFigure
+from pdfminer.pdfcolor import PREDEFINED_COLORSPACE
+from pdfminer.pdftypes import PDFStream, LITERALS_DCT_DECODE, LITERALS_JPX_DECODE, resolve1
+from pdfminer.psparser import LIT
+
+from .fonts import extract_layout_pages
+
+LITERAL_ICC_BASED = LIT('ICCBased')
+
+def get_layout_images(layout):
+  """Function that yields streams of images of layout element, figures are searched recursively"""
+  for element in layout:
+    if isinstance(element, LTImage):
+      yield element.stream
+    elif isinstance(element, LTFigure):
+      yield from get_layout_images(element)
+
+def _get_color_components(colorspace):
+  """Function that returns number of color components of image color space or None if color space is not supported"""
+  colorspace = resolve1(colorspace)
+  if isinstance(colorspace, list) and len(colorspace) > 1 and resolve1(colorspace[0]) is LITERAL_ICC_BASED:
+    return resolve1(resolve1(colorspace[1]).get('N'))
+  if isinstance(colorspace, list) and len(colorspace) == 1:
+    colorspace = resolve1(colorspace[0])
+  predefined = PREDEFINED_COLORSPACE.get(getattr(colorspace, 'name', None))
+  return predefined.ncomponents if predefined is not None else None
+
+def _encode_png(stream, width, height, bits, components, path):
+  """Function that decodes image stream and saves it as PNG file, it is run in thread pool"""
+  from PIL import Image
+
+  data = stream.get_data()
+  filters = [f for f, _ in stream.get_filters()]
+
+  # JPEG and JPEG 2000 streams are not decoded by pdfminer
+  if filters and (filters[-1] in LITERALS_DCT_DECODE or filters[-1] in LITERALS_JPX_DECODE):
+    image = Image.open(BytesIO(data))
+  else:
+    modes = {(1, 1): '1', (1, 8): 'L', (3, 8): 'RGB', (4, 8): 'CMYK'}
+    if (components, bits) not in modes:
+      raise ValueError(f'Unsupported image with {components} color components and {bits} bits per component')
+    image = Image.frombytes(modes[(components, bits)], (width, height), data)
+
+  # Converting the image to RGB mode
+  if image.mode not in ('1', 'L', 'RGB', 'RGBA'):
     image = image.convert('RGB')
-    image.save(f'./data/images/{pdf_name.split('.pdf')[0]}_output_image_{i + 1}.png')
\ No newline at end of file
+
+  # Writing to temporary file first, so readers never see partially written image
+  tmp_path = f'{path}.{threading.get_ident()}.tmp'
+  image.save(tmp_path, format = 'PNG')
+  os.replace(tmp_path, path)
+
+class ImageExtractor:
+  """Collector of images found on pdf pages during extraction
+
+  Images are identified by hash of their stream, so image repeated on many pages (e.g. logo) is stored once.
+  They are encoded as PNG files named '<image id>.png' in thread pool while pages are extracted, images which
+  file already exists (e.g. from other document) are not encoded again.
+
+  Parameters
+  ----------
+  directory : str
+      Directory where PNG files are saved
+  max_workers : int
+      Number of threads encoding images
+  """
+
+  def __init__(self, directory, max_workers = None):
+    self.directory = directory
+    os.makedirs(directory, exist_ok = True)
+    self._executor = ThreadPoolExecutor(max_workers = max_workers)
+    self._images, self._futures = {}, {}
+
+  def path(self, image_id):
+    """Function that returns path to PNG file of image"""
+    return os.path.join(self.directory, f'{image_id}.png')
+
+  def add(self, stream, page_number):
+    """Function that adds image stream found on page, image is encoded in thread pool if it was not seen before
+
+    Parameters
+    ----------
+    stream : pdfminer.pdftypes.PDFStream
+        Stream of image
+    page_number : int
+        Operational page number of page with image
+    """
+    # Stream details are read here, because resolving references reads pdf file, which is not thread-safe
+    if stream.rawdata is not None and stream.decipher is None:
+      filters = stream.get_filters()
+      data = stream.rawdata
+      detached_stream = PDFStream({'Filter': [f for f, _ in filters], 'DecodeParms': [params for _, params in filters]}, data)
+    else:
+      data = stream.get_data()
+      detached_stream = PDFStream({}, data)
+
+    image_id = hashlib.sha256(data).hexdigest()
+    image = self._images.get(image_id)
+
+    if image is None:
+      width, height = resolve1(stream.get_any(('W', 'Width'))), resolve1(stream.get_any(('H', 'Height')))
+      image = self._images[image_id] = {'ImageId': image_id, 'Width': width, 'Height': height, 'Pages': []}
+      if not os.path.exists(self.path(image_id)):
+        bits = resolve1(stream.get_any(('BPC', 'BitsPerComponent'), 8))
+        components = _get_color_components(stream.get_any(('CS', 'ColorSpace')))
+        self._futures[image_id] = self._executor.submit(_encode_png, detached_stream, width, height, bits, components,
+                                                        self.path(image_id))
+
+    if page_number not in image['Pages']:
+      image['Pages'].append(page_number)
+
+  def close(self):
+    """Function that waits until all images are encoded
+
+    Returns
+    -------
+    images : list
+        List of dictionaries with id, size and page numbers of every image, images that could not be encoded are left out
+    """
+    self._executor.shutdown(wait = True)
+    failed = {image_id for image_id, future in self._futures.items() if future.exception() is not None}
+    return [image for image_id, image in self._images.items() if image_id not in failed]
+
+def extract_images_from_pdf(pdf_file, directory, max_workers = None):
+  """Function that extracts images of pdf file to PNG files without collecting text
+
+  Parameters
+  ----------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content
+  directory : str
+      Directory where PNG files are saved
+  max_workers : int
+      Number of threads encoding images
+
+  Returns
+  -------
+  images : list
+      List of dictionaries with id, size and page numbers of every image (see ImageExtractor.close)
+  """
+  images = ImageExtractor(directory, max_workers = max_workers)
+  for page_number, page_layout in enumerate(extract_layout_pages(pdf_file), 1):
+    for stream in get_layout_images(page_layout):
+      images.add(stream, page_number)
+  return images.close()
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Extract images of pdf file to PNG files')
+  parser.add_argument('pdf_file', help = 'path to pdf file')
+  parser.add_argument('--output', default = 'data/images/extracted', help = 'directory where PNG files are saved (default data/images/extracted)')
+  args = parser.parse_args(args)
+
+  images = extract_images_from_pdf(args.pdf_file, args.output)
+  for image in images:
+    print(f"{os.path.join(args.output, image['ImageId'])}.png: {image['Width']}x{image['Height']}, pages {image['Pages']}")
+
+  return images
+
+if __name__ == '__main__':
+  main()
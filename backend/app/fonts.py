@@ -0,0 +1,193 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.utils import open_filename
+
+# Default number of fonts kept in font cache of process
+FONT_CACHE_MAX_FONTS = 512
+
+class FontCache:
+  """In-memory cache of parsed pdfminer fonts shared by all documents converted in process
+
+  Fonts are keyed by digest of their font dictionary together with everything it references (descriptor, widths,
+  embedded font program, ToUnicode CMap), so the same font embedded in many documents is parsed only once.
+  When the cache holds more than max_fonts fonts, least recently used fonts are removed.
+
+  Predefined CMaps of CJK fonts are already cached by pdfminer for the whole process (CMapDB), so only fonts are kept here.
+
+  Parameters
+  ----------
+  max_fonts : int
+      Maximum number of cached fonts, fonts are not cached if it is 0
+  """
+
+  def __init__(self, max_fonts = FONT_CACHE_MAX_FONTS):
+    self.max_fonts = max_fonts
+    self.hits, self.misses, self.evictions = 0, 0, 0
+    self._fonts = OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._fonts)
+
+  def get(self, key):
+    """Function that returns cached font or None if font was not parsed before"""
+    with self._lock:
+      font = self._fonts.get(key)
+      if font is None:
+        self.misses += 1
+        return None
+      self.hits += 1
+      self._fonts.move_to_end(key)
+      return font
+
+  def put(self, key, font):
+    """Function that adds parsed font to cache, references of font to its document are removed"""
+    if self.max_fonts <= 0:
+      return
+    _detach_font(font)
+    with self._lock:
+      self._fonts[key] = font
+      self._fonts.move_to_end(key)
+      while len(self._fonts) > self.max_fonts:
+        self._fonts.popitem(last = False)
+        self.evictions += 1
+
+  def clear(self):
+    with self._lock:
+      self._fonts.clear()
+
+  def stats(self):
+    """Function that returns cache counters and hit rate (None before the first lookup)"""
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {'Hits': self.hits, 'Misses': self.misses, 'Evictions': self.evictions, 'Fonts': len(self._fonts),
+              'MaxFonts': self.max_fonts, 'HitRate': round(self.hits / lookups, 4) if lookups > 0 else None}
+
+def _detach_font(font):
+  """Function that removes references of parsed font to objects of its document (descriptor, font program)
+
+  They are used only when font is parsed, but they would keep the whole document in memory as long as font is cached.
+  """
+  for name, value in list(vars(font).items()):
+    if isinstance(value, (PDFObjRef, PDFStream)):
+      setattr(font, name, None)
+    elif isinstance(value, dict) and any(isinstance(item, (PDFObjRef, PDFStream)) for item in value.values()):
+      setattr(font, name, {key: item for key, item in value.items() if not isinstance(item, (PDFObjRef, PDFStream))})
+
+def hash_pdf_object(obj, memo):
+  """Function that calculates digest of pdf object together with all objects it references (digests of references are kept in memo)"""
+  if isinstance(obj, PDFObjRef):
+    if obj.objid not in memo:
+      # Placeholder protects against reference cycles
+      memo[obj.objid] = b'R%d' % obj.objid
+      memo[obj.objid] = hash_pdf_object(obj.resolve(), memo)
+    return memo[obj.objid]
+
+  digest = hashlib.sha256()
+  if isinstance(obj, PDFStream):
+    digest.update(b'stream')
+    digest.update(hash_pdf_object(obj.attrs, memo))
+    digest.update(obj.rawdata if obj.rawdata is not None else obj.data)
+  elif isinstance(obj, dict):
+    digest.update(b'dict')
+    for key in sorted(obj, key = str):
+      digest.update(str(key).encode())
+      digest.update(hash_pdf_object(obj[key], memo))
+  elif isinstance(obj, (list, tuple)):
+    digest.update(b'list')
+    # Arrays of numbers and names (e.g. widths of glyphs) are hashed at once instead of item by item
+    if not any(isinstance(item, (PDFObjRef, PDFStream, dict, list, tuple)) for item in obj):
+      digest.update(repr(list(obj)).encode())
+    else:
+      for item in obj:
+        digest.update(hash_pdf_object(item, memo))
+  else:
+    digest.update(repr(obj).encode())
+
+  return digest.digest()
+
+_font_cache = None
+_font_cache_lock = threading.Lock()
+
+def get_font_cache():
+  """Function that returns font cache of current process, it is created with FONT_CACHE_MAX_FONTS from environment"""
+  global _font_cache
+  with _font_cache_lock:
+    if _font_cache is None:
+      _font_cache = FontCache(int(os.environ.get('FONT_CACHE_MAX_FONTS', FONT_CACHE_MAX_FONTS)))
+    return _font_cache
+
+def set_font_cache(font_cache):
+  """Function that replaces font cache of current process (e.g. with cache of other size), returns previous font cache"""
+  global _font_cache
+  with _font_cache_lock:
+    previous, _font_cache = _font_cache, font_cache
+  return previous
+
+class SharedFontResourceManager(PDFResourceManager):
+  """Resource manager of single document which takes fonts from font cache shared by documents
+
+  Fonts are looked up by object id in document first (the same as pdfminer resource manager does), font which is used
+  for the first time in document is looked up by digest of its content in font cache and parsed only if it is not there.
+
+  Parameters
+  ----------
+  font_cache : FontCache
+      Shared font cache, font cache of current process by default
+  """
+
+  def __init__(self, font_cache = None):
+    super().__init__(caching = True)
+    self.font_cache = font_cache if font_cache is not None else get_font_cache()
+    # Digests of objects of document by object id, objects shared by fonts (e.g. encodings) are hashed once
+    self._memo = {}
+
+  def get_font(self, objid, spec):
+    if objid and objid in self._cached_fonts:
+      return self._cached_fonts[objid]
+    if self.font_cache.max_fonts <= 0:
+      return super().get_font(objid, spec)
+
+    key = hash_pdf_object(spec, self._memo)
+    font = self.font_cache.get(key)
+    if font is None:
+      font = super().get_font(None, spec)
+      self.font_cache.put(key, font)
+    if objid: self._cached_fonts[objid] = font
+    return font
+
+def extract_layout_pages(pdf_file, page_numbers = None, laparams = None, resource_manager = None):
+  """Function that yields layout of pages of pdf file (the same as pdfminer's extract_pages), fonts are taken from font cache
+
+  Parameters
+  ----------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content
+  page_numbers : list
+      Zero-indexed numbers of pages to extract, all pages are extracted if not given
+  laparams : pdfminer.layout.LAParams
+      Parameters of layout analysis, default parameters if not given
+  resource_manager : pdfminer.pdfinterp.PDFResourceManager
+      Resource manager of document, SharedFontResourceManager with font cache of current process by default
+
+  Yields
+  ------
+  layout : pdfminer.layout.LTPage
+      Layout of page
+  """
+  resource_manager = resource_manager if resource_manager is not None else SharedFontResourceManager()
+  device = PDFPageAggregator(resource_manager, laparams = laparams or LAParams())
+  interpreter = PDFPageInterpreter(resource_manager, device)
+
+  with open_filename(pdf_file, 'rb') as fp:
+    for page in PDFPage.get_pages(fp, page_numbers, caching = True):
+      interpreter.process_page(page)
+      yield device.get_result()
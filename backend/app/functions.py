@@ -1,27 +1,115 @@
 import pandas as pd
 import numpy as np
-from pdfminer.layout import LTTextContainer, LTChar, LTTextLine
-from pdfminer.high_level import extract_pages
+import hashlib
+import io
+import math
+import mmap
+import os
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from itertools import count, islice, repeat
+from pdfminer.layout import LTTextContainer, LTChar, LTTextLine, LAParams
+from pdfminer.pdfdevice import PDFTextDevice
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.utils import apply_matrix_pt, open_filename
+from pdfminer.pdfpage import PDFPage
+
+from .profiling import profile_stage
+from .version import PIPELINE_VERSION
+from .styles import StyleTable, STYLE_COLUMNS, STYLE_ID_DTYPE
+from .extracting_images import get_layout_images
+from .fonts import SharedFontResourceManager, extract_layout_pages, get_font_cache, hash_pdf_object
+
+# Pdf files on disk at least this big are memory-mapped when they are extracted in current process
+MMAP_MIN_BYTES = 16 * 1024 * 1024
+
+# Letters and numbers from ascii code - important for char details determination
+IMPORTANT_CHARACTERS = frozenset(list(range(48, 57+1))+list(range(65, 90+1))+list(range(97, 122+1)))
+
+def collect_line_characters(characters, columns, styles):
+  """Function that walks once over chars of a text line and appends runs of adjacent chars with the same font style to flat column buffers
+
+  Chars that are not letters or numbers inherit the style of the previous char in line (forward fill).
+  Chars that are placed before the first styled char of the line are skipped.
 
-def get_lines_details(page):
+  Parameters
+  ----------
+  characters : iterable
+      Chars of line as tuples (text, font name, font size, non-stroking color), font details are None for chars added by layout analysis
+  columns : dict
+      Column buffers (keys 'ElementText', 'StyleId') that are extended in place
+  styles : styles.StyleTable
+      Style table of document, style of every run is interned in it
+  """
+
+  # Style and text of run that is currently collected
+  run_style, run_text = None, []
+
+  # Iterating over every char in line container
+  for text, fontname, size, ncolor in characters:
+
+    style = run_style
+    if fontname is not None:
+
+      # Verifying if char has good length
+      ## Warning! Some letters from other languages can have different length - that cases can be ignored
+      if len(text) == 1:
+        # Verifying if char is among important characters
+        ## Warning! Some chars as bullets can negatively affect line details determination
+        if ord(text) in IMPORTANT_CHARACTERS:
+          style = (fontname, round(size,2), str(ncolor))
+
+    # Chars without any style before them do not belong to any run
+    if style is None:
+      continue
+
+    # If char has different style than current run, the run is closed
+    if style != run_style:
+      _append_run(columns, styles, run_style, run_text)
+      run_style, run_text = style, []
+
+    run_text.append(text)
+
+  _append_run(columns, styles, run_style, run_text)
+
+def _get_line_characters(text_line):
+  """Function that returns details of chars of pdfminer text line"""
+  for character in text_line:
+    if isinstance(character, LTChar):
+      yield character._text, character.fontname, character.size, character.graphicstate.ncolor
+    else:
+      yield character.get_text(), None, None, None
+
+def _append_run(columns, styles, style, text):
+  """Function that appends cleaned run of characters and id of its style to column buffers"""
+  if style is None:
+    return
+
+  text = ''.join(text).rstrip()
+  columns['ElementText'].append(repr(text)[1:-1].replace('\\x','').replace('\\t','').replace('\\n',''))
+  columns['StyleId'].append(styles.intern(style))
+
+def get_lines_details(page, styles):
   """Function that iterate over each char in each line of each text element on page to establish font style of every line 
   
   Parameters
   ----------
   page : pdfminer.layout.LTPage
       Page with text elements
+  styles : styles.StyleTable
+      Style table of document, styles of lines are interned in it
 
   Returns
   -------
   line_details : dataframe
-      Table with line details (columns 'FontName', 'FontSize', 'FontSColor')
+      Table with line details (columns 'ElementText', 'StyleId')
   """
 
-  # Letters and numbers from ascii code - important for char details determination
-  important_characters = (list(range(48, 57+1))+list(range(65, 90+1))+list(range(97, 122+1)))
-
-  # Table for line's details 
-  lines_details = pd.DataFrame()
+  # Column buffers for line's details - table is built once per page
+  columns = {'ElementText': [], 'StyleId': []}
 
   # Iterating over text containers in page
   for element in page:
@@ -34,274 +122,524 @@ def get_lines_details(page):
           # Iterating over every line in text container
           for text_line in element:
             if isinstance(text_line, LTTextLine):
+              collect_line_characters(_get_line_characters(text_line), columns, styles)
 
-              # Table for character's details
-              char_details = pd.DataFrame()
-
-              # Iterating over every char in line container
-              for character in text_line:
-
-                new_row = {'Char' : [character], 
-                           'FontName': [np.nan],
-                           'FontSize' : [np.nan],
-                           'FontSColor' : [np.nan]}
-                
-                if isinstance(character, LTChar):
-                  
-                  # Verifying if char has good length 
-                  ## Warning! Some letters from other languages can have different length - that cases can be ignored
-                  if len(character._text) == 1:
-                    # Verifying if char is among important characters
-                    ## Warning! Some chars as bullets can negatively affect line details determination
-                    if ord(character._text) in important_characters:
-
-                      # Appending character details of char to table
-                      new_row['FontName'] = character.fontname
-                      new_row['FontSize'] = round(character.size,2)
-                      new_row['FontSColor'] = str(character.graphicstate.ncolor)
-                      
-                char_details = pd.concat([char_details, pd.DataFrame(new_row)], ignore_index = True)
-                
-
-              # Making sure that any details were returned
-              if char_details.shape[0] > 0:
-
-                # Grouping characters
-                line_details = group_characters_into_lines(char_details)
-                line_details = line_details[~line_details['FontName'].isna()].reset_index().drop(columns='index')
-                line_details['ElementText'] = line_details['ElementText'].str.rstrip()
-                line_details['ElementText'] = [repr(x)[1:-1].replace('\\x','').replace('\\t','').replace('\\n','') for x in line_details['ElementText'] ]
-
-                # Appending line details to table
-                lines_details = pd.concat([lines_details, line_details], ignore_index=True)
+  return _columns_to_table(columns)
+
+def _columns_to_table(columns):
+  """Function that builds table with line details from column buffers"""
+  lines_details = pd.DataFrame({'ElementText': columns['ElementText'],
+                                'StyleId': np.array(columns['StyleId'], dtype = STYLE_ID_DTYPE)})
 
   return lines_details
 
-def group_characters_into_lines(char_details):
-  """Function that merge characters into lines if adjacent characters of text have the same style
+class CharacterDevice(PDFTextDevice):
+  """Lightweight pdfminer device that collects only chars needed by pipeline, grouped into lines, without layout analysis
+
+  Adjacent chars are grouped into lines and spaces are inserted between distant chars with the same rules as
+  pdfminer's layout analysis uses for text lines (default LAParams), but lines are kept in content stream order
+  instead of being grouped into text boxes. Chars placed inside figures are skipped, the same as in layout analysis.
+  Image streams are passed to image collector, if it is given.
+
+  Parameters
+  ----------
+  rsrcmgr : pdfminer.pdfinterp.PDFResourceManager
+      Resource manager with fonts
+  laparams : pdfminer.layout.LAParams
+      Parameters used to group chars into lines
+  images : extracting_images.ImageExtractor
+      Collector of images, images of page are added with its number 'page_number'
+  """
+
+  def __init__(self, rsrcmgr, laparams = None, images = None):
+    super().__init__(rsrcmgr)
+    self.laparams = laparams or LAParams()
+    self.images = images
+    self.page_number = None
+    self.lines = []
+    self._figure_depth = 0
+    self._previous = None
+
+  def begin_page(self, page, ctm):
+    self.lines, self._figure_depth, self._previous = [], 0, None
+
+  def begin_figure(self, name, bbox, matrix):
+    self._figure_depth += 1
+
+  def end_figure(self, name):
+    self._figure_depth -= 1
+
+  def render_image(self, name, stream):
+    if self.images is not None:
+      self.images.add(stream, self.page_number)
+
+  def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+    try:
+      text = font.to_unichr(cid)
+    except PDFUnicodeNotDefined:
+      text = self.handle_undefined_char(font, cid)
+    adv = font.char_width(cid) * fontsize * scaling
+    if self._figure_depth > 0:
+      return adv
+
+    # Boundary rectangle of char calculated the same way as in pdfminer.layout.LTChar
+    if font.is_vertical():
+      (vx, vy) = font.char_disp(cid)
+      vx = fontsize * 0.5 if vx is None else vx * fontsize * 0.001
+      vy = (1000 - vy) * fontsize * 0.001
+      (x0, y0) = apply_matrix_pt(matrix, (-vx, vy + rise + adv))
+      (x1, y1) = apply_matrix_pt(matrix, (-vx + fontsize, vy + rise))
+      if x1 < x0: (x0, x1) = (x1, x0)
+      if y1 < y0: (y0, y1) = (y1, y0)
+      size = x1 - x0
+    else:
+      (a, b, c, d, e, f) = matrix
+      bottom = font.get_descent() * fontsize + rise
+      top = bottom + fontsize
+      (x0, y0) = (c * bottom + e, d * bottom + f)
+      (x1, y1) = (a * adv + c * top + e, b * adv + d * top + f)
+      if x1 < x0: (x0, x1) = (x1, x0)
+      if y1 < y0: (y0, y1) = (y1, y0)
+      size = y1 - y0
+    width, height = x1 - x0, y1 - y0
+
+    # Char continues current line if it is horizontally aligned with previous char
+    previous = self._previous
+    if previous is not None:
+      (px0, py0, px1, py1) = previous
+      voverlap = min(abs(py0 - y1), abs(py1 - y0)) if (y0 <= py1 and py0 <= y1) else 0
+      hdistance = 0 if (x0 <= px1 and px0 <= x1) else min(abs(px0 - x1), abs(px1 - x0))
+      halign = ((y0 <= py1 and py0 <= y1)
+                and min(py1 - py0, height) * self.laparams.line_overlap < voverlap
+                and hdistance < max(px1 - px0, width) * self.laparams.char_margin)
+    if previous is None or not halign:
+      self.lines.append([])
+    # Space is inserted between chars that are far from each other
+    elif px1 < x0 - self.laparams.word_margin * max(width, height):
+      self.lines[-1].append((' ', None, None, None))
+
+    self.lines[-1].append((text, font.fontname, size, graphicstate.ncolor))
+    self._previous = (x0, y0, x1, y1)
+
+    return adv
+
+def extract_fast_lines_from_pages(pdf_file, page_numbers = None, images = None):
+  """Function that extracts chars of pages grouped into lines without pdfminer layout analysis
+  
+  Parameters
+  ----------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content
+  page_numbers : list
+      Zero-indexed numbers of pages to extract, all pages are extracted if not given
+  images : extracting_images.ImageExtractor
+      Collector to which images of extracted pages are added
+
+  Returns
+  -------
+  pages : generator
+      Generator of lists of lines of every page, line is list of chars (text, font name, font size, non-stroking color)
+  """
+  if page_numbers is not None: page_numbers = set(page_numbers)
+
+  rsrcmgr = SharedFontResourceManager()
+  device = CharacterDevice(rsrcmgr, images = images)
+  interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+  with open_filename(pdf_file, 'rb') as fp:
+    for page_number, page in enumerate(PDFPage.get_pages(fp, caching = True)):
+      if page_numbers is None or page_number in page_numbers:
+        device.page_number = page_number + 1
+        interpreter.process_page(page)
+        yield device.lines
+
+def get_fast_lines_details(lines, styles):
+  """Function that establish font style of every line of chars collected without layout analysis
   
   Parameters
   ----------
-  char_details : dataframe
-      Table with character details (columns 'FontName', 'FontSize', 'FontSColor')
+  lines : list
+      List of lines, line is list of chars (text, font name, font size, non-stroking color)
+  styles : styles.StyleTable
+      Style table of document, styles of lines are interned in it
 
   Returns
   -------
   line_details : dataframe
-      Table with line details (columns 'FontName', 'FontSize', 'FontSColor')
-  """
-  # Converting chars to text
-  char_details['ElementText'] = [x.get_text() for x in char_details['Char']]
-  char_details = char_details[['ElementText', 'FontName', 'FontSize', 'FontSColor']].copy()
-  # Forward fill for chars that do not have font details
-  for col in ['FontName','FontSize', 'FontSColor']:
-    char_details[col] = char_details[col].ffill()
-
-  # We start section grouping from the first element
-  line_details = char_details.loc[[0]].copy()
-
-  for i in range(1, char_details.shape[0]):
-    if ((char_details.loc[i,'FontName'] == char_details.loc[i-1,'FontName']) &
-        (char_details.loc[i,'FontSize'] == char_details.loc[i-1,'FontSize']) &
-        (char_details.loc[i,'FontSColor'] == char_details.loc[i-1,'FontSColor'])):
-      # If row has the same parameters as previous row, we append text to previous row's text
-      line_details.iloc[-1, 0] = line_details.iloc[-1, 0] + char_details.loc[i, 'ElementText']
-    else:
-      # If row has different parameters than previous row we just rewrite it
-      line_details = pd.concat([line_details, char_details.loc[[i]]], ignore_index = True)
+      Table with line details (columns 'ElementText', 'StyleId')
+  """
+  columns = {'ElementText': [], 'StyleId': []}
+  for line in lines:
+    # Line ends with new line char, as in text lines of layout analysis
+    collect_line_characters(line + [('\n', None, None, None)], columns, styles)
 
-  return line_details
+  return _columns_to_table(columns)
+
+def get_run_starts(table, columns):
+  """Function that finds rows starting a new run - rows that differ from previous row in any of given columns
+  
+  Parameters
+  ----------
+  table : dataframe
+      Table with elements
+  columns : list
+      Columns compared between adjacent rows
+
+  Returns
+  -------
+  run_starts : numpy.ndarray
+      Boolean mask with True for every row that starts a new run
+  """
+  values = table[columns]
+  # Missing values never match previous row, the same as in element by element comparison
+  return values.ne(values.shift()).any(axis=1).to_numpy()
+
+def group_style_runs(table, run_starts, separator = ' ', merged_columns = ()):
+  """Function that merge runs of adjacent rows into single rows. Text of every run is joined once, other columns are taken from the first row of run
+  
+  Parameters
+  ----------
+  table : dataframe
+      Table with elements (column 'ElementText')
+  run_starts : numpy.ndarray
+      Boolean mask with True for every row that starts a new run
+  separator : str
+      Separator placed between texts of merged rows
+  merged_columns : list
+      Columns which distinct values of merged rows are listed (separated by ', ') in grouped row
+
+  Returns
+  -------
+  grouped : dataframe
+      Table with one row per run
+  """
+  table = table.reset_index(drop = True)
+  if table.shape[0] == 0:
+    return table.copy()
+
+  # The first row always starts a run
+  run_starts = np.asarray(run_starts, dtype = bool).copy()
+  run_starts[0] = True
+  run_ids = np.cumsum(run_starts) - 1
+
+  # Taking details of the first row of every run and joining texts of whole run
+  grouped = table.loc[run_starts].reset_index(drop = True)
+  grouped['ElementText'] = table['ElementText'].groupby(run_ids, sort = False).agg(separator.join).values
+
+  # Listing details of merged rows if they are not already part of run's details
+  for col in merged_columns:
+    merged = list(grouped[col])
+    changed = False
+    for value, run_id, run_start in zip(table[col], run_ids, run_starts):
+      if not run_start and str(value) not in str(merged[run_id]):
+        merged[run_id] = str(merged[run_id]) + ', ' + str(value)
+        changed = True
+    if changed:
+      grouped[col] = pd.Series(merged, dtype = object)
+
+  return grouped
 
 def group_lines_into_page(all_pages):
   """Function that merge lines into elements if adjacent lines of text have the same style
   
   Parameters
   ----------
-  line_details : dataframe
-      Table with line details (columns 'FontName', 'FontSize', 'FontSColor')
+  all_pages : list
+      List of tables with line details (columns 'ElementText', 'StyleId')
 
   Returns
   -------
-  page_details : dataframe
-      Table with page details (columns 'FontName', 'FontSize', 'FontSColor')
+  all_pages_modified : list
+      List of tables with page details (columns 'ElementText', 'StyleId')
   """
   all_pages_modified = []
 
   # Iterating over pages
   for line_details in all_pages:
 
-    # We start section grouping from the first element
-    page_details = line_details.loc[[0]].copy()
-
-    for i in range(1, line_details.shape[0]):
-      if ((line_details.loc[i,'FontName'] == line_details.loc[i-1,'FontName']) &
-          (line_details.loc[i,'FontSize'] == line_details.loc[i-1,'FontSize']) &
-          (line_details.loc[i,'FontSColor'] == line_details.loc[i-1,'FontSColor'])):
-        # If row has the same parameters as previous row, we append text to previous row's text
-        page_details.iloc[-1, 0] = page_details.iloc[-1, 0] + ' ' + line_details.loc[i,'ElementText']
-      else:
-        # If row has different parameters than previous row we just rewrite it
-        page_details = pd.concat([page_details, line_details.loc[[i]]], ignore_index = True)
-    
+    # Merging adjacent lines with the same parameters
+    page_details = group_style_runs(line_details, get_run_starts(line_details, ['StyleId']))
+
     all_pages_modified.append(page_details)
 
   return all_pages_modified
 
-def get_main_font_among_pages(all_pages):
-  """Function that establish paragraph font details based on occurence of every font details among chars
+def get_style_lengths(pages_text, styles):
+  """Function that counts characters and rows of every font style in table
   
   Parameters
   ----------
-  all_pages : list
-      List of tables with page details (columns 'FontName', 'FontSize', 'FontSColor')
+  pages_text : dataframe
+      Table with elements (columns 'ElementText', 'StyleId')
+  styles : styles.StyleTable
+      Style table of document
 
   Returns
   -------
-  main_paragraph_font : dataframe
-      Table with main paragraph font details
+  style_lengths : dataframe
+      Table with style details, number of characters ('ElementTextLength') and rows ('Rows') of every style, sorted by style details
   """
-  # Contacting all pages
-  pages_text = pd.DataFrame()
-  for page_text in all_pages:
-      pages_text = pd.concat([pages_text, page_text], ignore_index = True)
+  lengths = pages_text['ElementText'].str.len()
+  grouped = lengths.groupby(pages_text['StyleId'])
+  style_lengths = pd.DataFrame({'ElementTextLength': grouped.sum(), 'Rows': grouped.size()}).reset_index()
+
+  # Details are looked up only for distinct styles
+  style_lengths = styles.resolve(style_lengths, keep_ids = True).sort_values(STYLE_COLUMNS).reset_index(drop = True)
 
-  # Making column with number of char in each element
-  pages_text['ElementTextLength'] = [len(el) for el in pages_text['ElementText']]
+  return style_lengths
+
+def get_main_font(style_lengths):
+  """Function that chooses most frequent font details among characters as main paragraph details
+
+  Parameters
+  ----------
+  style_lengths : dataframe
+      Table with number of characters of every style (see get_style_lengths)
 
-  # Counting occurence of every font details among characters
-  style_occurance = pages_text.groupby(['FontName','FontSize','FontSColor'])['ElementTextLength'].sum()
-  style_occurance = style_occurance.reset_index().sort_values('ElementTextLength', ascending = False)
+  Returns
+  -------
+  main_paragraph_font : series
+      Style id and details of main paragraph font
+  """
+  style_occurance = style_lengths[['StyleId'] + STYLE_COLUMNS + ['ElementTextLength']].sort_values('ElementTextLength', ascending = False)
   style_occurance = style_occurance.drop(columns=['ElementTextLength'])
-  # Choosing most frequent font details as main paragraph details
   main_paragraph_font = style_occurance.iloc[0]
 
   return main_paragraph_font
 
-def get_footer_and_header(all_pages):
-  """Function that establish header and footer based on font size. It also search for page number in footer/header and return page number as column 'PageNumber'
+def get_page_rows(page_sizes):
+  """Function that converts numbers of rows of pages into row ranges of pages in joined table
+
+  Parameters
+  ----------
+  page_sizes : list
+      Number of rows of every page
+
+  Returns
+  -------
+  page_rows : list
+      Tuple with the first row and the row after the last row of every page in joined table
+  """
+  stops = np.cumsum(page_sizes, dtype = int)
+  return list(zip((stops - np.asarray(page_sizes, dtype = int)).tolist(), stops.tolist()))
+
+def split_pages(pages_text, page_rows):
+  """Function that splits joined table into list of page tables
+
+  Parameters
+  ----------
+  pages_text : dataframe
+      Joined table of pages
+  page_rows : list
+      Row range of every page in joined table (see get_page_rows)
+
+  Returns
+  -------
+  all_pages : list
+      List of tables of pages
+  """
+  return [pages_text.iloc[start:stop].reset_index(drop = True) for start, stop in page_rows]
+
+def get_document_style_index(all_pages, styles):
+  """Function that joins pages once and establish style statistics of the whole document, shared by document-wide stages
   
   Parameters
   ----------
   all_pages : list
-      List of tables with page details (columns 'FontName', 'FontSize', 'FontSColor')
+      List of tables with page details (columns 'ElementText', 'StyleId')
+  styles : styles.StyleTable
+      Style table of document
 
   Returns
   -------
-  all_pages_modified : dataframe
-      List of tables with page details with additional columns 'Header', 'Footer' and 'PageNumber'
+  style_index : dict
+      Dictionary with joined pages ('PagesText'), row range of every page in joined table ('PageRows'),
+      number of characters and rows of every style ('StyleLengths'), main paragraph font details ('MainParagraphFont')
+      and style table ('Styles')
   """
+  # Joining pages together only once
+  pages_text = pd.concat(all_pages, ignore_index = True)
+  style_lengths = get_style_lengths(pages_text, styles)
 
-  # Getting main paragraph font details
-  main_paragraph_font = get_main_font_among_pages(all_pages)
+  return {'Styles': styles,
+          'PagesText': pages_text,
+          'PageRows': get_page_rows([page_text.shape[0] for page_text in all_pages]),
+          'StyleLengths': style_lengths,
+          'MainParagraphFont': get_main_font(style_lengths)}
 
-  # Iterating over pages
-  for pg in range(len(all_pages)):
+def get_main_font_among_pages(all_pages, styles):
+  """Function that establish paragraph font details based on occurence of every font details among chars
+  
+  Parameters
+  ----------
+  all_pages : list
+      List of tables with page details (columns 'ElementText', 'StyleId')
+  styles : styles.StyleTable
+      Style table of document
 
-      page_details = all_pages[pg]
+  Returns
+  -------
+  main_paragraph_font : dataframe
+      Table with main paragraph font details
+  """
+  return get_document_style_index(all_pages, styles)['MainParagraphFont']
 
-      # Iterating over top n rows with font size smaller than main paragrapg font size
-      n = np.nan
-      for i in range(int(page_details.shape[0])):
+def _find_page_number(header, footer):
+  """Function that joins digits of header and footer into candidate page number, returns None if there are no digits"""
+  digits = [x for x in str(header) + str(footer) if x.isdigit()]
+  return ''.join(digits) if len(digits) > 0 else None
 
-          if (page_details.iloc[i]['FontSize'] < (main_paragraph_font['FontSize'])): n = i
-          else: break
-      
-      # Checking if any row was classified as header and if all rows do not met condition for header
-      page_details['Header'] = np.nan
-      if n >= 0 and page_details[page_details['FontSize'] < main_paragraph_font['FontSize']].shape[0] < page_details.shape[0]:
-          # Saving header value in column
-          page_details['Header'] = ' '.join(page_details.iloc[:n+1]['ElementText'].values)
-          # Limiting table to rows that are not header
-          page_details = page_details.iloc[n+1:].copy()
+def get_page_numbers(operational_page_numbers, headers, footers, page_sizes):
+  """Function that establish page numbers based on numbers found in headers and footers of pages
+  
+  Parameters
+  ----------
+  operational_page_numbers : list
+      Operational page number of every page
+  headers : list
+      Header of every page (NaN if page has no header)
+  footers : list
+      Footer of every page (NaN if page has no footer)
+  page_sizes : list
+      Number of elements of every page, pages are weighted by them
 
-      # Iterating over bottom n rows with font size smaller than main paragrapg font size
-      n = np.nan
-      for i in range(int(page_details.shape[0])):
+  Returns
+  -------
+  page_numbers : series
+      Page number of every page
+  """
+  # Summary of pages with candidate page number found in header and footer
+  summary = pd.DataFrame({'OperationalPageNumber': operational_page_numbers, 'Rows': page_sizes})
+  summary['PageNumber'] = pd.Series([_find_page_number(h, f) for h, f in zip(headers, footers)], dtype = object)
 
-          if (page_details.iloc[-(i+1)]['FontSize'] < (main_paragraph_font['FontSize'])): n = i
-          else: break
+  # Calculating difference between found numbers and operational page number
+  summary['PageDifference'] = [int(po) - int(p) if p != None and rows > 0 else None
+                               for po, p, rows in zip(summary['OperationalPageNumber'], summary['PageNumber'], summary['Rows'])]
+
+  # At lease 50% of elements have to have page number filled, otherwise PageNumber will not be filled
+  rows = summary['Rows'].sum()
+  with_difference = summary['PageDifference'].notna()
+  if rows > 0 and summary.loc[~with_difference, 'Rows'].sum() / rows <= 0.5:
+    # Most common difference among elements (to make sure that some deviations do not impact page number)
+    differences = summary[with_difference & (summary['Rows'] > 0)].groupby('PageDifference', sort = False)['Rows'].sum()
+    difference_pages = differences.sort_values(ascending = False).index[0]
+    # Calculating PageNumber
+    page_numbers = summary['OperationalPageNumber'] - difference_pages
+    page_numbers[page_numbers <= 0] = np.nan
+    return page_numbers
 
-      # Checking if any row was classified as footer and if all rows do not met condition for footer
-      page_details['Footer'] = np.nan
-      if n >= 0 and page_details[page_details['FontSize'] < main_paragraph_font['FontSize']].shape[0] < page_details.shape[0]:
-          # Saving footer value in column
-          page_details['Footer'] = ' '.join(page_details.iloc[-(n+1):]['ElementText'].values)
-          # Limiting table to rows that are not footer
-          page_details = page_details.iloc[:-(n+1)].copy()
-
-      # Overwritting page table in list
-      all_pages[pg] = page_details
-
-  # Joining pages together
-  pages_text = pd.DataFrame()
-  for page_text in all_pages:
-      pages_text = pd.concat([pages_text, page_text], ignore_index = True)
-
-  # Preparing joined pages for page number search
-  pages_text['PageNumber'] = None
-  pages_text['Header'] = pages_text['Header'].astype(str)
-  pages_text['Footer'] = pages_text['Footer'].astype(str)
-  pages_text = pages_text[['ElementText', 'FontName', 'FontSize', 'FontSColor',
-                          'OperationalPageNumber', 'Header', 'Footer', 'PageNumber']].copy()
-
-  # Iterating over elements to see if there are any numbers in footer and header
-  for i, row in pages_text.iterrows():
-      numbersh = [str(x) for x in row['Header'] if str(x).isdigit()]
-      numbersf = [str(x) for x in row['Footer'] if str(x).isdigit()]
-      if len(numbersh + numbersf) > 0: pages_text.loc[i, 'PageNumber'] = ''.join(numbersh + numbersf)
+  return summary['PageNumber']
 
-  # Calculating difference between found numbers and operational page number
-  pages_text['PageDifference'] = [int(po) - int(p) if p != None else None for po, p in zip(pages_text['OperationalPageNumber'],pages_text['PageNumber'])]
+def get_footer_and_header(style_index):
+  """Function that establish header and footer based on font size. It also search for page number in footer/header and return page number as column 'PageNumber'
+  
+  Parameters
+  ----------
+  style_index : dict
+      Document style index of pages (see get_document_style_index), it is not changed
 
-  # At lease 50% of pages have to have page number filled, otherwise PageNumber will not be filled
-  na_fillout = pages_text['PageDifference'].isna().sum() / pages_text['PageDifference'].shape[0]
-  if na_fillout <= 0.5:
-    # Most common difference (to make sure that some deviations do not impact page number)
-    difference_pages = pages_text['PageDifference'].value_counts().index[0]
-    # Calculating PageNumber
-    pages_text['PageNumber'] = pages_text['OperationalPageNumber'] - difference_pages
-    pages_text.loc[pages_text['PageNumber'] <=0, 'PageNumber'] = np.nan
-     
-  # Pages modification - adding PageNumber
-  all_pages_modified = []
-  for i in range(len(all_pages)):
-      pg = all_pages[i]
-      pg = pg.merge(pages_text[['OperationalPageNumber', 'PageNumber']].drop_duplicates(), on = ['OperationalPageNumber'], how='left')
-      all_pages_modified.append(pg)
+  Returns
+  -------
+  style_index : dict
+      Style index of pages without headers and footers, joined pages have additional columns 'Header', 'Footer' and 'PageNumber'
+  """
+  styles = style_index['Styles']
 
-  return all_pages_modified
+  # Getting main paragraph font details
+  main_paragraph_font = style_index['MainParagraphFont']
 
-def get_structure(all_pages):
+  pages_text = style_index['PagesText']
+  texts = pages_text['ElementText'].tolist()
+  operational_page_numbers = pages_text['OperationalPageNumber'].tolist()
+  smaller = styles.get('FontSize', pages_text['StyleId']) < main_paragraph_font['FontSize']
+
+  # Rows that stay in pages and summary of pages - one header and footer per page
+  kept_rows, page_operational_numbers, page_headers, page_footers, page_sizes = [], [], [], [], []
+
+  # Iterating over pages
+  for start, stop in style_index['PageRows']:
+      page_operational_numbers.append(operational_page_numbers[start] if start < stop else np.nan)
+
+      # Counting top rows with font size smaller than main paragrapg font size
+      n = 0
+      while start + n < stop and smaller[start + n]: n += 1
+
+      # Checking if any row was classified as header and if all rows do not met condition for header
+      header = np.nan
+      if n > 0 and smaller[start:stop].sum() < stop - start:
+          # Saving header value
+          header = ' '.join(texts[start:start+n])
+          # Limiting page to rows that are not header
+          start = start + n
+
+      # Counting bottom rows with font size smaller than main paragrapg font size
+      n = 0
+      while stop - n > start and smaller[stop - n - 1]: n += 1
+
+      # Checking if any row was classified as footer and if all rows do not met condition for footer
+      footer = np.nan
+      if n > 0 and smaller[start:stop].sum() < stop - start:
+          # Saving footer value
+          footer = ' '.join(texts[stop-n:stop])
+          # Limiting page to rows that are not footer
+          stop = stop - n
+
+      kept_rows.append(np.arange(start, stop))
+      page_headers.append(header)
+      page_footers.append(footer)
+      page_sizes.append(stop - start)
+
+  # Limiting joined table to rows that are not headers or footers
+  kept_rows = np.concatenate(kept_rows) if len(kept_rows) > 0 else np.array([], dtype = int)
+  removed = np.ones(pages_text.shape[0], dtype = bool)
+  removed[kept_rows] = False
+  pages_text_kept = pages_text.iloc[kept_rows].reset_index(drop = True)
+
+  # Page numbers are established for pages, every row of page gets values of its page
+  page_numbers = get_page_numbers(page_operational_numbers, page_headers, page_footers, page_sizes)
+  pages_text_kept['Header'] = pd.Series(np.repeat(np.array(page_headers, dtype = object), page_sizes), dtype = object)
+  pages_text_kept['Footer'] = pd.Series(np.repeat(np.array(page_footers, dtype = object), page_sizes), dtype = object)
+  pages_text_kept['PageNumber'] = np.repeat(page_numbers.to_numpy(), page_sizes)
+
+  # Updating style index - only removed headers and footers are aggregated
+  style_lengths = style_index['StyleLengths'].set_index('StyleId')
+  removed_lengths = get_style_lengths(style_index['PagesText'][removed], styles).set_index('StyleId')
+  style_lengths.loc[removed_lengths.index, ['ElementTextLength', 'Rows']] -= removed_lengths[['ElementTextLength', 'Rows']]
+  style_lengths = style_lengths[style_lengths['Rows'] > 0].reset_index()
+
+  return {**style_index,
+          'PagesText': pages_text_kept,
+          'PageRows': get_page_rows(page_sizes),
+          'StyleLengths': style_lengths,
+          'MainParagraphFont': get_main_font(style_lengths)}
+
+def get_structure(style_index):
   """Function that establish if element is 'Header' or 'Text
   
   Parameters
   ----------
-  all_pages : list
-      List of tables with page details (columns 'FontName', 'FontSize', 'FontSColor')
+  style_index : dict
+      Document style index of pages (see get_document_style_index), it is not changed
 
   Returns
   -------
-  all_pages_modified : dataframe
-      List of tables with page details with additional column 'Structure'
+  style_index : dict
+      Style index of the same pages, joined pages have additional column 'Structure'
   """
-
-  # Joining all pages together to findout style of sections in the whole document
-  pages_text = pd.DataFrame()
-  for page_text in all_pages:
-      pages_text = pd.concat([pages_text, page_text], ignore_index = True)
+  # Joined pages - style of sections is established in the whole document
+  pages_text = style_index['PagesText']
 
   # Determining what style occures the most often in document
-  main_paragraph_font = get_main_font_among_pages(all_pages)
+  main_paragraph_font = style_index['MainParagraphFont']
 
   # Calculating proportion of every style occurance
-  pages_text['ElementTextLength'] = [len(x) for x in pages_text['ElementText']]
-  style = pages_text.groupby(['FontName', 'FontSize', 'FontSColor'])['ElementTextLength'].sum().reset_index()
-  style['ElementTextLength'] = style['ElementTextLength'] / pages_text['ElementTextLength'].sum()
+  style = style_index['StyleLengths'][['StyleId'] + STYLE_COLUMNS + ['ElementTextLength']].copy()
+  style['ElementTextLength'] = style['ElementTextLength'] / style['ElementTextLength'].sum()
 
   # Element that are long are usually not headers, so they have the structure 'Text' assigned
-  long_texts = pages_text[pages_text['ElementTextLength'] > 100][['FontName', 'FontSize', 'FontSColor']].drop_duplicates()
+  long_texts = pages_text.loc[pages_text['ElementText'].str.len() > 100, ['StyleId']].drop_duplicates()
   long_texts['Structure'] = 'Text'
-  style = style.merge(long_texts, on = ['FontName', 'FontSize', 'FontSColor'], how = 'left').drop_duplicates()
+  style = style.merge(long_texts, on = 'StyleId', how = 'left').drop_duplicates()
   style = style.sort_values('ElementTextLength', ascending=False)
 
   # Not frequent elements are converted to standard text
@@ -322,34 +660,28 @@ def get_structure(all_pages):
   # All the other styles have 'Header' structure
   style.loc[style['Structure'] != 'Text', 'Structure'] = 'Header'
 
-  # Merging style details (col 'Structure') to list of page details
-  all_pages_modified = []
+  # Merging style details (col 'Structure') to joined pages once by style id, order of rows is kept
+  pages_text = pages_text.merge(style[['StyleId','Structure']], on = 'StyleId', how='left')
 
-  for i in range(len(all_pages)):
-      pg = all_pages[i]
-      pg = pg.merge(style[['FontName','FontSize','FontSColor','Structure']], on = ['FontName','FontSize','FontSColor'], how='left')
-      all_pages_modified.append(pg)
-        
-  return all_pages_modified
+  return {**style_index, 'PagesText': pages_text}
 
 
-def group_structure(all_pages):
+def group_structure(style_index):
   """Function that groups elements based on 'Structure' columns. Texts and other information columns are merged together.
   
   Parameters
   ----------
-  all_pages : list
-      List of tables with page details (columns 'ElementText', 'OperationalPageNumber', 'PageNumber','Footer', 'Header')
+  style_index : dict
+      Style index of pages with structure (see get_structure), joined pages have columns 'ElementText', 'Structure',
+      'OperationalPageNumber', 'PageNumber', 'Footer' and 'Header'
 
   Returns
   -------
   grouped_structure : dataframe
       Table with all elements grouped by structure
   """
-  # Joining all pages together to findout style of sections in the whole document
-  pages_text = pd.DataFrame()
-  for page_text in all_pages:
-    pages_text = pd.concat([pages_text, page_text], ignore_index = True)
+  # Joined pages - sections can continue on next pages
+  pages_text = style_index['PagesText'].copy()
 
   # Data cleaning before transformations
   for col in ['OperationalPageNumber', 'PageNumber']:
@@ -357,136 +689,737 @@ def group_structure(all_pages):
   for col in ['Footer', 'Header']:
     pages_text[col] = [str(x).replace(str(round(float(y))), '').strip() if y!= '' else x for x, y in zip(pages_text[col].fillna(''), pages_text['PageNumber'].fillna(''))]
 
-  # We start structure grouping from the first element
-  grouped_structure = pages_text.loc[[0]].copy()
+  # Texts are merged only if both adjacent elements are texts, every header stays separate element
+  is_text = (pages_text['Structure'] == 'Text').to_numpy()
+  run_starts = ~(is_text & np.roll(is_text, 1))
 
-  # Iterating over elements
-  for i in range(1, pages_text.shape[0]):
-
-    # If previous section was text - texts are merged
-    if ((pages_text.loc[i-1,'Structure']  == 'Text') & (pages_text.loc[i,'Structure']  == 'Text')):
-
-      # Merging elements
-      grouped_structure.iloc[-1, 0] = grouped_structure.iloc[-1, 0] + ' ' + pages_text.loc[i,'ElementText']
-
-      # If elements from different pages were merged, their details also
-      for col in ['OperationalPageNumber', 'PageNumber','Footer', 'Header']:
-        col_idx = list(pages_text.columns).index(col)
-        if str(pages_text.loc[i,col]) not in str(grouped_structure.iloc[-1, col_idx]): 
-          grouped_structure.iloc[-1, col_idx] = str(grouped_structure.iloc[-1, col_idx]) + ', ' + str(pages_text.loc[i,col])
-    
-    # If previous section was not text - text is appended
-    else:
-      grouped_structure = pd.concat([grouped_structure, pages_text.loc[[i]]], ignore_index = True)
+  # Merging elements, if elements from different pages were merged, their details also
+  grouped_structure = group_style_runs(pages_text, run_starts,
+                                       merged_columns = ['OperationalPageNumber', 'PageNumber','Footer', 'Header'])
 
   return grouped_structure
 
-def table_to_structured_json(grouped_structure, pdf_name):
-  """Function that transform table with headers and texts to structured dictionary
-  
+def iter_structured_sections(grouped_structure, pdf_name, document_sections = None):
+  """Function that generates sections of table with headers and texts one by one, every section is yielded
+  as soon as its header and text are processed (see table_to_structured_json)
+
   Parameters
   ----------
   grouped_structure : dataframe
       Table with all elements grouped by structure
   pdf_name : str
       Name of document
+  document_sections : list
+      If given, tree of sections is built in this list while sections are generated
 
-  Returns
-  -------
-  list_of_pargraphs : list
-      List of dictionaries with structured text
+  Yields
+  ------
+  paragraph : dict
+      Dictionary with structured text of single section
   """
-
-  # List with all sections as dictionaries and with titles
-  list_of_pargraphs, titles= [], []
+  # Columns as lists, so values are read without indexing table
+  structures = grouped_structure['Structure'].tolist()
+  texts = grouped_structure['ElementText'].tolist()
+  font_sizes = grouped_structure['FontSize'].tolist()
+  details = {col: grouped_structure[col].tolist() for col in ['OperationalPageNumber', 'PageNumber', 'Header', 'Footer']}
 
   # Selecting headers from structure
-  headers = grouped_structure[grouped_structure['Structure'] == 'Header']
+  header_positions = [i for i, structure in enumerate(structures) if structure == 'Header']
+
+  # The last header of every font size (position, title and section in tree)
+  last_headers = {}
 
   # Iterating over headers
-  for i, row in headers.iterrows():
-      
-      # Selecting previous headers
-      previous_headers = headers[headers.index < i]
-      if previous_headers.shape[0] > 0:
-        # If previous headers exists, checking if their font is bigger, keeping only the last header if multiple headers with the same size exists
-        df_hdrs = previous_headers[previous_headers['FontSize'] - 0.5 > row['FontSize']].drop_duplicates('FontSize', keep = 'last')
-        # Saving previous titles
-        titles = list(df_hdrs['ElementText'].values)
-
-      # Addinf current title to previous titles
-      titles.append(row['ElementText'])
+  for i in header_positions:
+
+      # Selecting previous headers with bigger font, only the last header of every font size is kept
+      previous_headers = sorted(header for font_size, header in last_headers.items() if font_size - 0.5 > font_sizes[i])
+
+      # Adding current title to previous titles
+      titles = [title for _, title, _ in previous_headers] + [texts[i]]
+
+      # Header becomes subsection of the closest previous header with bigger font
+      section = {'Title': texts[i]}
+      if document_sections is not None:
+        parent_sections = previous_headers[-1][2]['Sections'] if previous_headers else document_sections
+        parent_sections.append(section)
+      last_headers[font_sizes[i]] = (i, texts[i], section)
 
       # If header is followed by not empty text element, we append titles to list 
-      if i!= headers.index.max():
-        if grouped_structure.loc[i+1, 'Structure'] == 'Text':
-          if len(grouped_structure.loc[i+1, 'ElementText']) > 0:
+      paragraph = None
+      if i != header_positions[-1]:
+        if structures[i+1] == 'Text':
+          if len(texts[i+1]) > 0:
 
             # Preparing paragraph values
             paragraph = {'FileName' : pdf_name,
                          'Title' : ' -> '.join([x for x in titles if x != '']),
-                         'Text' : grouped_structure.loc[i+1, 'ElementText'],
-                         'OperationalPageNumber' : grouped_structure.loc[i+1, 'OperationalPageNumber'],
-                         'PageNumber' : grouped_structure.loc[i+1, 'PageNumber'],
-                         'Header' : grouped_structure.loc[i+1, 'Header'], 
-                         'Footer' : grouped_structure.loc[i+1, 'Footer'], 
+                         'Text' : texts[i+1],
+                         'OperationalPageNumber' : details['OperationalPageNumber'][i+1],
+                         'PageNumber' : details['PageNumber'][i+1],
+                         'Header' : details['Header'][i+1], 
+                         'Footer' : details['Footer'][i+1], 
                         }
-                  
-            # Appending important paragraphs
-            ## Only items with non empty value are appended or important columns evan if their value is empty
-            list_of_pargraphs.append({k:v for k, v in paragraph.items() if v != '' or k in ['FileName','Title','Text']})
+            section.update({k:v for k, v in paragraph.items() if k not in ['FileName','Title'] and (v != '' or k == 'Text')})
 
-  return list_of_pargraphs
+      section['Sections'] = []
 
-def pdf_to_structured_json(pdf_path, pdf_name):
-  """Function that transform pdf into structured list of sections
+      # Yielding important paragraphs
+      ## Only items with non empty value are yielded or important columns evan if their value is empty
+      if paragraph is not None:
+        yield {k:v for k, v in paragraph.items() if v != '' or k in ['FileName','Title','Text']}
+
+def table_to_structured_json(grouped_structure, pdf_name, nested = False, max_sections = None):
+  """Function that transform table with headers and texts to structured dictionary
   
+  Title of every header is made of titles of previous headers with bigger font (the last header of every font size)
+  and its own title. Headers are processed in one pass, keeping the last header of every font size.
+
   Parameters
   ----------
-  pdf_path : str
-      Path to pdf file
+  grouped_structure : dataframe
+      Table with all elements grouped by structure
   pdf_name : str
-      File name
+      Name of document
+  nested : bool
+      If True, document is returned as tree of sections instead of flat list of sections
+  max_sections : int
+      If given, only this number of the first sections is made
 
   Returns
   -------
   list_of_pargraphs : list
       List of dictionaries with structured text
+  document_tree : dict
+      Dictionary with document name ('FileName') and tree of sections ('Sections'), every section has its own 'Title',
+      details of text that follows it and list of subsections 'Sections' (returned instead of list if nested is True)
   """
+  # List with all sections as dictionaries and tree of sections
+  document_sections = [] if nested else None
+  list_of_pargraphs = list(islice(iter_structured_sections(grouped_structure, pdf_name, document_sections), max_sections))
 
-  # Extracting elements from pdf file
-  pages = extract_pages(f'{pdf_path}/{pdf_name}')
-  # Converting them to list
-  lst_pages = list(pages)
+  if nested:
+    return {'FileName': pdf_name, 'Sections': document_sections}
 
-  # List of modified 
-  df_lines_text = []
+  return list_of_pargraphs
+
+def get_page_count(pdf_file):
+  """Function that counts pages of pdf file without layout analysis
+  
+  Parameters
+  ----------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content
 
+  Returns
+  -------
+  page_count : int
+      Number of pages in pdf file
+  """
+  with open_filename(pdf_file, 'rb') as fp:
+    page_count = sum(1 for _ in PDFPage.get_pages(fp))
+
+  return page_count
+
+def iter_lines_from_pages(pdf_file, styles, page_numbers = None, fast = False, images = None):
+  """Function that extracts line details of selected pages of pdf file one by one, so extraction can be stopped after any page
+  
+  Parameters are the same as parameters of extract_lines_from_pages (without progress).
+
+  Yields
+  ------
+  lines : dataframe
+      Table with line details of page (with column 'OperationalPageNumber')
+  """
   # Page number in pdf readed
-  operational_page_number = 0
+  if page_numbers is None: operational_page_numbers = count(1)
+  else: operational_page_numbers = (page_number + 1 for page_number in sorted(page_numbers))
 
-  # Iterating over pages
-  for page in lst_pages: 
+  # Iterating over pages as they are generated - only layout of current page is kept in memory,
+  # it is dropped as soon as page is converted to compact table with line details
+  if fast: pages = extract_fast_lines_from_pages(pdf_file, page_numbers = page_numbers, images = images)
+  else: pages = extract_layout_pages(pdf_file, page_numbers = page_numbers)
+
+  for operational_page_number, page in zip(operational_page_numbers, pages):
+
+      # Collecting images of page layout
+      if images is not None and not fast:
+        for stream in get_layout_images(page):
+          images.add(stream, operational_page_number)
 
       # Getting line details
-      lines = get_lines_details(page)
+      lines = get_fast_lines_details(page, styles) if fast else get_lines_details(page, styles)
 
       # Adding columns with page number in pdf reade
-      operational_page_number = operational_page_number + 1
       lines['OperationalPageNumber'] = operational_page_number
 
-      # Appending modified page
+      yield lines
+
+def extract_lines_from_pages(pdf_file, styles, page_numbers = None, progress = None, fast = False, images = None):
+  """Function that extracts line details of selected pages of pdf file
+  
+  Parameters
+  ----------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content
+  styles : styles.StyleTable
+      Style table of document, styles of lines are interned in it
+  page_numbers : list
+      Zero-indexed numbers of pages to extract, all pages are extracted if not given
+  progress : callable
+      Function called with number of extracted pages after every page
+  fast : bool
+      If True, chars are collected without pdfminer layout analysis (lines keep content stream order)
+  images : extracting_images.ImageExtractor
+      Collector to which images of extracted pages are added in the same pass
+
+  Returns
+  -------
+  df_lines_text : list
+      List of tables with line details of every page (with column 'OperationalPageNumber')
+  """
+  # List of modified pages
+  df_lines_text = []
+
+  for lines in iter_lines_from_pages(pdf_file, styles, page_numbers = page_numbers, fast = fast, images = images):
       df_lines_text.append(lines)
+      if progress is not None: progress(len(df_lines_text))
+
+  return df_lines_text
+
+def _extract_lines_with_styles(pdf_file, page_numbers, fast):
+  """Function that extracts line details of pages in worker process, returns tables of pages and styles of their own style table"""
+  styles = StyleTable()
+  return extract_lines_from_pages(pdf_file, styles, page_numbers = page_numbers, fast = fast), styles.styles
+
+def extract_lines_in_parallel(pdf_file, styles, max_workers, page_numbers = None, pages_per_task = None, progress = None, fast = False):
+  """Function that extracts line details of pages of pdf file, spreading page ranges across process pool
+  
+  Parameters
+  ----------
+  pdf_file : str
+      Path to pdf file
+  styles : styles.StyleTable
+      Style table of document, styles of worker processes are merged into it
+  max_workers : int
+      Number of worker processes
+  page_numbers : list
+      Zero-indexed numbers of pages to extract, all pages are extracted if not given
+  pages_per_task : int
+      Number of pages extracted by worker in one task, by default pages are split in four tasks per worker
+  progress : callable
+      Function called with number of extracted pages after every finished task
+  fast : bool
+      If True, chars are collected without pdfminer layout analysis
+
+  Returns
+  -------
+  df_lines_text : list
+      List of tables with line details of every page in page order (with column 'OperationalPageNumber')
+  """
+  if page_numbers is None: page_numbers = range(get_page_count(pdf_file))
+  else: page_numbers = sorted(page_numbers)
+  if pages_per_task is None:
+    pages_per_task = max(1, math.ceil(len(page_numbers) / (max_workers * 4)))
+
+  # Consecutive page ranges - every worker opens pdf file on its own
+  page_ranges = [list(page_numbers[start:start + pages_per_task]) for start in range(0, len(page_numbers), pages_per_task)]
+
+  # Results are returned in order of submitted ranges, so pages stay in document order
+  df_lines_text = []
+  with ProcessPoolExecutor(max_workers = max_workers) as executor:
+    for lines, worker_styles in executor.map(_extract_lines_with_styles, repeat(pdf_file), page_ranges, repeat(fast)):
+      # Every worker numbers styles on its own, so ids are translated to ids of document style table
+      style_ids = styles.merge(worker_styles)
+      for page_lines in lines:
+        page_lines['StyleId'] = style_ids[page_lines['StyleId'].to_numpy()]
+      df_lines_text.extend(lines)
+      if progress is not None: progress(len(df_lines_text))
+
+  return df_lines_text
+
+def get_page_hashes(pdf_file):
+  """Function that calculates hash of every page of pdf file from its content streams, resources and geometry
+  
+  Parameters
+  ----------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content
+
+  Returns
+  -------
+  page_hashes : list
+      List with hash of every page (hex string)
+  """
+  page_hashes, memo = [], {}
+  with open_filename(pdf_file, 'rb') as fp:
+    for page in PDFPage.get_pages(fp):
+      digest = hashlib.sha256()
+      for obj in [page.contents, page.resources, page.mediabox, page.cropbox, page.rotate]:
+        digest.update(hash_pdf_object(obj, memo))
+      page_hashes.append(digest.hexdigest())
+
+  return page_hashes
+
+def extract_lines_incrementally(pdf_file, styles, page_cache, max_workers = None, progress = None, report = None, fast = False,
+                                page_numbers = None):
+  """Function that extracts line details of pages of pdf file reusing tables of pages that were already extracted
+  
+  Parameters
+  ----------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content
+  styles : styles.StyleTable
+      Style table of document, styles of cached and extracted pages are interned in it
+  page_cache : cache.PageCache
+      Cache with line details of pages, keyed by page hash
+  max_workers : int
+      Number of processes used to extract pages in parallel, pages are extracted in current process if not given
+  progress : callable
+      Function called with number of extracted pages while pages are extracted
+  report : dict
+      Dictionary which is filled with numbers of reused ('ReusedPages') and extracted ('ParsedPages') pages
+  fast : bool
+      If True, chars are collected without pdfminer layout analysis
+  page_numbers : list
+      Zero-indexed numbers of pages to extract, all pages are extracted if not given
+
+  Returns
+  -------
+  df_lines_text : list
+      List of tables with line details of every page (with column 'OperationalPageNumber')
+  """
+  # Pages extracted with and without layout analysis are kept separately
+  page_hashes = [f'{page_hash}-fast' if fast else page_hash for page_hash in get_page_hashes(pdf_file)]
+  if page_numbers is None: page_numbers = range(len(page_hashes))
+  else: page_numbers = sorted(page_numbers)
+
+  # Taking tables of unchanged pages from cache
+  tables, parsed_pages, reused_pages = {}, [], []
+  for page_number in page_numbers:
+    columns = page_cache.get(page_hashes[page_number])
+    if columns is None:
+      parsed_pages.append(page_number)
+    else:
+      reused_pages.append(page_number)
+      # Cached pages keep style details, as ids are valid only in style table of one document
+      lines = pd.DataFrame({'ElementText': columns['ElementText'],
+                            'StyleId': styles.intern_columns(*[columns[col] for col in STYLE_COLUMNS])})
+      lines['OperationalPageNumber'] = page_number + 1
+      tables[page_number] = lines
+
+  # Extracting only pages that are not in cache
+  if len(parsed_pages) > 0:
+    if max_workers is not None and max_workers > 1:
+      extracted = extract_lines_in_parallel(pdf_file, styles, max_workers, page_numbers = parsed_pages, progress = progress, fast = fast)
+    else:
+      extracted = extract_lines_from_pages(pdf_file, styles, page_numbers = parsed_pages, progress = progress, fast = fast)
+
+    for page_number, lines in zip(parsed_pages, extracted):
+      # Page number is not saved, the same page can be placed elsewhere in revised document
+      page_cache.put(page_hashes[page_number], styles.resolve(lines.drop(columns = 'OperationalPageNumber')).to_dict('list'))
+      tables[page_number] = lines
+    page_cache.evict()
+
+  if report is not None:
+    report['ReusedPages'] = [page_number + 1 for page_number in reused_pages]
+    report['ParsedPages'] = [page_number + 1 for page_number in parsed_pages]
+
+  return [tables[page_number] for page_number in page_numbers]
+
+class PdfBuffer(io.RawIOBase):
+  """Read-only binary stream over buffer with content of pdf file (bytes, bytearray, memoryview or mmap)
 
+  Content is not copied, only parts requested by parser are read from buffer.
+
+  Parameters
+  ----------
+  buffer : bytes-like
+      Content of pdf file
+  owned_map : mmap.mmap
+      Memory map closed together with stream
+  """
+
+  def __init__(self, buffer, owned_map = None):
+    self._view = memoryview(buffer).cast('B')
+    self._position = 0
+    self._owned_map = owned_map
+
+  def readable(self):
+    return True
+
+  def seekable(self):
+    return True
+
+  def read(self, size = -1):
+    end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+    data = self._view[self._position:end].tobytes()
+    self._position = max(self._position, end)
+    return data
+
+  def readinto(self, b):
+    data = self.read(len(b))
+    b[:len(data)] = data
+    return len(data)
+
+  def seek(self, offset, whence = io.SEEK_SET):
+    base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+    self._position = max(0, base + offset)
+    return self._position
+
+  def tell(self):
+    return self._position
+
+  def close(self):
+    if not self.closed:
+      self._view.release()
+      if self._owned_map is not None: self._owned_map.close()
+    super().close()
+
+def get_pdf_file(pdf_path, pdf_name, memory_map = True):
+  """Function that returns pdf file which can be opened by extraction functions
+  
+  Parameters
+  ----------
+  pdf_path : str, file-like object or bytes-like
+      Path to directory with pdf file, seekable binary file-like object or buffer (bytes, bytearray, memoryview, mmap) with its content
+  pdf_name : str
+      File name (used only if pdf_path is path to directory)
+  memory_map : bool
+      If True, files on disk at least MMAP_MIN_BYTES big are memory-mapped
+
+  Returns
+  -------
+  pdf_file : str or file-like object
+      Path to pdf file or binary stream with its content (PdfBuffer streams should be closed by caller)
+  """
+  if isinstance(pdf_path, (str, os.PathLike)):
+    pdf_file = f'{pdf_path}/{pdf_name}'
+    if memory_map and os.path.getsize(pdf_file) >= MMAP_MIN_BYTES:
+      with open(pdf_file, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+      return PdfBuffer(mapped, owned_map = mapped)
+    return pdf_file
+
+  if isinstance(pdf_path, (bytes, bytearray, memoryview, mmap.mmap)):
+    return PdfBuffer(pdf_path)
+
+  # Spooled temporary file is not io.IOBase before Python 3.11, so its underlying file is used
+  if isinstance(pdf_path, tempfile.SpooledTemporaryFile):
+    pdf_path = pdf_path._file
+
+  # File-like object stored on disk is memory-mapped if it is big
+  try:
+    fileno = pdf_path.fileno()
+  except (AttributeError, OSError, io.UnsupportedOperation):
+    return pdf_path
+  if memory_map and os.fstat(fileno).st_size >= MMAP_MIN_BYTES:
+    mapped = mmap.mmap(fileno, 0, access = mmap.ACCESS_READ)
+    return PdfBuffer(mapped, owned_map = mapped)
+  return pdf_path
+
+def measure_peak_memory(function, *args, **kwargs):
+  """Function that calls given function and measures peak memory allocated during the call
+  
+  Only memory allocated by current process is traced (memory of worker processes is not included).
+  Tracing slows down the call, so it should be used only when memory report is needed.
+
+  Parameters
+  ----------
+  function : callable
+      Function to call
+  *args, **kwargs
+      Arguments passed to function
+
+  Returns
+  -------
+  result : object
+      Value returned by function
+  peak_memory : int
+      Peak memory allocated during the call (in bytes)
+  """
+  # Tracing could be already started by caller, in such case only the peak is reset (tracing is restarted before Python 3.9)
+  tracing = tracemalloc.is_tracing()
+  if tracing and hasattr(tracemalloc, 'reset_peak'):
+    tracemalloc.reset_peak()
+  else:
+    if tracing: tracemalloc.stop()
+    tracemalloc.start()
+
+  try:
+    start_memory = tracemalloc.get_traced_memory()[0]
+    result = function(*args, **kwargs)
+    peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+  finally:
+    if not tracing: tracemalloc.stop()
+
+  return result, peak_memory
+
+def get_range_page_numbers(page_count, page_range = None):
+  """Function that converts range of page numbers to zero-indexed numbers of pages of document
+  
+  Parameters
+  ----------
+  page_count : int
+      Number of pages of document
+  page_range : tuple
+      The first and the last page of range (operational page numbers starting from 1, both included), None as the last page
+      means the last page of document. All pages are selected if not given
+
+  Returns
+  -------
+  page_numbers : list
+      Zero-indexed numbers of pages in range
+  """
+  first_page, last_page = page_range if page_range is not None else (1, None)
+  first_page = max(1, first_page or 1)
+  last_page = page_count if last_page is None else min(last_page, page_count)
+  if first_page > last_page:
+    raise ValueError(f'Page range {first_page}-{last_page} does not contain any page of document with {page_count} pages')
+
+  return list(range(first_page - 1, last_page))
+
+def get_sample_page_numbers(page_count, sample_size, excluded = ()):
+  """Function that selects pages spread evenly over document (zero-indexed numbers), pages in excluded are left out"""
+  sample = np.linspace(0, page_count - 1, num = min(sample_size, page_count)).round().astype(int)
+  return sorted(set(sample.tolist()) - set(excluded))
+
+def _select_pages(style_index, operational_page_numbers):
+  """Function that returns style index limited to joined pages with given operational page numbers"""
+  pages_text = style_index['PagesText']
+  selected = pages_text['OperationalPageNumber'].isin(operational_page_numbers).to_numpy()
+  page_sizes = [int(selected[start:stop].sum()) for start, stop in style_index['PageRows'] if selected[start:stop].any()]
+
+  return {**style_index, 'PagesText': pages_text[selected].reset_index(drop = True), 'PageRows': get_page_rows(page_sizes)}
+
+def _group_pages(df_lines_text, styles, profiler = None, output_pages = None):
+  """Function that runs stages that follow extraction on line details of pages
+  
+  Parameters
+  ----------
+  df_lines_text : list
+      List of tables with line details of pages in document order
+  styles : styles.StyleTable
+      Style table of pages
+  profiler : profiling.StageProfiler
+      Profiler which records wall time and counts of every stage (they are added up if pages are grouped repeatedly)
+  output_pages : list
+      Operational page numbers of pages that are grouped into structure, other pages are used only for style statistics
+      (main font, header and footer). All pages are grouped if not given
+
+  Returns
+  -------
+  grouped_structure : dataframe
+      Table with elements of pages grouped by structure
+  """
   # Grouping lines into pages
-  df_pages_text = group_lines_into_page(df_lines_text)
+  with profile_stage(profiler, 'GroupLinesIntoPage'):
+    df_pages_text = group_lines_into_page(df_lines_text)
+  # Style statistics of all pages, shared by document-wide stages
+  with profile_stage(profiler, 'StyleIndex'):
+    style_index = get_document_style_index(df_pages_text, styles)
   # Identification of footer, header and page number in document
-  df_pages_text_fh = get_footer_and_header(df_pages_text)
+  with profile_stage(profiler, 'FooterAndHeader'):
+    style_index_fh = get_footer_and_header(style_index)
   # Determining if text element is header or text
-  df_pages_text_s = get_structure(df_pages_text_fh)
-  # Grouping texts together
-  df_pages_text_structured = group_structure(df_pages_text_s)
+  with profile_stage(profiler, 'Structure'):
+    style_index_s = get_structure(style_index_fh)
+  # Grouping texts together, style details are resolved only for grouped elements
+  with profile_stage(profiler, 'GroupStructure'):
+    if output_pages is not None: style_index_s = _select_pages(style_index_s, output_pages)
+    df_pages_text_structured = styles.resolve(group_structure(style_index_s))
+
+  # Counting rows of stages
+  if profiler is not None:
+    profiler.count('GroupLinesIntoPage', Rows = sum(page.shape[0] for page in df_pages_text))
+    profiler.count('StyleIndex', Styles = len(styles))
+    profiler.count('FooterAndHeader', Rows = style_index_fh['PagesText'].shape[0])
+    profiler.count('Structure', Rows = style_index_s['PagesText'].shape[0])
+    profiler.count('GroupStructure', Rows = df_pages_text_structured.shape[0])
+
+  return df_pages_text_structured
+
+def get_grouped_structure(pdf_path, pdf_name, max_workers = None, progress = None, page_cache = None, report = None, fast = False,
+                          profiler = None, images = None, page_range = None, max_sections = None, style_sample = None):
+  """Function that extracts elements of pdf file and groups them by structure (all stages of pdf_to_structured_json before sections are made)
+  
+  Parameters are the same as parameters of pdf_to_structured_json.
+
+  Returns
+  -------
+  grouped_structure : dataframe
+      Table with all elements grouped by structure
+  """
+  # Images are collected in the same pass as text and preview extracts pages one by one, so pages are extracted in current process
+  if images is not None or max_sections is not None: max_workers, page_cache = None, None
+
+  # Pages can be extracted in worker processes only from path, in current process big files are memory-mapped
+  parallel = max_workers is not None and max_workers > 1
+  pdf_file = get_pdf_file(pdf_path, pdf_name, memory_map = not parallel)
+  if not isinstance(pdf_file, str): max_workers = None
+
+  # Every distinct font style of document gets integer id when lines are extracted
+  styles = StyleTable()
+
+  # Counters of font cache of current process before extraction (fonts parsed in worker processes are not counted)
+  font_stats = get_font_cache().stats()
+
+  # Tables of extracted pages by zero-indexed page number and numbers of pages of requested range that were extracted
+  tables, output_numbers, grouped = {}, None, None
+
+  try:
+    # Zero-indexed numbers of pages in requested range and of pages sampled for style statistics, all pages by default
+    range_numbers, sample_numbers = None, []
+    if page_range is not None or max_sections is not None or style_sample is not None:
+      page_count = get_page_count(pdf_file)
+      range_numbers = get_range_page_numbers(page_count, page_range)
+      if style_sample is not None:
+        # Preview can stop on any page, so sampled pages of range are not extracted again when preview gets to them
+        sample_numbers = get_sample_page_numbers(page_count, style_sample, excluded = range_numbers if max_sections is None else ())
+
+    with profile_stage(profiler, 'Extraction'):
+      if len(sample_numbers) > 0:
+        tables.update(zip(sample_numbers, extract_lines_from_pages(pdf_file, styles, page_numbers = sample_numbers, fast = fast)))
+
+    # Extracting line details from every page of range
+    if max_sections is None:
+      with profile_stage(profiler, 'Extraction'):
+        if page_cache is not None:
+          df_lines_text = extract_lines_incrementally(pdf_file, styles, page_cache, max_workers = max_workers, progress = progress,
+                                                      report = report, fast = fast, page_numbers = range_numbers)
+        elif max_workers is not None and max_workers > 1:
+          df_lines_text = extract_lines_in_parallel(pdf_file, styles, max_workers, page_numbers = range_numbers, progress = progress,
+                                                    fast = fast)
+        else:
+          df_lines_text = extract_lines_from_pages(pdf_file, styles, page_numbers = range_numbers, progress = progress, fast = fast,
+                                                   images = images)
+      output_numbers = range_numbers if range_numbers is not None else list(range(len(df_lines_text)))
+      tables.update(zip(output_numbers, df_lines_text))
+
+    # Preview - pages are extracted one by one and stages are run whenever number of extracted pages doubles,
+    # extraction stops as soon as there are more sections than requested (so the last requested section is complete)
+    else:
+      pages = iter_lines_from_pages(pdf_file, styles, page_numbers = [n for n in range_numbers if n not in tables], fast = fast,
+                                    images = images)
+      output_numbers, checkpoint = [], 1
+      with closing(pages):
+        for page_number in range_numbers:
+          if page_number not in tables:
+            with profile_stage(profiler, 'Extraction'):
+              tables[page_number] = next(pages)
+          output_numbers.append(page_number)
+          if progress is not None: progress(len(output_numbers))
+
+          grouped = None
+          if len(output_numbers) == checkpoint or page_number == range_numbers[-1]:
+            checkpoint *= 2
+            grouped = _group_pages([tables[n] for n in sorted(tables)], styles, profiler,
+                                   [n + 1 for n in output_numbers] if len(tables) > len(output_numbers) else None)
+            if sum(1 for _ in islice(iter_structured_sections(grouped, pdf_name), max_sections + 1)) > max_sections:
+              break
+  finally:
+    if isinstance(pdf_file, PdfBuffer): pdf_file.close()
+
+  if report is not None: report['ProcessedPages'] = [page_number + 1 for page_number in output_numbers]
+  if report is not None and len(sample_numbers) > 0: report['SamplePages'] = [page_number + 1 for page_number in sample_numbers]
+
+  # Counting extracted pages, characters, rows and fonts of document taken from font cache and parsed fonts
+  if profiler is not None:
+    font_hits, font_misses = (get_font_cache().stats()[key] - font_stats[key] for key in ('Hits', 'Misses'))
+    profiler.count('Extraction', Pages = len(tables), Rows = sum(lines.shape[0] for lines in tables.values()),
+                   Characters = sum(lines['ElementText'].str.len().sum() for lines in tables.values()),
+                   FontCacheHits = font_hits, FontCacheMisses = font_misses)
+
+  # Pages sampled only for style statistics are not grouped into structure
+  if grouped is None:
+    grouped = _group_pages([tables[n] for n in sorted(tables)], styles, profiler,
+                           [n + 1 for n in output_numbers] if len(tables) > len(output_numbers) else None)
+
+  return grouped
+
+def iter_pdf_sections(pdf_path, pdf_name, max_workers = None, progress = None, page_cache = None, report = None, fast = False,
+                      profiler = None, images = None, page_range = None, max_sections = None, style_sample = None):
+  """Function that transform pdf into sections generated one by one, every section is yielded as soon as it is finalized
+  
+  Parameters are the same as parameters of pdf_to_structured_json. Structure of elements is established in the whole
+  document, so the first section is yielded after all pages are extracted.
+
+  Yields
+  ------
+  paragraph : dict
+      Dictionary with structured text of single section
+  """
+  df_pages_text_structured = get_grouped_structure(pdf_path, pdf_name, max_workers = max_workers, progress = progress,
+                                                   page_cache = page_cache, report = report, fast = fast, profiler = profiler,
+                                                   images = images, page_range = page_range, max_sections = max_sections,
+                                                   style_sample = style_sample)
+  yield from islice(iter_structured_sections(df_pages_text_structured, pdf_name.split('.pdf')[0]), max_sections)
+
+def pdf_to_structured_json(pdf_path, pdf_name, max_workers = None, report_memory = False, progress = None, page_cache = None, report = None,
+                           fast = False, nested = False, profiler = None, images = None, page_range = None, max_sections = None,
+                           style_sample = None):
+  """Function that transform pdf into structured list of sections
+  
+  Parameters
+  ----------
+  pdf_path : str, file-like object or bytes-like
+      Path to directory with pdf file, seekable binary file-like object or buffer (bytes, bytearray, memoryview, mmap)
+      with content of pdf file. Pages are extracted in worker processes (max_workers) only if path is given
+  pdf_name : str
+      File name
+  max_workers : int
+      Number of processes used to extract pages in parallel, pages are extracted in current process if not given
+  report_memory : bool
+      If True, peak memory allocated during conversion is returned together with sections
+  progress : callable
+      Function called with number of extracted pages while pages are extracted
+  page_cache : cache.PageCache
+      Cache with line details of pages, if given only pages that are not in cache are extracted
+  report : dict
+      Dictionary which is filled with details of conversion - numbers of converted pages ('ProcessedPages'), of pages
+      sampled for styles ('SamplePages') and of reused and extracted pages if page_cache is given
+  fast : bool
+      If True, chars are collected without pdfminer layout analysis, which is much faster, but lines keep content stream order
+  nested : bool
+      If True, document is returned as tree of sections (see table_to_structured_json)
+  profiler : profiling.StageProfiler
+      Profiler which records wall time, counts and peak memory of every stage
+  images : extracting_images.ImageExtractor
+      Collector to which images of pages are added in the same pdfminer pass as text, pages are then extracted
+      in current process without page cache
+  page_range : tuple
+      The first and the last converted page (operational page numbers starting from 1, both included, None as the last page
+      means the last page of document), all pages are converted if not given
+  max_sections : int
+      If given, only this number of the first sections is returned (preview). Pages are extracted one by one in current
+      process and extraction stops as soon as the sections are complete
+  style_sample : int
+      Number of pages spread over document which are extracted in addition to converted pages, so main font, header
+      and footer of page range or preview are estimated from the whole document (only converted pages are used if not given)
+
+  Returns
+  -------
+  list_of_pargraphs : list
+      List of dictionaries with structured text (or tree of sections if nested is True)
+  peak_memory : int
+      Peak memory allocated during conversion in bytes (returned only if report_memory is True)
+  """
+  if report_memory:
+    return measure_peak_memory(pdf_to_structured_json, pdf_path, pdf_name, max_workers = max_workers, progress = progress,
+                               page_cache = page_cache, report = report, fast = fast, nested = nested, profiler = profiler,
+                               images = images, page_range = page_range, max_sections = max_sections, style_sample = style_sample)
+
+  # Grouping elements of pdf file by structure
+  df_pages_text_structured = get_grouped_structure(pdf_path, pdf_name, max_workers = max_workers, progress = progress,
+                                                   page_cache = page_cache, report = report, fast = fast, profiler = profiler,
+                                                   images = images, page_range = page_range, max_sections = max_sections,
+                                                   style_sample = style_sample)
   # Transforming table to list of sections in form of dictionary
-  list_of_pargraphs = table_to_structured_json(df_pages_text_structured, pdf_name.split('.pdf')[0])
+  with profile_stage(profiler, 'StructuredJson'):
+    list_of_pargraphs = table_to_structured_json(df_pages_text_structured, pdf_name.split('.pdf')[0], nested = nested,
+                                                 max_sections = max_sections)
 
-  return list_of_pargraphs
\ No newline at end of file
+  if profiler is not None:
+    profiler.count('StructuredJson', Sections = len(list_of_pargraphs))
+
+  return list_of_pargraphs
@@ -0,0 +1,508 @@
+import cProfile
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .admission import MemoryEstimator, get_document_size, get_memory, reset_peak_memory
+from .profiling import StageProfiler
+
+# Conversion modules (pandas, numpy, pdfminer) are imported only in worker processes, so they do not slow down
+# start of application which only queues jobs
+
+# Queue used by worker process to report progress of conversions and its readiness to parent process
+_progress_queue = None
+# Cache with line details of pages shared by worker processes
+_page_cache = None
+# If True, peak memory of stages is traced in worker processes
+_trace_memory = False
+
+# First item of message sent by worker process when it is ready to convert documents (other messages start with job id)
+_WORKER_READY = 'worker-ready'
+
+def _init_worker(progress_queue, page_cache, trace_memory, warm_up_file = None):
+  """Function that stores progress queue, page cache and memory tracing setting in worker process
+
+  If warm_up_file is given, conversion modules are imported and the file is converted once before the first job,
+  so the first conversion does not pay for imports and cold pdfminer caches. Seconds of both phases are reported
+  to parent process, failed warm-up is reported with its error and worker stays usable.
+  """
+  global _progress_queue, _page_cache, _trace_memory
+  _progress_queue = progress_queue
+  _page_cache = page_cache
+  _trace_memory = trace_memory
+
+  if warm_up_file is not None:
+    profiler, error = StageProfiler(), None
+    try:
+      with profiler.stage('Imports'):
+        from .functions import pdf_to_structured_json
+      with profiler.stage('WarmUp'):
+        pdf_to_structured_json(os.path.dirname(warm_up_file), os.path.basename(warm_up_file))
+    except Exception as e:
+      error = str(e)
+    phases = {name: stage['Seconds'] for name, stage in profiler.stages.items()}
+    _progress_queue.put((_WORKER_READY, os.getpid(), {'Phases': phases, 'Error': error}))
+
+def get_stream_part_file(stream_file, job_id):
+  """Function that returns path of file to which job writes sections until its stream file is complete"""
+  return f'{stream_file}.{job_id}.part'
+
+def _write_sections(stream_file, sections, part_file):
+  """Function that writes sections to file as newline-delimited JSON, every line is flushed as soon as section is generated
+
+  File is written under part_file name and renamed when it is complete, so jobs writing the same stream file
+  (e.g. in output directory) never mix their lines and the file is never left incomplete. Part file is removed on failure.
+  """
+  try:
+    with open(part_file, 'w') as f:
+      for paragraph in sections:
+        f.write(json.dumps(paragraph) + '\n')
+        f.flush()
+  except BaseException:
+    if os.path.exists(part_file): os.remove(part_file)
+    raise
+  os.replace(part_file, stream_file)
+
+def _convert(job_id, pdf_path, pdf_name, profile_file = None, stream_file = None, image_directory = None, options = None):
+  """Function that converts pdf file in worker process and reports number of extracted pages, returns sections, conversion report and stages
+
+  If profile_file is given, conversion is run under cProfile and statistics are saved to this file. If stream_file is given,
+  sections are written to this file one by one as newline-delimited JSON and they are not returned. If image_directory is given,
+  images of pages are saved to this directory as PNG files and listed in report. Options (page_range, max_sections,
+  style_sample) are passed to conversion. Peak resident memory of worker process during conversion ('PeakMemory')
+  and its increase over memory before conversion ('MemoryIncrease') are added to report.
+  """
+  from .functions import pdf_to_structured_json, iter_pdf_sections, get_page_count
+  from .extracting_images import ImageExtractor
+
+  page_count = get_page_count(f'{pdf_path}/{pdf_name}')
+  _progress_queue.put((job_id, 0, page_count))
+
+  def progress(pages_processed):
+    _progress_queue.put((job_id, pages_processed, page_count))
+
+  report, profiler = {}, StageProfiler(trace_memory = _trace_memory)
+  profile = cProfile.Profile() if profile_file is not None else None
+
+  # Peak memory is reset, so it is measured for this conversion only if system allows it
+  peak_reset = reset_peak_memory()
+  memory_before = get_memory()[0] if peak_reset else None
+  images = ImageExtractor(image_directory) if image_directory is not None else None
+  options = options or {}
+
+  if profile is not None: profile.enable()
+  try:
+    if stream_file is not None:
+      _write_sections(stream_file, iter_pdf_sections(pdf_path, pdf_name, progress = progress, page_cache = _page_cache,
+                                                     report = report, profiler = profiler, images = images, **options),
+                      get_stream_part_file(stream_file, job_id))
+      list_of_pargraphs = None
+      report['StreamFile'] = stream_file
+    else:
+      list_of_pargraphs = pdf_to_structured_json(pdf_path, pdf_name, progress = progress, page_cache = _page_cache,
+                                                 report = report, profiler = profiler, images = images, **options)
+    if images is not None:
+      report['Images'] = images.close()
+  finally:
+    if profile is not None:
+      profile.disable()
+      profile.dump_stats(profile_file)
+      report['ProfileFile'] = profile_file
+
+  report['PeakMemory'] = get_memory()[1]
+  report['MemoryIncrease'] = report['PeakMemory'] - memory_before if memory_before is not None else None
+
+  return list_of_pargraphs, report, profiler.stages
+
+def _get_result_page_count(list_of_pargraphs):
+  """Function that returns the last operational page number of sections ('1, 2' for section on two pages), None without sections"""
+  numbers = [int(number) for paragraph in list_of_pargraphs
+             for number in str(paragraph.get('OperationalPageNumber', '')).split(', ') if number.isdigit()]
+  return max(numbers) if len(numbers) > 0 else None
+
+class QueueFullError(Exception):
+  """Exception raised when job is submitted while queue of waiting jobs is full"""
+
+  def __init__(self, retry_after):
+    super().__init__(f'Too many conversions in queue, retry after {retry_after} s')
+    self.retry_after = retry_after
+
+class Job:
+  """Conversion of single pdf file submitted to job queue"""
+
+  def __init__(self, pdf_name):
+    self.id = uuid.uuid4().hex
+    self.pdf_name = pdf_name
+    self.status = 'queued'
+    self.pages_processed, self.page_count = 0, None
+    self.file_size, self.memory_estimate = None, None
+    self.result, self.error = None, None
+    self.report = {}
+    self.stages = {}
+    self.future = None
+    self._task, self._on_done, self._on_finished = None, None, None
+    # False while number of pages of job is counted for its memory estimate
+    self._sized = True
+    self.submitted, self.finished = time.time(), None
+    self._finished_event = threading.Event()
+
+  def wait(self, timeout = None):
+    """Function that waits until job is finished and its result is stored, returns False on timeout"""
+    return self._finished_event.wait(timeout)
+
+  def to_dict(self):
+    """Function that returns status of job"""
+    return {'JobId': self.id,
+            'FileName': self.pdf_name,
+            'Status': self.status,
+            'PagesProcessed': self.pages_processed,
+            'PageCount': self.page_count,
+            'Error': self.error,
+            'MemoryEstimate': self.memory_estimate,
+            **self.report,
+            'Stages': self.stages}
+
+class JobQueue:
+  """Queue of conversions executed by bounded pool of worker processes outside of event loop
+
+  Parameters
+  ----------
+  max_workers : int
+      Number of conversions running at the same time
+  max_queued : int
+      Number of jobs that can wait for free worker, further jobs are rejected
+  max_finished_jobs : int
+      Number of finished jobs that are kept with their results
+  page_cache : cache.PageCache
+      Cache with line details of pages, if given workers extract only pages that are not in cache
+  metrics : profiling.ConversionMetrics
+      Metrics to which stages of finished conversions are added
+  trace_memory : bool
+      If True, peak memory of every stage is traced in worker processes (it slows down conversions)
+  warm_up_file : str
+      If given, worker processes are started right away and every worker converts this pdf file before it is ready
+      (see ready), otherwise workers are started and import conversion modules with the first job
+  memory_budget : int
+      If given, memory of every job is estimated from its number of pages and file size before it runs and jobs are
+      started (in order of submission) only while sum of estimates of running jobs stays under this number of bytes,
+      other jobs wait in queue. Job with bigger estimate than budget runs alone
+  memory_estimator : admission.MemoryEstimator
+      Estimator of memory of jobs, it learns from peak memory of finished jobs
+  """
+
+  def __init__(self, max_workers, max_queued, max_finished_jobs = 1000, page_cache = None, metrics = None, trace_memory = False,
+               warm_up_file = None, memory_budget = None, memory_estimator = None):
+    self.max_workers = max_workers
+    self.max_queued = max_queued
+    self.max_finished_jobs = max_finished_jobs
+    self.metrics = metrics
+    self.warm_up_file = warm_up_file
+    self.page_cache, self.trace_memory = page_cache, trace_memory
+    self.memory_budget = memory_budget
+    self.memory_estimator = memory_estimator if memory_estimator is not None else MemoryEstimator()
+    self.workers, self.ready_seconds = {}, None
+    # Jobs waiting for memory, running jobs are submitted to executor
+    self._waiting, self._running = deque(), {}
+    self._jobs = OrderedDict()
+    self._lock = threading.Lock()
+    self._started = time.perf_counter()
+    self._ready_event = threading.Event()
+    self._closed = False
+    if warm_up_file is None: self._ready_event.set()
+
+    # Worker processes report progress through queue read by listener thread
+    self._progress_queue = multiprocessing.Queue()
+    self._executor = self._create_executor()
+    self._listener = threading.Thread(target = self._listen_progress, daemon = True)
+    self._listener.start()
+
+  def _create_executor(self):
+    """Function that starts pool of worker processes"""
+    executor = ProcessPoolExecutor(max_workers = self.max_workers, initializer = _init_worker,
+                                   initargs = (self._progress_queue, self.page_cache, self.trace_memory, self.warm_up_file))
+
+    # Submitted task starts all worker processes, so they warm up before the first upload
+    if self.warm_up_file is not None:
+      executor.submit(os.getpid)
+    return executor
+
+  def _replace_executor(self, broken):
+    """Function that replaces pool which worker process died (e.g. killed for lack of memory), the pool is not usable anymore
+
+    Jobs that were running in broken pool fail, jobs submitted later run in new pool.
+    """
+    with self._lock:
+      if self._executor is not broken or self._closed:
+        return
+      self._executor = self._create_executor()
+      self.workers = {}
+    broken.shutdown(wait = False)
+
+  def _listen_progress(self):
+    """Function that updates progress of jobs and readiness of workers with messages sent by worker processes"""
+    while True:
+      message = self._progress_queue.get()
+      if message is None:
+        break
+      if message[0] == _WORKER_READY:
+        self._add_ready_worker(*message[1:])
+        continue
+      job_id, pages_processed, page_count = message
+      with self._lock:
+        job = self._jobs.get(job_id)
+        if job is not None and job.status in ('queued', 'running'):
+          job.status = 'running'
+          job.pages_processed, job.page_count = pages_processed, page_count
+
+  def _add_ready_worker(self, pid, worker):
+    """Function that records warmed up worker, queue is ready when all workers are warmed up"""
+    with self._lock:
+      self.workers[pid] = {'Pid': pid, **worker}
+      if len(self.workers) < self.max_workers or self._ready_event.is_set():
+        return
+      self.ready_seconds = time.perf_counter() - self._started
+      phases = {f'Worker{name}': max(w['Phases'].get(name, 0) for w in self.workers.values()) for name in worker['Phases']}
+
+    # The slowest worker is reported for every phase
+    if self.metrics is not None:
+      self.metrics.observe_startup({**phases, 'WorkersReady': self.ready_seconds})
+    self._ready_event.set()
+
+  def ready(self):
+    """Function that returns True if all worker processes are warmed up (always True without warm-up file)"""
+    return self._ready_event.is_set()
+
+  def wait_ready(self, timeout = None):
+    """Function that waits until all worker processes are warmed up, returns False on timeout"""
+    return self._ready_event.wait(timeout)
+
+  def pending(self):
+    """Function that returns number of jobs that are waiting or running"""
+    with self._lock:
+      return sum(1 for job in self._jobs.values() if job.status in ('queued', 'running'))
+
+  def submit(self, pdf_path, pdf_name, on_done = None, profile_directory = None, stream_file = None, image_directory = None,
+             options = None, on_finished = None):
+    """Function that submits conversion of pdf file
+
+    Parameters
+    ----------
+    pdf_path : str
+        Path to pdf file
+    pdf_name : str
+        File name
+    on_done : callable
+        Function called with finished job if conversion succeeded
+    profile_directory : str
+        If given, conversion is run under cProfile and statistics are saved to this directory as '<job id>.prof'
+    stream_file : str
+        If given, sections are written to this file as newline-delimited JSON as soon as they are finalized
+        (to file get_stream_part_file until it is complete), result of job is not kept
+    image_directory : str
+        If given, images of pages are extracted in the same pass as text to this directory and listed in 'Images' of job status
+    options : dict
+        Options of partial conversion passed to pdf_to_structured_json ('page_range', 'max_sections', 'style_sample')
+    on_finished : callable
+        Function called with every finished job (also failed job) after on_done, when job is not waited for anymore
+        (e.g. to remove files of job)
+
+    Returns
+    -------
+    job : Job
+        Submitted job
+    """
+    job = Job(pdf_name)
+
+    # Memory of job is estimated before it runs, file that does not exist fails in worker process as without budget.
+    # Pages are counted in worker process, so pdf file is not parsed by event loop and pdfminer is not imported here
+    pdf_file = os.path.join(pdf_path, pdf_name)
+    if self.memory_budget is not None and os.path.exists(pdf_file):
+      job.file_size, job._sized = os.path.getsize(pdf_file), False
+
+    with self._lock:
+      pending = sum(1 for j in self._jobs.values() if j.status in ('queued', 'running'))
+      if pending >= self.max_workers + self.max_queued:
+        raise QueueFullError(retry_after = self.retry_after(pending))
+      self._jobs[job.id] = job
+      profile_file = os.path.join(profile_directory, f'{job.id}.prof') if profile_directory is not None else None
+      job._task = (_convert, job.id, pdf_path, pdf_name, profile_file, stream_file, image_directory, options)
+      job._on_done, job._on_finished = on_done, on_finished
+      self._waiting.append(job)
+      admitted = self._admit()
+
+    if not job._sized:
+      self._count_pages(job, pdf_file)
+    self._start(admitted)
+    return job
+
+  def _count_pages(self, job, pdf_file):
+    """Function that counts pages of pdf file of waiting job in worker process, memory of job is estimated when they are counted"""
+    executor = self._executor
+    try:
+      future = executor.submit(get_document_size, pdf_file)
+    except RuntimeError:
+      # Job is estimated without number of pages if executor was shut down or is broken
+      self._set_page_count(job, None)
+      return
+    future.add_done_callback(lambda future: self._pages_counted(job, future, executor))
+
+  def _pages_counted(self, job, future, executor):
+    """Function that stores number of pages counted in worker process, document that could not be counted counts as single page"""
+    error = None if future.cancelled() else future.exception()
+    if isinstance(error, BrokenProcessPool):
+      self._replace_executor(executor)
+    self._set_page_count(job, future.result()[0] if not future.cancelled() and error is None else None)
+
+  def _set_page_count(self, job, page_count):
+    """Function that estimates memory of job from its number of pages and admits waiting jobs"""
+    with self._lock:
+      job.page_count = page_count
+      job.memory_estimate = self.memory_estimator.estimate(page_count, job.file_size)
+      job._sized = True
+      admitted = self._admit()
+    self._start(admitted)
+
+  def _admit(self):
+    """Function that takes jobs which fit into memory budget from queue of waiting jobs (lock is held by caller)
+
+    Jobs are admitted in order of submission, so big job is not overtaken by small jobs forever. Job is admitted only
+    after its pages are counted. Without memory budget every job is admitted and executor keeps it until worker is free.
+    """
+    admitted = []
+    while len(self._waiting) > 0:
+      job = self._waiting[0]
+      if self.memory_budget is not None:
+        if not job._sized:
+          break
+        running_memory = sum(j.memory_estimate or 0 for j in self._running.values())
+        if len(self._running) >= self.max_workers:
+          break
+        if len(self._running) > 0 and running_memory + (job.memory_estimate or 0) > self.memory_budget:
+          break
+      self._waiting.popleft()
+      self._running[job.id] = job
+      admitted.append(job)
+    return admitted
+
+  def _start(self, jobs):
+    """Function that submits admitted jobs to worker processes, broken pool is replaced before job is submitted again"""
+    for job in jobs:
+      try:
+        executor = self._executor
+        try:
+          job.future = executor.submit(*job._task)
+        except BrokenProcessPool:
+          self._replace_executor(executor)
+          executor = self._executor
+          job.future = executor.submit(*job._task)
+      except RuntimeError as e:
+        # Executor was shut down while job was waiting
+        with self._lock:
+          self._running.pop(job.id, None)
+          job.status, job.error, job.finished = 'failed', str(e), time.time()
+        self._notify_finished(job)
+        continue
+      job.future.add_done_callback(lambda future, job = job, executor = executor: self._finish(job, future, job._on_done, executor))
+
+  def memory(self):
+    """Function that returns memory budget, sum of memory estimates of running jobs and numbers of running and waiting jobs"""
+    with self._lock:
+      return {'MemoryBudget': self.memory_budget,
+              'RunningMemoryEstimate': sum(job.memory_estimate or 0 for job in self._running.values()),
+              'RunningJobs': len(self._running),
+              'WaitingJobs': len(self._waiting)}
+
+  def add_finished(self, pdf_name, result):
+    """Function that registers job which result is already known (e.g. from cache)"""
+    job = Job(pdf_name)
+    job.status, job.result, job.finished = 'done', result, time.time()
+    # Number of pages is taken from sections, pages after the last section are not counted
+    job.page_count = _get_result_page_count(result)
+    job.pages_processed = job.page_count or 0
+    job._finished_event.set()
+    with self._lock:
+      self._jobs[job.id] = job
+      self._remove_old_jobs()
+    return job
+
+  def _finish(self, job, future, on_done, executor = None):
+    """Function that stores result of finished conversion, pool in which worker process of job died is replaced"""
+    # Future of job that did not start is cancelled when queue is shut down, it has no exception
+    error = 'Job was cancelled' if future.cancelled() else future.exception()
+    if isinstance(error, BrokenProcessPool) and executor is not None:
+      self._replace_executor(executor)
+    with self._lock:
+      job.finished = time.time()
+      if error is None:
+        job.status = 'done'
+        job.result, job.report, job.stages = future.result()
+        if job.page_count is not None: job.pages_processed = job.page_count
+      else:
+        job.status, job.error = 'failed', str(error)
+      self._remove_old_jobs()
+
+      # Memory of finished job is released for waiting jobs
+      self._running.pop(job.id, None)
+      admitted = self._admit()
+
+    # Estimator learns from memory of conversion on top of memory of worker process before it
+    if error is None and job.file_size is not None and job.report.get('MemoryIncrease') is not None:
+      self.memory_estimator.observe(job.page_count, job.file_size, job.report['MemoryIncrease'])
+
+    self._start(admitted)
+
+    if self.metrics is not None:
+      if error is None: self.metrics.observe(job.stages, memory = job.report.get('MemoryIncrease'))
+      else: self.metrics.observe_failure()
+
+    try:
+      if error is None and on_done is not None:
+        on_done(job)
+    finally:
+      self._notify_finished(job)
+
+  def _notify_finished(self, job):
+    """Function that wakes up threads waiting for job and calls its on_finished function"""
+    job._finished_event.set()
+    if job._on_finished is not None:
+      job._on_finished(job)
+
+  def _remove_old_jobs(self):
+    """Function that forgets the oldest finished jobs over the limit"""
+    finished = [job_id for job_id, job in self._jobs.items() if job.status in ('done', 'failed')]
+    for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+      del self._jobs[job_id]
+
+  def retry_after(self, pending):
+    """Function that estimates number of seconds after which queue should have free place"""
+    with_durations = [job.finished - job.submitted for job in self._jobs.values() if job.finished is not None]
+    average_duration = sum(with_durations) / len(with_durations) if with_durations else 10
+    return max(1, round(average_duration * (pending - self.max_workers - self.max_queued + 1) / self.max_workers))
+
+  def get(self, job_id):
+    """Function that returns job with given id or None"""
+    with self._lock:
+      return self._jobs.get(job_id)
+
+  def shutdown(self):
+    """Function that stops worker processes and progress listener, jobs waiting for memory are marked as failed"""
+    with self._lock:
+      self._closed = True
+      waiting, self._waiting = list(self._waiting), deque()
+      for job in waiting:
+        job.status, job.error, job.finished = 'failed', 'Job queue was shut down', time.time()
+      # Jobs submitted to executor which did not start are cancelled (executor cancels them itself only since Python 3.9)
+      submitted = [job.future for job in self._running.values() if job.future is not None]
+    for job in waiting:
+      self._notify_finished(job)
+    for future in submitted:
+      future.cancel()
+    self._executor.shutdown(wait = True)
+    self._progress_queue.put(None)
+    self._listener.join()
@@ -1,46 +1,365 @@
-from fastapi import FastAPI, Request, UploadFile
-from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from pathlib import Path
+from backend.app.profiling import StageProfiler, ConversionMetrics
 
-import json
+# Startup of application is timed in phases, they are reported on /ready and /metrics routes
+startup = StageProfiler()
 
-from backend.app.functions import pdf_to_structured_json
+# Conversion modules (pandas, numpy, pdfminer) are not imported here, they are loaded only by worker processes
+with startup.stage('Imports'):
+    from fastapi import FastAPI, Request, UploadFile, HTTPException, Query
+    from fastapi.templating import Jinja2Templates
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
+    from pathlib import Path
+    from typing import List, Optional
+
+    import asyncio
+    import json
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+
+    from backend.app.version import PIPELINE_VERSION
+    from backend.app.cache import ResultCache, PageCache
+    from backend.app.jobs import JobQueue, QueueFullError, get_stream_part_file
+    from backend.app.search import SearchIndex
+    from backend.app.workspace import Workspace, remove_stale_workspaces, atomic_write
 
 # Create a FastAPI app instance
 app = FastAPI()
 
+with startup.stage('Caches'):
+    # Cache of converted documents stored next to output files, its size budget can be set in environment variable
+    result_cache = ResultCache(directory = 'data/cache',
+                               max_bytes = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+                               version = PIPELINE_VERSION)
+
+    # Cache with line details of single pages, so revised documents only re-extract changed pages. With size budget 0
+    # there is no page cache, pages are neither hashed nor saved
+    page_cache_max_bytes = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    page_cache = PageCache(directory = 'data/cache/pages',
+                           max_bytes = page_cache_max_bytes,
+                           version = PIPELINE_VERSION) if page_cache_max_bytes > 0 else None
+
+    # Full-text index of sections of converted documents, it is updated whenever structured JSON is saved
+    search_index = SearchIndex(os.environ.get('SEARCH_INDEX_PATH', 'data/search/index.sqlite'))
+
+# Results are saved to output directory, cache and search index by background thread, so event loop does not wait for them
+result_writer = ThreadPoolExecutor(max_workers = 1)
+
+# Metrics of conversion stages exposed on /metrics route
+metrics = ConversionMetrics()
+
+# Uploads are copied to input directory in chunks of this size, bigger uploads than maximum size (can be set in environment variable) are rejected
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+
+# Directory with temporary workspaces of requests - every upload is converted from its own directory, which is removed
+# when conversion is finished. Workspaces left by previous run of application are removed at startup
+WORK_DIRECTORY = 'data/work'
+remove_stale_workspaces(WORK_DIRECTORY)
+
+# Directory where images extracted from PDF files are saved as PNG files named by hash of their content, it is kept
+# apart from sample images of data/images
+IMAGE_DIRECTORY = 'data/images/extracted'
+
+# Directory where cProfile statistics of conversions submitted with profile=true are saved
+PROFILE_DIRECTORY = 'data/profiles'
+
+# Small pdf file converted by every worker process at startup, so the first upload does not meet cold worker
+WARM_UP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'warm_up.pdf')
+
+# Pool of worker processes converting documents outside of event loop, number of workers and waiting jobs can be set in environment variables.
+# With memory budget (bytes) conversions are started only while sum of their estimated memory stays under it
+with startup.stage('JobQueue'):
+    job_queue = JobQueue(max_workers = int(os.environ.get('CONVERSION_WORKERS', os.cpu_count() or 1)),
+                         max_queued = int(os.environ.get('CONVERSION_QUEUE_DEPTH', 16)),
+                         page_cache = page_cache,
+                         metrics = metrics,
+                         trace_memory = os.environ.get('CONVERSION_TRACE_MEMORY', '0') == '1',
+                         warm_up_file = WARM_UP_FILE if os.environ.get('CONVERSION_WARM_UP', '1') == '1' else None,
+                         memory_budget = int(os.environ['CONVERSION_MEMORY_BUDGET']) if os.environ.get('CONVERSION_MEMORY_BUDGET') else None)
+
+metrics.observe_startup({phase: stage['Seconds'] for phase, stage in startup.stages.items()})
+
+@app.on_event('shutdown')
+def shutdown_job_queue():
+    job_queue.shutdown()
+    result_writer.shutdown(wait = True)
+
 # Configure Jinja2Templates to use templates from the 'frontend/templates' directory
 templates = Jinja2Templates(directory = './frontend/templates')
 # Mount the '/static' route to serve static files from the 'frontend/static' directory
 app.mount('/static', StaticFiles(directory = './frontend/static'), name = 'static')
 
-# Define a route to handle file uploads via HTTP POST requests
+def save_result(pdf_filename, key, list_of_pargraphs):
+    """Function that saves structured JSON to an output file, to cache of converted documents under cache key of PDF file and to search index"""
+    result_cache.put_by_key(key, list_of_pargraphs)
+    with atomic_write(f"data/output/{pdf_filename.split('.pdf')[0]}.json") as f:
+        json.dump(list_of_pargraphs, f)
+    search_index.update(pdf_filename.split('.pdf')[0], list_of_pargraphs, key = key)
 
-@app.post('/')
-async def upload_file(request: Request, pdf_name: UploadFile):
+async def save_upload(pdf_name, workspace):
+    """Function that copies uploaded PDF file to workspace of request in chunks and returns its cache key
 
-    # Read the content of the uploaded PDF file
-    data = await pdf_name.read()
+    The whole file is never held in memory, cache key is calculated from chunks while they are copied.
+    """
+    hasher, size = result_cache.hasher(), 0
 
-    # Save the PDF file to the specified upload directory
-    with open(f"data/input/{pdf_name.filename}", 'wb') as f:
-        f.write(data)
+    # Workspace belongs only to this request, so no other request reads or overwrites the file
+    with open(workspace.path(pdf_name.filename), 'wb') as f:
+        while chunk := await pdf_name.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code = 413, detail = f'File is bigger than {UPLOAD_MAX_BYTES} bytes')
+            hasher.update(chunk)
+            f.write(chunk)
 
-    # Convert the PDF file to structured JSON using the custom function
-    list_of_pargraphs = pdf_to_structured_json('data/input', pdf_name.filename)
+    return hasher.hexdigest()
 
-    # Save the structured JSON to an output file
-    with open(f"data/output/{pdf_name.filename.split('.pdf')[0]}.json", 'w') as f:
-        json.dump(list_of_pargraphs, f)
+async def submit_upload(pdf_name, profile = False, images = False, options = None):
+    """Function that saves uploaded PDF file and submits its conversion to job queue
+
+    Conversion is profiled with cProfile if profile is True, images of pages are extracted if images is True.
+    Options of partial conversion (page_range, max_sections, style_sample) are passed to pdf_to_structured_json,
+    results of partial conversions are neither cached nor saved to output directory. Uploaded file is saved to workspace
+    of request, which is removed when conversion is finished.
+    """
+    workspace = Workspace(WORK_DIRECTORY)
+    # Only name of uploaded file is used for paths, directories sent by client are ignored
+    file_name = os.path.basename(pdf_name.filename)
+    try:
+        key = await save_upload(pdf_name, workspace)
+
+        # Return finished job if the same file was already converted, otherwise convert the PDF file in worker process
+        list_of_pargraphs = result_cache.get_by_key(key, file_name.split('.pdf')[0]) if not (profile or images or options) else None
+        if list_of_pargraphs is not None:
+            workspace.cleanup()
+            result_writer.submit(save_result, file_name, key, list_of_pargraphs)
+            return job_queue.add_finished(file_name, list_of_pargraphs)
+
+        if profile:
+            os.makedirs(PROFILE_DIRECTORY, exist_ok = True)
+
+        return job_queue.submit(workspace.directory, file_name,
+                                on_done = lambda job: result_writer.submit(save_result, file_name, key, job.result) if not options else None,
+                                profile_directory = PROFILE_DIRECTORY if profile else None,
+                                image_directory = IMAGE_DIRECTORY if images else None,
+                                options = options,
+                                on_finished = lambda job: workspace.release())
+    except QueueFullError as e:
+        workspace.cleanup()
+        raise HTTPException(status_code = 503, detail = str(e), headers = {'Retry-After': str(e.retry_after)})
+    except BaseException:
+        workspace.cleanup()
+        raise
+
+# Define a route to handle file uploads via HTTP POST requests
+
+@app.post('/')
+async def upload_file(request: Request, pdf_name: UploadFile, profile: bool = False):
+
+    # Convert the PDF file to structured JSON in worker process, event loop keeps serving other requests meanwhile
+    job = await submit_upload(pdf_name, profile)
+    await asyncio.get_running_loop().run_in_executor(None, job.wait)
+    if job.status == 'failed':
+        raise HTTPException(status_code = 500, detail = job.error)
 
     # Convert the structured JSON to a JSON-formatted string
-    list_of_pargraphs_jsoned = json.dumps(list_of_pargraphs)
+    list_of_pargraphs_jsoned = json.dumps(job.result)
 
     # Render the 'result.html' template with relevant data
     return templates.TemplateResponse("result.html", {'request' : request, 'filename': pdf_name.filename, 'pdf_jsoned' : list_of_pargraphs_jsoned})
 
+def stream_cached_sections(list_of_pargraphs, output_file):
+    """Function that streams cached sections as newline-delimited JSON and writes the same lines to output file"""
+    with atomic_write(output_file) as f:
+        for paragraph in list_of_pargraphs:
+            line = json.dumps(paragraph) + '\n'
+            f.write(line)
+            yield line
+
+async def stream_job_sections(job, stream_file):
+    """Function that streams lines of newline-delimited JSON file while worker process writes it, until job is finished"""
+    f, pending = None, ''
+    try:
+        while True:
+            # Job state is checked before reading, so lines written before job finished are never missed
+            finished = job.wait(0)
+
+            # Part file of job is renamed when it is complete, opened file stays readable after rename. Stream file
+            # is read only after job is done, before that it can be output of previous conversion of the same file
+            if f is None:
+                for path in [get_stream_part_file(stream_file, job.id)] + ([stream_file] if job.status == 'done' else []):
+                    try:
+                        f = open(path)
+                        break
+                    except FileNotFoundError:
+                        pass
+
+            # Only complete lines are sent
+            if f is not None:
+                lines, separator, pending = (pending + f.read()).rpartition('\n')
+                if separator:
+                    yield lines + separator
+
+            if finished:
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        if f is not None:
+            f.close()
+
+    if job.status == 'failed':
+        yield json.dumps({'Error': job.error}) + '\n'
+
+def index_streamed_result(key, pdf_filename, output_file):
+    """Function that saves sections of newline-delimited JSON output file to cache of converted documents and to search index
+
+    Sections are read line by line, so the whole document is never held in memory.
+    """
+    with open(output_file) as f:
+        result_cache.put_by_key(key, (json.loads(line) for line in f))
+    with open(output_file) as f:
+        search_index.update(pdf_filename.split('.pdf')[0], (json.loads(line) for line in f), key = key)
+
+def finish_stream_job(job, workspace, output_file):
+    """Function that removes workspace of finished streaming job and part of output file left by failed job"""
+    workspace.release()
+    part_file = get_stream_part_file(output_file, job.id)
+    if job.status == 'failed' and os.path.exists(part_file):
+        os.remove(part_file)
+
+# Define a route streaming sections as newline-delimited JSON as soon as they are finalized, the same lines are written to output file
+@app.post('/stream')
+async def stream_file(pdf_name: UploadFile):
+    # Workspace with uploaded file is removed when conversion job is finished
+    workspace = Workspace(WORK_DIRECTORY)
+    # Only name of uploaded file is used for paths, directories sent by client are ignored
+    file_name = os.path.basename(pdf_name.filename)
+    output_file = f"data/output/{file_name.split('.pdf')[0]}.ndjson"
+    try:
+        key = await save_upload(pdf_name, workspace)
+
+        # Sections of file that was already converted are streamed from cache
+        list_of_pargraphs = result_cache.get_by_key(key, file_name.split('.pdf')[0])
+        if list_of_pargraphs is not None:
+            workspace.cleanup()
+            result_writer.submit(search_index.update, file_name.split('.pdf')[0], list_of_pargraphs, key = key)
+            return StreamingResponse(stream_cached_sections(list_of_pargraphs, output_file), media_type = 'application/x-ndjson')
+
+        # Sections are written to output file while they are streamed, they are indexed when conversion is finished
+        job = job_queue.submit(workspace.directory, file_name,
+                               on_done = lambda job: result_writer.submit(index_streamed_result, key, job.pdf_name, output_file),
+                               stream_file = output_file, on_finished = lambda job: finish_stream_job(job, workspace, output_file))
+    except QueueFullError as e:
+        workspace.cleanup()
+        raise HTTPException(status_code = 503, detail = str(e), headers = {'Retry-After': str(e.retry_after)})
+    except BaseException:
+        workspace.cleanup()
+        raise
+
+    return StreamingResponse(stream_job_sections(job, output_file), media_type = 'application/x-ndjson',
+                             headers = {'X-Job-Id': job.id})
+
+# Define a route to submit conversion job, it returns job id right away. Only range of pages (first_page, last_page)
+# or only the first sections (max_sections) can be converted, style_sample pages are then used to estimate main font
+@app.post('/jobs', status_code = 202)
+async def create_job(pdf_name: UploadFile, profile: bool = False, images: bool = False,
+                     first_page: Optional[int] = Query(None, ge = 1), last_page: Optional[int] = Query(None, ge = 1),
+                     max_sections: Optional[int] = Query(None, ge = 1), style_sample: Optional[int] = Query(None, ge = 1)):
+    if first_page is not None and last_page is not None and first_page > last_page:
+        raise HTTPException(status_code = 422, detail = 'first_page must not be greater than last_page')
+
+    options = {}
+    if first_page is not None or last_page is not None: options['page_range'] = (first_page or 1, last_page)
+    if max_sections is not None: options['max_sections'] = max_sections
+    if style_sample is not None: options['style_sample'] = style_sample
+
+    job = await submit_upload(pdf_name, profile, images, options)
+    return job.to_dict()
+
+# Define a route to submit conversion jobs of multiple files, files that do not fit into queue are marked as rejected
+@app.post('/jobs/batch', status_code = 202)
+async def create_jobs(pdf_names: List[UploadFile]):
+    jobs = []
+    for pdf_name in pdf_names:
+        try:
+            job = await submit_upload(pdf_name)
+            jobs.append(job.to_dict())
+        except HTTPException as e:
+            jobs.append({'FileName': pdf_name.filename, 'Status': 'rejected', 'Error': e.detail,
+                         'RetryAfter': int(e.headers['Retry-After'])})
+    return jobs
+
+# Define a route to check status and progress of conversion job
+@app.get('/jobs/{job_id}')
+async def read_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code = 404, detail = 'Job not found')
+    return job.to_dict()
+
+# Define a route returning structured JSON of finished conversion job
+@app.get('/jobs/{job_id}/result')
+async def read_job_result(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code = 404, detail = 'Job not found')
+    if job.status == 'failed':
+        raise HTTPException(status_code = 500, detail = job.error)
+    if job.status != 'done':
+        return JSONResponse(status_code = 409, content = job.to_dict())
+    if 'StreamFile' in job.report:
+        return FileResponse(job.report['StreamFile'], media_type = 'application/x-ndjson')
+    return job.result
+
+# Define a route listing images extracted by conversion job submitted with images=true
+@app.get('/jobs/{job_id}/images')
+async def read_job_images(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code = 404, detail = 'Job not found')
+    if job.status != 'done':
+        return JSONResponse(status_code = 409, content = job.to_dict())
+    if 'Images' not in job.report:
+        raise HTTPException(status_code = 404, detail = 'Images were not extracted')
+    return [{**image, 'Url': f"/images/{image['ImageId']}"} for image in job.report['Images']]
+
+# Define a route serving extracted image, image is read from disk only when it is requested
+@app.get('/images/{image_id}')
+async def read_image(image_id: str):
+    path = os.path.join(IMAGE_DIRECTORY, f'{image_id}.png')
+    if not all(c in '0123456789abcdef' for c in image_id) or not os.path.exists(path):
+        raise HTTPException(status_code = 404, detail = 'Image not found')
+    return FileResponse(path, media_type = 'image/png')
+
+# Define a route returning cProfile statistics of conversion job submitted with profile=true
+@app.get('/jobs/{job_id}/profile')
+async def read_job_profile(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None or 'ProfileFile' not in job.report:
+        raise HTTPException(status_code = 404, detail = 'Profile not found')
+    return FileResponse(job.report['ProfileFile'], media_type = 'application/octet-stream', filename = f'{job_id}.prof')
+
+# Define a route searching sections of converted documents, the best matching sections are returned first
+@app.get('/search')
+async def search_sections(q: str, limit: int = Query(10, ge = 1, le = 1000), file_name: Optional[str] = None):
+    return search_index.search(q, limit = limit, pdf_name = file_name)
+
+# Define a route reporting readiness of application - status 503 until all worker processes are warmed up
+@app.get('/ready')
+async def read_ready():
+    status = {'Ready': job_queue.ready(),
+              'Startup': {phase: stage['Seconds'] for phase, stage in startup.stages.items()},
+              'WorkersReady': job_queue.ready_seconds,
+              'Workers': list(job_queue.workers.values())}
+    return JSONResponse(status_code = 200 if status['Ready'] else 503, content = status)
+
+# Define a route exposing metrics of conversion stages in Prometheus format
+@app.get('/metrics', response_class = PlainTextResponse)
+async def read_metrics():
+    metrics.observe_admission(job_queue.memory())
+    return PlainTextResponse(metrics.render(), media_type = 'text/plain; version=0.0.4')
+
 # Define a route to handle HTTP GET requests, rendering the 'index.html' template
 @app.get("/", response_class=HTMLResponse)
 async def read_upload(request: Request):
@@ -0,0 +1,392 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from .batch import convert_directory
+from .functions import (PdfBuffer, get_pdf_file, extract_lines_from_pages, group_lines_into_page, get_document_style_index,
+                        get_footer_and_header, get_structure, group_structure, table_to_structured_json, get_main_font,
+                        get_page_rows, split_pages)
+from .profiling import profile_stage
+from .styles import StyleTable, STYLE_COLUMNS
+from .version import PIPELINE_VERSION
+from .workspace import atomic_write
+
+# Stages of conversion in order, output of every stage except the last one can be saved as checkpoint
+STAGES = ('Extraction', 'GroupLinesIntoPage', 'StyleIndex', 'FooterAndHeader', 'Structure', 'GroupStructure', 'StructuredJson')
+
+# Name of file with details of checkpoints of document
+MANIFEST_NAME = 'checkpoint.json'
+
+def save_tables(path, tables):
+  """Function that saves tables column by column into single uncompressed numpy archive (.npz)
+
+  Numeric and boolean columns are stored as they are, columns of strings as one UTF-8 buffer with offsets of values
+  and other object columns (e.g. numbers mixed with NaN or strings) as JSON values in the same layout. Nothing is
+  pickled, so columns are read back without running code and loading takes about as long as reading the file.
+  Index of tables is not saved (tables of stages have default index).
+
+  Parameters
+  ----------
+  path : str
+      Path to archive, it is replaced only when it is completely written
+  tables : dict
+      Tables by name
+  """
+  arrays, manifest = {}, {}
+  for name, table in tables.items():
+    columns = []
+    for position, col in enumerate(table.columns):
+      values, key = table[col].to_numpy(), f'{name}.{position}'
+      if values.dtype != object:
+        kind, arrays[key] = 'array', values
+      elif all(isinstance(value, str) for value in values):
+        kind, (arrays[key], arrays[f'{key}.offsets']) = 'text', _encode_texts(values)
+      else:
+        kind, (arrays[key], arrays[f'{key}.offsets']) = 'json', _encode_texts([json.dumps(_to_python(value)) for value in values])
+      columns.append([col, kind])
+    manifest[name] = {'Columns': columns, 'Rows': table.shape[0]}
+  arrays['manifest'] = np.frombuffer(json.dumps(manifest).encode(), dtype = np.uint8)
+
+  with atomic_write(path, 'wb') as f:
+    np.savez(f, **arrays)
+
+def load_tables(path):
+  """Function that loads tables saved by save_tables, returns dictionary with tables by name"""
+  tables = {}
+  with np.load(path, allow_pickle = False) as data:
+    manifest = json.loads(data['manifest'].tobytes().decode())
+    for name, details in manifest.items():
+      columns = {}
+      for position, (col, kind) in enumerate(details['Columns']):
+        key = f'{name}.{position}'
+        if kind == 'array':
+          columns[col] = data[key]
+        else:
+          values = _decode_texts(data[key], data[f'{key}.offsets'])
+          columns[col] = pd.Series(values if kind == 'text' else [json.loads(value) for value in values], dtype = object)
+      tables[name] = pd.DataFrame(columns, index = pd.RangeIndex(details['Rows']))
+  return tables
+
+def _to_python(value):
+  """Function that converts numpy scalar to Python value, so it can be encoded as JSON"""
+  return value.item() if isinstance(value, np.generic) else value
+
+def _encode_texts(values):
+  """Function that joins strings into UTF-8 buffer, returns buffer and character offsets of strings in it"""
+  offsets = np.zeros(len(values) + 1, dtype = np.int64)
+  np.cumsum([len(value) for value in values], out = offsets[1:])
+  return np.frombuffer(''.join(values).encode('utf-8', 'surrogatepass'), dtype = np.uint8), offsets
+
+def _decode_texts(buffer, offsets):
+  """Function that splits UTF-8 buffer into strings by character offsets (see _encode_texts)"""
+  text = buffer.tobytes().decode('utf-8', 'surrogatepass')
+  offsets = offsets.tolist()
+  return [text[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+def _styles_to_table(styles):
+  return styles.to_frame()[STYLE_COLUMNS]
+
+def _styles_from_table(table):
+  return StyleTable(zip(table['FontName'], table['FontSize'].tolist(), table['FontSColor']))
+
+def state_to_tables(stage, state):
+  """Function that converts output of stage (see run_stage) into tables saved in checkpoint"""
+  tables = {'Styles': _styles_to_table(state['Styles'])}
+  if stage in ('Extraction', 'GroupLinesIntoPage'):
+    pages = state['Pages']
+    tables['Pages'] = pd.concat(pages, ignore_index = True) if len(pages) > 0 else pd.DataFrame()
+    tables['PageSizes'] = pd.DataFrame({'Rows': np.array([page.shape[0] for page in pages], dtype = np.int64)})
+  elif stage in ('StyleIndex', 'FooterAndHeader', 'Structure'):
+    style_index = state['StyleIndex']
+    tables['PagesText'] = style_index['PagesText']
+    tables['PageSizes'] = pd.DataFrame({'Rows': np.array([stop - start for start, stop in style_index['PageRows']], dtype = np.int64)})
+    tables['StyleLengths'] = style_index['StyleLengths']
+  else:
+    tables['Grouped'] = state['Grouped']
+  return tables
+
+def tables_to_state(stage, tables):
+  """Function that converts tables of checkpoint back into output of stage (see state_to_tables)"""
+  state = {'Styles': _styles_from_table(tables['Styles'])}
+  page_rows = get_page_rows(tables['PageSizes']['Rows'].tolist()) if 'PageSizes' in tables else None
+  if stage in ('Extraction', 'GroupLinesIntoPage'):
+    state['Pages'] = split_pages(tables['Pages'], page_rows)
+  elif stage in ('StyleIndex', 'FooterAndHeader', 'Structure'):
+    # Main font is chosen again from style lengths, it does not have to be saved
+    state['StyleIndex'] = {'Styles': state['Styles'],
+                           'PagesText': tables['PagesText'],
+                           'PageRows': page_rows,
+                           'StyleLengths': tables['StyleLengths'],
+                           'MainParagraphFont': get_main_font(tables['StyleLengths'])}
+  else:
+    state['Grouped'] = tables['Grouped']
+  return state
+
+def run_stage(stage, state, pdf_name, fast = False, nested = False):
+  """Function that runs single stage of conversion on output of previous stage
+
+  Stages do the same as pdf_to_structured_json (without page cache, parallel extraction and partial conversion).
+
+  Parameters
+  ----------
+  stage : str
+      Name of stage (see STAGES)
+  state : dict
+      Output of previous stage - style table ('Styles') with pages ('Pages'), style index ('StyleIndex') or table of grouped
+      elements ('Grouped'). For 'Extraction' it is dictionary with path to directory with pdf file ('PdfPath')
+  pdf_name : str
+      File name
+  fast : bool
+      If True, chars are extracted without pdfminer layout analysis
+  nested : bool
+      If True, document is returned as tree of sections
+
+  Returns
+  -------
+  state : dict
+      Output of stage, sections of document ('Sections') for the last stage
+  """
+  if stage == 'Extraction':
+    styles = StyleTable()
+    pdf_file = get_pdf_file(state['PdfPath'], pdf_name)
+    try:
+      pages = extract_lines_from_pages(pdf_file, styles, fast = fast)
+    finally:
+      if isinstance(pdf_file, PdfBuffer): pdf_file.close()
+    return {'Styles': styles, 'Pages': pages}
+
+  styles = state['Styles']
+  if stage == 'GroupLinesIntoPage':
+    return {'Styles': styles, 'Pages': group_lines_into_page(state['Pages'])}
+  if stage == 'StyleIndex':
+    return {'Styles': styles, 'StyleIndex': get_document_style_index(state['Pages'], styles)}
+
+  if stage == 'StructuredJson':
+    return {'Sections': table_to_structured_json(state['Grouped'], pdf_name.split('.pdf')[0], nested = nested)}
+
+  # Document-wide stages return new style index, output of loaded or previous stage stays untouched
+  if stage == 'FooterAndHeader':
+    return {'Styles': styles, 'StyleIndex': get_footer_and_header(state['StyleIndex'])}
+  if stage == 'Structure':
+    return {'Styles': styles, 'StyleIndex': get_structure(state['StyleIndex'])}
+  if stage == 'GroupStructure':
+    return {'Styles': styles, 'Grouped': styles.resolve(group_structure(state['StyleIndex']))}
+  raise ValueError(f'Unknown stage {stage}')
+
+class Checkpoints:
+  """Checkpoints of stages of single document stored in its directory
+
+  Output of every finished stage is saved into file '<stage>.npz' (see save_tables). Manifest of directory keeps version
+  of pipeline, extraction mode and key of pdf file (its modification time and size) from which checkpoints were made,
+  so checkpoints of changed file or other version of pipeline are not used.
+
+  Parameters
+  ----------
+  directory : str
+      Directory of checkpoints of document
+  """
+
+  def __init__(self, directory):
+    self.directory = directory
+
+  def path(self, stage):
+    return os.path.join(self.directory, f'{stage}.npz')
+
+  def manifest(self):
+    """Function that returns manifest of checkpoints or None if there are no checkpoints"""
+    try:
+      with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return None
+
+  def stages(self, key = None, fast = False):
+    """Function that returns stages with saved checkpoints in order of stages
+
+    Parameters
+    ----------
+    key : str
+        Key of current pdf file, checkpoints of other file are not returned (key is not checked if not given)
+    fast : bool
+        Extraction mode of conversion, checkpoints of other mode are not returned
+    """
+    manifest = self.manifest()
+    if (manifest is None or manifest.get('Version') != PIPELINE_VERSION or manifest.get('Fast') != fast or
+        (key is not None and manifest.get('Key') != key)):
+      return []
+    return [stage for stage in STAGES if stage in manifest.get('Stages', []) and os.path.exists(self.path(stage))]
+
+  def load(self, stage):
+    """Function that loads output of stage"""
+    return tables_to_state(stage, load_tables(self.path(stage)))
+
+  def save(self, stage, state, key, fast = False):
+    """Function that saves output of stage, checkpoints of later stages are removed as they are made from other output"""
+    os.makedirs(self.directory, exist_ok = True)
+    manifest = self.manifest()
+    valid = manifest is not None and (manifest.get('Version'), manifest.get('Fast'), manifest.get('Key')) == (PIPELINE_VERSION, fast, key)
+    stages = manifest.get('Stages', []) if valid else []
+    stages = [saved for saved in stages if STAGES.index(saved) < STAGES.index(stage)]
+    for later in STAGES[STAGES.index(stage):]:
+      if os.path.exists(self.path(later)): os.remove(self.path(later))
+
+    save_tables(self.path(stage), state_to_tables(stage, state))
+    with atomic_write(os.path.join(self.directory, MANIFEST_NAME)) as f:
+      json.dump({'Version': PIPELINE_VERSION, 'Fast': fast, 'Key': key, 'Stages': stages + [stage]}, f)
+
+  def clear(self):
+    shutil.rmtree(self.directory, ignore_errors = True)
+
+def get_file_key(pdf_file):
+  """Function that returns key of version of file on disk from its modification time and size, None if file does not exist"""
+  try:
+    stat = os.stat(pdf_file)
+  except OSError:
+    return None
+  return f'file-{stat.st_mtime_ns}-{stat.st_size}'
+
+def run_pipeline(pdf_path, pdf_name, checkpoint_dir, start_stage = None, stop_stage = STAGES[-1], fast = False, nested = False,
+                 save = True, profiler = None, report = None):
+  """Function that converts pdf file stage by stage, saves output of stages as checkpoints and restarts from them
+
+  Stage is restarted from checkpoint of previous stage, so e.g. heuristics of classification of elements ('Structure')
+  can be changed and applied to documents without extracting their pages again. Checkpoints are valid only for the same
+  pdf file (see Checkpoints), checkpoints can be used without pdf file when it is not present anymore.
+
+  Parameters
+  ----------
+  pdf_path : str
+      Path to directory with pdf file
+  pdf_name : str
+      File name
+  checkpoint_dir : str
+      Directory where checkpoints of documents are stored (every document has its own directory there)
+  start_stage : str
+      The first stage that is run (see STAGES), checkpoint of previous stage has to exist. By default conversion
+      continues after the last saved stage
+  stop_stage : str
+      The last stage that is run
+  fast : bool
+      If True, chars are extracted without pdfminer layout analysis
+  nested : bool
+      If True, document is returned as tree of sections
+  save : bool
+      If True, output of every run stage is saved as checkpoint
+  profiler : profiling.StageProfiler
+      Profiler which records wall time of stages and of loading checkpoint ('Checkpoint')
+  report : dict
+      Dictionary which is filled with loaded checkpoint ('Resumed') and stages that were run ('Stages')
+
+  Returns
+  -------
+  output : list or dict
+      List of dictionaries with structured text if the last stage is run, otherwise output of stop stage (see run_stage)
+  """
+  if start_stage is not None and start_stage not in STAGES: raise ValueError(f'Unknown stage {start_stage}')
+  if stop_stage not in STAGES: raise ValueError(f'Unknown stage {stop_stage}')
+
+  checkpoints = Checkpoints(os.path.join(checkpoint_dir, pdf_name.split('.pdf')[0]))
+  key = get_file_key(os.path.join(pdf_path, pdf_name))
+  saved = checkpoints.stages(key, fast = fast)
+  if key is None:
+    # Missing pdf file can not be extracted again, checkpoints made from any version of it are used
+    key = (checkpoints.manifest() or {}).get('Key')
+
+  # Resuming after the last saved stage before stop stage
+  if start_stage is None:
+    saved = [stage for stage in saved if STAGES.index(stage) < STAGES.index(stop_stage)]
+    start_stage = STAGES[STAGES.index(saved[-1]) + 1] if len(saved) > 0 else STAGES[0]
+  if STAGES.index(start_stage) > STAGES.index(stop_stage): raise ValueError(f'Stage {start_stage} is after stage {stop_stage}')
+
+  resumed = None
+  state = {'PdfPath': pdf_path}
+  if start_stage != STAGES[0]:
+    resumed = STAGES[STAGES.index(start_stage) - 1]
+    if resumed not in saved:
+      raise FileNotFoundError(f'Checkpoint of stage {resumed} of {pdf_name} does not exist')
+    with profile_stage(profiler, 'Checkpoint'):
+      state = checkpoints.load(resumed)
+
+  stages = STAGES[STAGES.index(start_stage):STAGES.index(stop_stage) + 1]
+  for stage in stages:
+    with profile_stage(profiler, stage):
+      state = run_stage(stage, state, pdf_name, fast = fast, nested = nested)
+    if save and stage != STAGES[-1]:
+      with profile_stage(profiler, 'Checkpoint'):
+        checkpoints.save(stage, state, key, fast = fast)
+
+  if report is not None: report.update({'Resumed': resumed, 'Stages': list(stages)})
+
+  return state['Sections'] if stop_stage == STAGES[-1] else state
+
+def run_directory(input_dir, checkpoint_dir, output_dir = None, start_stage = None, stop_stage = STAGES[-1], fast = False,
+                  max_workers = None):
+  """Function that runs stages of all documents in parallel worker processes (see batch.convert_directory)
+
+  Documents are pdf files of input directory and documents with checkpoints (their pdf files do not have to be present
+  if conversion starts after extraction).
+
+  Parameters
+  ----------
+  input_dir : str
+      Directory with pdf files
+  checkpoint_dir : str
+      Directory with checkpoints of documents
+  output_dir : str
+      Directory where structured JSON files are saved, they are not saved if not given or if the last stage is not run
+  start_stage : str
+      The first stage that is run (see run_pipeline)
+  stop_stage : str
+      The last stage that is run
+  fast : bool
+      If True, chars are extracted without pdfminer layout analysis
+  max_workers : int
+      Number of worker processes, by default number of CPUs
+
+  Returns
+  -------
+  report : dict
+      Numbers of converted and failed documents, time, throughput and failures per file
+  """
+  pdf_names = {name for name in os.listdir(input_dir) if name.lower().endswith('.pdf')} if os.path.isdir(input_dir) else set()
+  if start_stage not in (None, STAGES[0]) and os.path.isdir(checkpoint_dir):
+    # Documents which pdf files were removed are restarted from their checkpoints
+    converted = {name.split('.pdf')[0] for name in pdf_names}
+    pdf_names |= {f'{entry.name}.pdf' for entry in os.scandir(checkpoint_dir) if entry.is_dir() and entry.name not in converted}
+
+  # Every document is run from its checkpoints, output of stages before the last one is not structured JSON
+  converter = partial(run_pipeline, checkpoint_dir = checkpoint_dir, start_stage = start_stage, stop_stage = stop_stage, fast = fast)
+  return convert_directory(input_dir, output_dir if stop_stage == STAGES[-1] else None, max_workers = max_workers, overwrite = True,
+                           converter = converter, pdf_names = pdf_names)
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Convert pdf files of directory stage by stage with checkpoints, '
+                                                 'conversion can be restarted from any stage')
+  parser.add_argument('input_dir', help = 'directory with pdf files')
+  parser.add_argument('checkpoint_dir', help = 'directory where outputs of stages are saved')
+  parser.add_argument('--output', help = 'directory where structured JSON files are saved')
+  parser.add_argument('--start', choices = STAGES, default = None,
+                      help = 'the first stage that is run, it starts from checkpoint of previous stage (default continue after the last saved stage)')
+  parser.add_argument('--stop', choices = STAGES, default = STAGES[-1], help = f'the last stage that is run (default {STAGES[-1]})')
+  parser.add_argument('--fast', action = 'store_true', help = 'extract chars without pdfminer layout analysis')
+  parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes (default number of CPUs)')
+  args = parser.parse_args(args)
+
+  report = run_directory(args.input_dir, args.checkpoint_dir, output_dir = args.output, start_stage = args.start,
+                         stop_stage = args.stop, fast = args.fast, max_workers = args.workers)
+
+  print(f"Processed {report['Documents']} documents in {report['Seconds']} s ({report['DocumentsPerSecond']} documents/s), "
+        f"failed {report['Failed']}")
+  for pdf_name, error in report['Failures'].items():
+    print(f'Failed {pdf_name}: {error}')
+
+  return report
+
+if __name__ == '__main__':
+  sys.exit(1 if main()['Failed'] else 0)
@@ -0,0 +1,133 @@
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+class StageProfiler:
+  """Recorder of wall time, counts and peak memory of stages of single conversion
+
+  Recorded stages are kept in dictionary 'stages' (stage name -> {'Seconds', 'PeakMemory', counts}),
+  which can be sent from worker process together with result.
+
+  Parameters
+  ----------
+  trace_memory : bool
+      If True, peak memory allocated during every stage is traced. Tracing slows down the stages, memory is not
+      traced if tracing was already started by caller
+  """
+
+  def __init__(self, trace_memory = False):
+    self.trace_memory = trace_memory
+    self.stages = {}
+
+  @contextmanager
+  def stage(self, name):
+    """Context manager that measures wall time and peak memory of code inside as stage with given name"""
+    trace = self.trace_memory and not tracemalloc.is_tracing()
+    if trace: tracemalloc.start()
+
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      stage = self.stages.setdefault(name, {})
+      stage['Seconds'] = stage.get('Seconds', 0) + time.perf_counter() - start
+      if trace:
+        stage['PeakMemory'] = max(stage.get('PeakMemory', 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+  def count(self, name, **counts):
+    """Function that adds counts (e.g. Pages=10) to stage with given name"""
+    stage = self.stages.setdefault(name, {})
+    for key, value in counts.items():
+      stage[key] = stage.get(key, 0) + int(value)
+
+def profile_stage(profiler, name):
+  """Function that returns context manager measuring stage with profiler, or doing nothing if profiler is None"""
+  return nullcontext() if profiler is None else profiler.stage(name)
+
+class ConversionMetrics:
+  """Aggregated metrics of stages of all conversions, rendered in Prometheus text format
+
+  Wall time and peak memory of stages are collected as histograms, counts of stages (pages, characters, rows, ...)
+  and numbers of conversions as counters. Seconds of startup phases of application and state of memory admission
+  of job queue are kept as gauges.
+  """
+
+  SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+  MEMORY_BUCKETS = tuple(2 ** exponent for exponent in range(20, 32, 2))
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.conversions = {'done': 0, 'failed': 0}
+    self._histograms = {'Seconds': {}, 'PeakMemory': {}}
+    self._counts = {}
+    self.startup = {}
+    self.admission = {}
+
+  def observe(self, stages, memory = None):
+    """Function that adds stages of successful conversion (see StageProfiler.stages) to metrics
+
+    Increase of resident memory of worker process during conversion (memory) is added as peak memory of stage 'Conversion'.
+    """
+    if memory is not None:
+      stages = {**stages, 'Conversion': {**stages.get('Conversion', {}), 'PeakMemory': memory}}
+    with self._lock:
+      self.conversions['done'] += 1
+      for name, stage in stages.items():
+        for key, value in stage.items():
+          if key in self._histograms:
+            buckets = self.SECONDS_BUCKETS if key == 'Seconds' else self.MEMORY_BUCKETS
+            histogram = self._histograms[key].setdefault(name, {'Buckets': [0] * len(buckets), 'Sum': 0, 'Count': 0})
+            for i, bound in enumerate(buckets):
+              if value <= bound: histogram['Buckets'][i] += 1
+            histogram['Sum'] += value
+            histogram['Count'] += 1
+          else:
+            self._counts[(name, key)] = self._counts.get((name, key), 0) + value
+
+  def observe_startup(self, phases):
+    """Function that adds seconds of startup phases (e.g. {'Imports': 0.5}) to metrics"""
+    with self._lock:
+      self.startup.update(phases)
+
+  def observe_admission(self, state):
+    """Function that sets state of memory admission of job queue (see jobs.JobQueue.memory)"""
+    with self._lock:
+      self.admission = {key: value for key, value in state.items() if value is not None}
+
+  def observe_failure(self):
+    """Function that counts failed conversion"""
+    with self._lock:
+      self.conversions['failed'] += 1
+
+  def render(self):
+    """Function that returns metrics in Prometheus text exposition format"""
+    lines = ['# HELP pdf_conversions_total Number of finished conversions by status',
+             '# TYPE pdf_conversions_total counter']
+    with self._lock:
+      lines += [f'pdf_conversions_total{{status="{status}"}} {value}' for status, value in self.conversions.items()]
+
+      for key, metric, description, buckets in [
+          ('Seconds', 'pdf_conversion_stage_seconds', 'Wall time of conversion stages', self.SECONDS_BUCKETS),
+          ('PeakMemory', 'pdf_conversion_stage_peak_memory_bytes', 'Peak memory allocated during conversion stages', self.MEMORY_BUCKETS)]:
+        lines += [f'# HELP {metric} {description}', f'# TYPE {metric} histogram']
+        for name, histogram in self._histograms[key].items():
+          lines += [f'{metric}_bucket{{stage="{name}",le="{bound}"}} {value}' for bound, value in zip(buckets, histogram['Buckets'])]
+          lines += [f'{metric}_bucket{{stage="{name}",le="+Inf"}} {histogram["Count"]}',
+                    f'{metric}_sum{{stage="{name}"}} {histogram["Sum"]}',
+                    f'{metric}_count{{stage="{name}"}} {histogram["Count"]}']
+
+      lines += ['# HELP pdf_conversion_stage_items_total Number of items (pages, characters, rows, sections) processed by conversion stages',
+                '# TYPE pdf_conversion_stage_items_total counter']
+      lines += [f'pdf_conversion_stage_items_total{{stage="{name}",item="{key}"}} {value}' for (name, key), value in self._counts.items()]
+
+      lines += ['# HELP pdf_startup_phase_seconds Wall time of startup phases of application and its worker processes',
+                '# TYPE pdf_startup_phase_seconds gauge']
+      lines += [f'pdf_startup_phase_seconds{{phase="{phase}"}} {seconds}' for phase, seconds in self.startup.items()]
+
+      lines += ['# HELP pdf_admission_state Memory budget, sum of memory estimates of running jobs and numbers of running and waiting jobs',
+                '# TYPE pdf_admission_state gauge']
+      lines += [f'pdf_admission_state{{value="{key}"}} {value}' for key, value in self.admission.items()]
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import count
+
+# Weights of indexed columns in ranking (FileName, Title, Text, Pages), match in title counts more than match in text
+RANK_WEIGHTS = (2.0, 5.0, 1.0, 0.5)
+
+# Version of indexed columns, index built by older version is emptied and documents are indexed again
+INDEX_VERSION = 2
+
+class SearchIndex:
+  """Full-text index of sections of converted documents stored in SQLite database (FTS5)
+
+  Every section is indexed by its 'FileName', 'Title' (hierarchy of headers), 'Text' and page numbers (both 'OperationalPageNumber' and printed 'PageNumber'), the whole section
+  is stored next to it, so results are returned without reading output files. Index is updated per document - sections
+  of document are replaced in one transaction and document which content did not change is not indexed again.
+
+  Parameters
+  ----------
+  path : str
+      Path to database file, ':memory:' keeps index in memory
+  """
+
+  def __init__(self, path):
+    self.path = path
+    if path != ':memory:': os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+    self._lock = threading.Lock()
+
+    # Connection is shared by threads of application (event loop, callbacks of jobs), access is serialized with lock
+    self._connection = sqlite3.connect(path, check_same_thread = False)
+    with self._lock, self._connection:
+      self._connection.execute('PRAGMA journal_mode = WAL')
+      self._connection.execute('CREATE TABLE IF NOT EXISTS documents (FileName TEXT PRIMARY KEY, Key TEXT, Sections INTEGER, Updated REAL)')
+      self._connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(FileName, Title, Text, Pages, "
+                               "Section UNINDEXED, Position UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')")
+      if self._connection.execute('PRAGMA user_version').fetchone()[0] < INDEX_VERSION:
+        self._connection.execute('DELETE FROM sections')
+        self._connection.execute('DELETE FROM documents')
+        self._connection.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+
+  @staticmethod
+  def key(list_of_pargraphs):
+    """Function that calculates key of document content, document is indexed again only if its key changes"""
+    return hashlib.sha256(json.dumps(list_of_pargraphs, sort_keys = True).encode()).hexdigest()
+
+  def update(self, pdf_name, list_of_pargraphs, key = None):
+    """Function that replaces sections of document in index
+
+    Parameters
+    ----------
+    pdf_name : str
+        Name of document
+    list_of_pargraphs : list or iterable
+        List of dictionaries with structured text, sections can be generated one by one if key is given
+    key : str
+        Key of document content (e.g. cache key of pdf file), by default it is calculated from sections
+
+    Returns
+    -------
+    updated : bool
+        False if document was already indexed with the same key
+    """
+    key = key if key is not None else self.key(list_of_pargraphs)
+    # Rows are generated while they are inserted, the last position gives number of sections
+    positions = count()
+    rows = ((pdf_name, paragraph.get('Title', ''), paragraph.get('Text', ''),
+             _page_numbers(paragraph), json.dumps(paragraph), next(positions))
+            for paragraph in list_of_pargraphs)
+
+    with self._lock, self._connection:
+      indexed = self._connection.execute('SELECT Key FROM documents WHERE FileName = ?', (pdf_name,)).fetchone()
+      if indexed is not None and indexed[0] == key:
+        return False
+      self._connection.execute('DELETE FROM sections WHERE FileName = ?', (pdf_name,))
+      self._connection.executemany('INSERT INTO sections (FileName, Title, Text, Pages, Section, Position) VALUES (?, ?, ?, ?, ?, ?)', rows)
+      self._connection.execute('INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)', (pdf_name, key, next(positions), time.time()))
+    return True
+
+  def remove(self, pdf_name):
+    """Function that removes sections of document from index"""
+    with self._lock, self._connection:
+      self._connection.execute('DELETE FROM sections WHERE FileName = ?', (pdf_name,))
+      self._connection.execute('DELETE FROM documents WHERE FileName = ?', (pdf_name,))
+
+  def search(self, query, limit = 10, pdf_name = None):
+    """Function that returns sections matching all words of query, the best matching sections first
+
+    Parameters
+    ----------
+    query : str
+        Words searched in sections, word followed by '*' matches its prefix
+    limit : int
+        Maximum number of returned sections
+    pdf_name : str
+        If given, only sections of this document are searched
+
+    Returns
+    -------
+    results : list
+        List of sections with their 'Score' (BM25, lower is better) and 'Position' in document
+    """
+    match = _to_match_expression(query)
+    if match == '':
+      return []
+
+    sql = f'SELECT Section, Position, bm25(sections, {", ".join(map(str, RANK_WEIGHTS))}) AS Score FROM sections WHERE sections MATCH ?'
+    parameters = [match]
+    if pdf_name is not None:
+      sql += ' AND FileName = ?'
+      parameters.append(pdf_name)
+    sql += ' ORDER BY Score LIMIT ?'
+    parameters.append(limit)
+
+    with self._lock:
+      rows = self._connection.execute(sql, parameters).fetchall()
+    return [{**json.loads(section), 'Position': position, 'Score': round(score, 4)} for section, position, score in rows]
+
+  def keys(self):
+    """Function that returns keys of content of indexed documents by document name"""
+    with self._lock:
+      return dict(self._connection.execute('SELECT FileName, Key FROM documents').fetchall())
+
+  def documents(self):
+    """Function that returns indexed documents with their numbers of sections"""
+    with self._lock:
+      rows = self._connection.execute('SELECT FileName, Sections, Updated FROM documents ORDER BY FileName').fetchall()
+    return [{'FileName': name, 'Sections': sections, 'Updated': updated} for name, sections, updated in rows]
+
+  def close(self):
+    with self._lock:
+      self._connection.close()
+
+def _page_numbers(paragraph):
+  """Function that joins operational and printed page numbers of section into indexed text, each number once"""
+  numbers = []
+  for column in ['OperationalPageNumber', 'PageNumber']:
+    for number in str(paragraph.get(column, '')).split(','):
+      number = number.strip()
+      if number not in ['', 'None'] and number not in numbers:
+        numbers.append(number)
+  return ' '.join(numbers)
+
+def _to_match_expression(query):
+  """Function that converts words of query to FTS5 expression, every word is quoted so characters of query syntax are searched as text"""
+  terms = []
+  for word in query.split():
+    prefix = word.endswith('*') and len(word) > 1
+    word = word.rstrip('*') if prefix else word
+    terms.append('"' + word.replace('"', '""') + '"' + ('*' if prefix else ''))
+  return ' '.join(terms)
+
+def index_directory(search_index, directory):
+  """Function that indexes structured JSON files of directory (e.g. data/output), unchanged files are skipped
+
+  Parameters
+  ----------
+  search_index : SearchIndex
+      Updated index
+  directory : str
+      Directory with structured JSON files
+
+  Returns
+  -------
+  report : dict
+      Numbers of indexed ('Indexed'), unchanged ('Unchanged') and failed ('Failed') files
+  """
+  report = {'Indexed': 0, 'Unchanged': 0, 'Failed': 0}
+  keys = search_index.keys()
+  for entry in sorted(os.scandir(directory), key = lambda entry: entry.name):
+    if not entry.name.endswith('.json'):
+      continue
+
+    # Modification time and size identify version of file, so unchanged file is not read again
+    pdf_name, key = entry.name[:-len('.json')], f'file-{entry.stat().st_mtime_ns}-{entry.stat().st_size}'
+    if keys.get(pdf_name) == key:
+      report['Unchanged'] += 1
+      continue
+
+    try:
+      with open(entry.path) as f:
+        list_of_pargraphs = json.load(f)
+    except (OSError, ValueError):
+      report['Failed'] += 1
+      continue
+    search_index.update(pdf_name, list_of_pargraphs, key = key)
+    report['Indexed'] += 1
+
+  return report
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Index structured JSON files of directory or search indexed sections')
+  parser.add_argument('index', help = 'path to database file of search index')
+  parser.add_argument('--directory', help = 'directory with structured JSON files which are indexed')
+  parser.add_argument('--query', help = 'words searched in indexed sections')
+  parser.add_argument('--limit', type = int, default = 10, help = 'maximum number of returned sections (default 10)')
+  args = parser.parse_args(args)
+
+  search_index = SearchIndex(args.index)
+  try:
+    if args.directory:
+      report = index_directory(search_index, args.directory)
+      print(f"Indexed {report['Indexed']} files, unchanged {report['Unchanged']}, failed {report['Failed']}")
+
+    results = []
+    if args.query:
+      start = time.perf_counter()
+      results = search_index.search(args.query, limit = args.limit)
+      print(f'Found {len(results)} sections in {(time.perf_counter() - start) * 1000:.2f} ms')
+      for result in results:
+        print(f"{result['Score']:>9} {result['FileName']}, page {result['OperationalPageNumber']}: {result['Title']}")
+  finally:
+    search_index.close()
+
+  return results
+
+if __name__ == '__main__':
+  main()
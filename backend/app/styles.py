@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# Columns with font style of element
+STYLE_COLUMNS = ['FontName', 'FontSize', 'FontSColor']
+
+# Type of column 'StyleId' - documents have at most few thousands of styles
+STYLE_ID_DTYPE = np.int32
+
+class StyleTable:
+  """Registry of font styles of document, every distinct style (font name, font size, non-stroking color) gets
+  compact integer id when characters are extracted
+
+  Tables of elements keep only column 'StyleId', so stages compare and merge integers instead of three object columns.
+  Details of styles are looked up in this table only when they are needed (e.g. font size of rows) and they are
+  resolved to columns 'FontName', 'FontSize' and 'FontSColor' at output time.
+
+  Parameters
+  ----------
+  styles : iterable
+      Styles (font name, font size, non-stroking color) registered in order, e.g. styles of table of other process
+  """
+
+  def __init__(self, styles = ()):
+    self.styles = []
+    self._ids = {}
+    self._frame = None
+    for style in styles:
+      self.intern(style)
+
+  def __len__(self):
+    return len(self.styles)
+
+  def intern(self, style):
+    """Function that returns id of style, style that was not seen before gets the next id"""
+    style_id = self._ids.get(style)
+    if style_id is None:
+      style_id = self._ids[style] = len(self.styles)
+      self.styles.append(style)
+    return style_id
+
+  def intern_columns(self, font_names, font_sizes, font_colors):
+    """Function that returns ids of styles given as columns (e.g. of table with 'FontName', 'FontSize' and 'FontSColor')"""
+    return np.array([self.intern((name, float(size), color)) for name, size, color in zip(font_names, font_sizes, font_colors)],
+                    dtype = STYLE_ID_DTYPE)
+
+  def merge(self, styles):
+    """Function that interns styles of other table (e.g. of worker process)
+
+    Returns
+    -------
+    mapping : numpy.ndarray
+        Array with id in this table at position of id in other table
+    """
+    return np.array([self.intern(tuple(style)) for style in styles], dtype = STYLE_ID_DTYPE)
+
+  def to_frame(self):
+    """Function that returns table with details of every style, row number is style id"""
+    if self._frame is None or self._frame.shape[0] != len(self.styles):
+      names, sizes, colors = zip(*self.styles) if len(self.styles) > 0 else ((), (), ())
+      self._frame = pd.DataFrame({'FontName': pd.Series(names, dtype = object),
+                                  'FontSize': pd.Series(sizes, dtype = float),
+                                  'FontSColor': pd.Series(colors, dtype = object)})
+    return self._frame
+
+  def get(self, column, style_ids):
+    """Function that returns values of style column ('FontName', 'FontSize' or 'FontSColor') for array of style ids"""
+    return self.to_frame()[column].to_numpy()[np.asarray(style_ids, dtype = STYLE_ID_DTYPE)]
+
+  def resolve(self, table, keep_ids = False):
+    """Function that returns table with style details in columns 'FontName', 'FontSize' and 'FontSColor'
+
+    Parameters
+    ----------
+    table : dataframe
+        Table with column 'StyleId'
+    keep_ids : bool
+        If True, column 'StyleId' is kept before details, otherwise details are placed instead of it
+
+    Returns
+    -------
+    resolved_table : dataframe
+        Copy of table with style details
+    """
+    style_ids = table['StyleId'].to_numpy()
+    position = table.columns.get_loc('StyleId') + (1 if keep_ids else 0)
+    resolved_table = table.copy() if keep_ids else table.drop(columns = 'StyleId')
+    for offset, col in enumerate(STYLE_COLUMNS):
+      resolved_table.insert(position + offset, col, self.get(col, style_ids))
+    return resolved_table
@@ -0,0 +1,2 @@
+# Version of conversion pipeline - it has to be changed whenever output of pdf_to_structured_json changes
+PIPELINE_VERSION = '1'
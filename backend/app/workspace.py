@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+class Workspace:
+  """Temporary directory of single request, where uploaded file and intermediate files of its conversion are kept
+
+  Requests never share files, so concurrent uploads of files with the same name do not overwrite each other.
+  Directory is removed with everything inside by cleanup, or by release when every user of workspace (e.g. conversion
+  job and response streaming its file) is finished with it.
+
+  Parameters
+  ----------
+  root : str
+      Directory where workspaces are created
+  users : int
+      Number of users of workspace, it is removed when all of them release it
+  """
+
+  def __init__(self, root, users = 1):
+    os.makedirs(root, exist_ok = True)
+    self.directory = tempfile.mkdtemp(prefix = 'request-', dir = root)
+    self._users = users
+    self._lock = threading.Lock()
+
+  def path(self, name):
+    """Function that returns path to file with given name in workspace"""
+    return os.path.join(self.directory, os.path.basename(name))
+
+  def release(self):
+    """Function that releases workspace by one of its users, workspace is removed by the last one"""
+    with self._lock:
+      self._users -= 1
+      last = self._users == 0
+    if last:
+      self.cleanup()
+
+  def cleanup(self):
+    """Function that removes workspace, it can be called repeatedly"""
+    shutil.rmtree(self.directory, ignore_errors = True)
+
+def remove_stale_workspaces(root, max_age = 24 * 3600):
+  """Function that removes workspaces left by requests that did not finish (e.g. after crash), returns number of removed workspaces
+
+  Parameters
+  ----------
+  root : str
+      Directory where workspaces are created
+  max_age : float
+      Workspaces modified more than this number of seconds ago are removed
+  """
+  if not os.path.isdir(root):
+    return 0
+
+  removed = 0
+  for entry in os.scandir(root):
+    if entry.is_dir() and entry.name.startswith('request-') and time.time() - entry.stat().st_mtime > max_age:
+      shutil.rmtree(entry.path, ignore_errors = True)
+      removed += 1
+  return removed
+
+@contextmanager
+def atomic_write(path, mode = 'w'):
+  """Context manager that opens temporary file next to path and renames it to path when writing succeeds
+
+  Temporary file has unique name, so concurrent writers of the same path never mix their content - readers see
+  the whole file of one of them. Temporary file is removed if writing fails.
+  """
+  directory, name = os.path.split(path)
+  fd, tmp_path = tempfile.mkstemp(prefix = f'{name}.', suffix = '.part', dir = directory or '.')
+  try:
+    with os.fdopen(fd, mode) as f:
+      yield f
+    os.replace(tmp_path, path)
+  except BaseException:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+    raise
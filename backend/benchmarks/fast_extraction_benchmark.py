@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+from backend.app.functions import pdf_to_structured_json
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+
+def compare_sections(sections, fast_sections):
+  """Function that measures how far sections of fast mode differ from sections of layout-based mode
+
+  Parameters
+  ----------
+  sections : list
+      Sections converted with layout analysis
+  fast_sections : list
+      Sections converted without layout analysis
+
+  Returns
+  -------
+  difference : dict
+      Numbers of sections, share of identical sections, share of titles found in both modes and overlap of words of texts
+  """
+  def words(list_of_pargraphs):
+    return Counter(word for paragraph in list_of_pargraphs for word in paragraph['Text'].split())
+
+  def last_titles(list_of_pargraphs):
+    return Counter(paragraph['Title'].split(' -> ')[-1] for paragraph in list_of_pargraphs)
+
+  # Sections are compared as sets of their json representation
+  section_keys = Counter(json.dumps(paragraph, sort_keys = True) for paragraph in sections)
+  fast_section_keys = Counter(json.dumps(paragraph, sort_keys = True) for paragraph in fast_sections)
+
+  return {'Sections': len(sections),
+          'FastSections': len(fast_sections),
+          'IdenticalSections': round(sum((section_keys & fast_section_keys).values()) / max(1, len(sections)), 3),
+          'TitleOverlap': round(sum((last_titles(sections) & last_titles(fast_sections)).values()) / max(1, len(sections)), 3),
+          'WordOverlap': round(sum((words(sections) & words(fast_sections)).values()) / max(1, sum((words(sections) | words(fast_sections)).values())), 3)}
+
+def run_benchmark(input_path = INPUT_PATH, repeat = 1):
+  """Function that converts every pdf file of directory with and without layout analysis and compares time and output
+
+  Parameters
+  ----------
+  input_path : str
+      Directory with pdf files
+  repeat : int
+      Number of conversions in each mode, the fastest one is reported
+
+  Returns
+  -------
+  results : list
+      List of dictionaries with times, speedup and output difference of every file
+  """
+  results = []
+  for pdf_name in sorted(name for name in os.listdir(input_path) if name.lower().endswith('.pdf')):
+
+    timings = {}
+    for fast in [False, True]:
+      best = None
+      for _ in range(repeat):
+        start = time.perf_counter()
+        sections_of_mode = pdf_to_structured_json(input_path, pdf_name, fast = fast)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+      timings[fast] = (best, sections_of_mode)
+
+    (seconds, sections), (fast_seconds, fast_sections) = timings[False], timings[True]
+    results.append({'FileName': pdf_name,
+                    'Seconds': round(seconds, 3),
+                    'FastSeconds': round(fast_seconds, 3),
+                    'Speedup': round(seconds / fast_seconds, 2),
+                    **compare_sections(sections, fast_sections)})
+
+  return results
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Compare conversion with and without pdfminer layout analysis')
+  parser.add_argument('--input', default = INPUT_PATH, help = 'directory with pdf files (default data/input)')
+  parser.add_argument('--repeat', type = int, default = 1, help = 'number of conversions in each mode, the fastest one is reported')
+  parser.add_argument('--output', help = 'json file where results are saved')
+  args = parser.parse_args(args)
+
+  results = run_benchmark(args.input, args.repeat)
+  for result in results:
+    print(', '.join(f'{key}: {value}' for key, value in result.items()))
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent = 2)
+
+  return results
+
+if __name__ == '__main__':
+  main()
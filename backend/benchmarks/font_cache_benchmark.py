@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from backend.app.fonts import FontCache, FONT_CACHE_MAX_FONTS, set_font_cache
+from backend.app.functions import pdf_to_structured_json
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+
+def make_similar_documents(pdf_file, directory, copies):
+  """Function that writes copies of pdf file which differ only by comment appended to file, as documents made from the same template
+
+  Returns
+  -------
+  pdf_names : list
+      Names of written files in directory
+  """
+  with open(pdf_file, 'rb') as f:
+    data = f.read()
+
+  pdf_names = []
+  for copy in range(copies):
+    pdf_name = f"{os.path.basename(pdf_file).split('.pdf')[0]} {copy + 1}.pdf"
+    with open(os.path.join(directory, pdf_name), 'wb') as f:
+      f.write(data + f'\n% copy {copy + 1}\n'.encode())
+    pdf_names.append(pdf_name)
+  return pdf_names
+
+def convert_timed(directory, pdf_name, fast):
+  """Function that converts pdf file with font cache set in current process and measures time of conversion
+
+  Returns
+  -------
+  list_of_pargraphs : list
+      Sections of converted file
+  seconds : float
+      Time of conversion
+  """
+  start = time.perf_counter()
+  list_of_pargraphs = pdf_to_structured_json(directory, pdf_name, fast = fast)
+  return list_of_pargraphs, time.perf_counter() - start
+
+def run_benchmark(pdf_files, copies = 10, max_fonts = FONT_CACHE_MAX_FONTS, fast = False):
+  """Function that converts batch of similar documents without and with font cache shared by documents and compares their times
+
+  Every document is converted once with font cache disabled and once with shared font cache right after, so both modes
+  are measured under the same conditions. Documents are converted in current process one by one, as in worker process.
+
+  Parameters
+  ----------
+  pdf_files : list
+      Paths to pdf files, batch contains copies of every file
+  copies : int
+      Number of copies of every file
+  max_fonts : int
+      Size of shared font cache
+  fast : bool
+      If True, chars are collected without pdfminer layout analysis
+
+  Returns
+  -------
+  results : dict
+      Mean seconds per document without ('Seconds') and with font cache ('CachedSeconds') for every file, saving and
+      counters of font cache, and whether sections of both modes are identical
+  """
+  shared_cache = FontCache(max_fonts)
+  results, identical = {'Files': []}, True
+
+  previous_cache = set_font_cache(None)
+  try:
+    with tempfile.TemporaryDirectory() as directory:
+      for pdf_file in pdf_files:
+        seconds, cached_seconds = [], []
+        pdf_names = make_similar_documents(pdf_file, directory, copies)
+        for pdf_name in pdf_names:
+          set_font_cache(FontCache(0))
+          sections, elapsed = convert_timed(directory, pdf_name, fast)
+          seconds.append(elapsed)
+
+          set_font_cache(shared_cache)
+          cached_sections, elapsed = convert_timed(directory, pdf_name, fast)
+          cached_seconds.append(elapsed)
+
+          identical = identical and cached_sections == sections
+
+        mean, cached_mean = sum(seconds) / len(seconds), sum(cached_seconds) / len(cached_seconds)
+        results['Files'].append({'FileName': os.path.basename(pdf_file),
+                                 'Documents': len(pdf_names),
+                                 'Seconds': round(mean, 4),
+                                 'CachedSeconds': round(cached_mean, 4),
+                                 'SavedSeconds': round(mean - cached_mean, 4),
+                                 'Speedup': round(mean / cached_mean, 3)})
+  finally:
+    set_font_cache(previous_cache)
+
+  results['FontCache'] = shared_cache.stats()
+  results['IdenticalSections'] = identical
+  return results
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Compare conversion of batch of similar pdf files without and with font cache shared by documents')
+  parser.add_argument('--input', nargs = '+', default = None, help = 'pdf files copied into batch (default all pdf files of data/input)')
+  parser.add_argument('--copies', type = int, default = 10, help = 'number of copies of every file (default 10)')
+  parser.add_argument('--max-fonts', type = int, default = FONT_CACHE_MAX_FONTS, help = f'size of font cache (default {FONT_CACHE_MAX_FONTS})')
+  parser.add_argument('--fast', action = 'store_true', help = 'extract chars without pdfminer layout analysis')
+  parser.add_argument('--output', help = 'json file where results are saved')
+  args = parser.parse_args(args)
+
+  pdf_files = args.input or sorted(os.path.join(INPUT_PATH, name) for name in os.listdir(INPUT_PATH) if name.lower().endswith('.pdf'))
+  results = run_benchmark(pdf_files, copies = args.copies, max_fonts = args.max_fonts, fast = args.fast)
+
+  for result in results['Files']:
+    print(', '.join(f'{key}: {value}' for key, value in result.items()))
+  stats = results['FontCache']
+  print(f"Font cache: hit rate {stats['HitRate']}, hits {stats['Hits']}, misses {stats['Misses']}, evictions {stats['Evictions']}, "
+        f"fonts {stats['Fonts']}; identical sections: {results['IdenticalSections']}")
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent = 2)
+
+  return results
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,218 @@
+import argparse
+import json
+import math
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+import httpx
+
+# Root of repository, application is started from there as in container
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+INPUT_PATH = os.path.join(ROOT_PATH, 'data', 'input')
+
+# Endpoints that can be loaded - '/' and '/stream' respond when conversion is finished, '/jobs' is polled until job is finished
+ENDPOINTS = ('/', '/stream', '/jobs')
+
+def percentile(values, q):
+  """Function that returns q-th percentile (0-100) of values with nearest-rank method, None for no values"""
+  if len(values) == 0:
+    return None
+  ordered = sorted(values)
+  return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+def summarize(latencies, seconds, statuses):
+  """Function that summarizes latencies (seconds of successful requests) and statuses of all requests
+
+  Returns
+  -------
+  report : dict
+      Numbers of requests by status, throughput of successful requests and percentiles of their latency in seconds
+  """
+  return {'Requests': len(statuses),
+          'Succeeded': len(latencies),
+          'Statuses': {str(status): statuses.count(status) for status in sorted(set(statuses), key = str)},
+          'Seconds': round(seconds, 3),
+          'RequestsPerSecond': round(len(latencies) / seconds, 3) if seconds > 0 else None,
+          'Latency': {name: round(value, 4) if value is not None else None
+                      for name, value in [('Mean', sum(latencies) / len(latencies) if latencies else None),
+                                          ('P50', percentile(latencies, 50)),
+                                          ('P90', percentile(latencies, 90)),
+                                          ('P99', percentile(latencies, 99)),
+                                          ('Max', max(latencies) if latencies else None)]}}
+
+def _free_port():
+  """Function that returns free local TCP port"""
+  with socket.socket() as s:
+    s.bind(('127.0.0.1', 0))
+    return s.getsockname()[1]
+
+def start_server(port, workers = None, cache = False, warm_up = True, timeout = 120):
+  """Function that starts application with uvicorn in subprocess and waits until it is ready
+
+  Parameters
+  ----------
+  port : int
+      Local port of application
+  workers : int
+      Number of conversion worker processes (CONVERSION_WORKERS), by default number of CPUs
+  cache : bool
+      If False, page cache is disabled (PAGE_CACHE_MAX_BYTES=0), so every conversion extracts its pages
+  warm_up : bool
+      If True, worker processes are warmed up before application is ready
+  timeout : float
+      Seconds to wait for application
+
+  Returns
+  -------
+  server : subprocess.Popen
+      Process of application
+  """
+  env = {**os.environ, 'CONVERSION_WARM_UP': '1' if warm_up else '0',
+         # Sections of load test are not added to search index of application
+         'SEARCH_INDEX_PATH': ':memory:'}
+  if workers is not None: env['CONVERSION_WORKERS'] = str(workers)
+  if not cache: env['PAGE_CACHE_MAX_BYTES'] = '0'
+
+  server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'backend.app.main:app', '--host', '127.0.0.1', '--port', str(port),
+                             '--log-level', 'warning'], cwd = ROOT_PATH, env = env)
+
+  deadline = time.perf_counter() + timeout
+  while time.perf_counter() < deadline:
+    if server.poll() is not None:
+      raise RuntimeError(f'Application exited with code {server.returncode}')
+    try:
+      if httpx.get(f'http://127.0.0.1:{port}/ready').status_code == 200:
+        return server
+    except httpx.TransportError:
+      pass
+    time.sleep(0.2)
+
+  stop_server(server)
+  raise TimeoutError(f'Application was not ready in {timeout} s')
+
+def stop_server(server, timeout = 30):
+  """Function that stops application gracefully (as Ctrl+C), it is killed if it does not stop in time"""
+  server.send_signal(signal.SIGINT)
+  try:
+    server.wait(timeout)
+  except subprocess.TimeoutExpired:
+    server.kill()
+    server.wait()
+
+def upload(client, endpoint, pdf_name, data):
+  """Function that uploads pdf file and waits for the whole result, returns status code of response (of job for '/jobs')"""
+  files = {'pdf_name': (pdf_name, data, 'application/pdf')}
+  if endpoint != '/jobs':
+    with client.stream('POST', endpoint, files = files) as response:
+      # Stream ends with error line if conversion failed
+      last_line = ''
+      for line in response.iter_lines():
+        last_line = line or last_line
+      if endpoint == '/stream' and last_line.startswith('{"Error"'):
+        return 500
+      return response.status_code
+
+  response = client.post(endpoint, files = files)
+  if response.status_code != 202:
+    return response.status_code
+  job_id = response.json()['JobId']
+  while True:
+    job = client.get(f'/jobs/{job_id}').json()
+    if job['Status'] in ('done', 'failed'):
+      return 200 if job['Status'] == 'done' else 500
+    time.sleep(0.05)
+
+def run_load_test(base_url, pdf_files, requests, concurrency, endpoint = '/', unique = True, timeout = 600):
+  """Function that sends uploads of pdf files from concurrent clients and measures their latency
+
+  Parameters
+  ----------
+  base_url : str
+      URL of running application
+  pdf_files : list
+      Paths to pdf files, they are uploaded in turn
+  requests : int
+      Number of uploads
+  concurrency : int
+      Number of uploads in progress at the same time
+  endpoint : str
+      Loaded endpoint (see ENDPOINTS)
+  unique : bool
+      If True, unique comment is appended to every uploaded file, so conversions are not answered from cache of converted documents
+  timeout : float
+      Seconds to wait for single response
+
+  Returns
+  -------
+  report : dict
+      Summary of requests (see summarize) with endpoint and concurrency
+  """
+  contents = []
+  for pdf_file in pdf_files:
+    with open(pdf_file, 'rb') as f:
+      contents.append((os.path.basename(pdf_file), f.read()))
+
+  def send(number, pdf_name, data):
+    if unique: data += f'\n% load test {time.time_ns()} {number}\n'.encode()
+    start = time.perf_counter()
+    with httpx.Client(base_url = base_url, timeout = timeout) as client:
+      try:
+        status = upload(client, endpoint, pdf_name, data)
+      except httpx.HTTPError as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - start
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers = concurrency) as executor:
+    results = list(executor.map(lambda item: send(item[0], *item[1]), enumerate(islice(cycle(contents), requests))))
+  seconds = time.perf_counter() - start
+
+  statuses = [status for status, _ in results]
+  latencies = [latency for status, latency in results if status == 200]
+  return {'Endpoint': endpoint, 'Concurrency': concurrency, **summarize(latencies, seconds, statuses)}
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Start application locally, send concurrent uploads of pdf files and report throughput and latency percentiles')
+  parser.add_argument('--input', nargs = '+', default = None, help = 'uploaded pdf files (default all pdf files of data/input)')
+  parser.add_argument('--requests', type = int, default = 20, help = 'number of uploads (default 20)')
+  parser.add_argument('--concurrency', type = int, nargs = '+', default = [4], help = 'numbers of concurrent uploads, every one is measured (default 4)')
+  parser.add_argument('--endpoint', choices = ENDPOINTS, default = '/', help = 'loaded endpoint (default /)')
+  parser.add_argument('--workers', type = int, default = None, help = 'number of conversion worker processes (default number of CPUs)')
+  parser.add_argument('--cache', action = 'store_true', help = 'upload files unchanged and keep page cache, so repeated uploads are answered from caches')
+  parser.add_argument('--url', help = 'URL of running application, it is not started then')
+  parser.add_argument('--output', help = 'json file where results are saved')
+  args = parser.parse_args(args)
+
+  pdf_files = args.input or sorted(os.path.join(INPUT_PATH, name) for name in os.listdir(INPUT_PATH) if name.lower().endswith('.pdf'))
+
+  server = None
+  if args.url is None:
+    port = _free_port()
+    server = start_server(port, workers = args.workers, cache = args.cache)
+  try:
+    results = [run_load_test(args.url or f'http://127.0.0.1:{port}', pdf_files, args.requests, concurrency,
+                             endpoint = args.endpoint, unique = not args.cache)
+               for concurrency in args.concurrency]
+  finally:
+    if server is not None: stop_server(server)
+
+  for report in results:
+    latency = report['Latency']
+    print(f"{report['Endpoint']} concurrency {report['Concurrency']}: {report['Succeeded']}/{report['Requests']} succeeded "
+          f"in {report['Seconds']} s, {report['RequestsPerSecond']} requests/s, latency p50 {latency['P50']} s, "
+          f"p90 {latency['P90']} s, p99 {latency['P99']} s, max {latency['Max']} s, statuses {report['Statuses']}")
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent = 2)
+
+  return results
+
+if __name__ == '__main__':
+  main()
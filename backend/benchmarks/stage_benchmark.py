@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+
+from backend.app.functions import get_lines_details, extract_fast_lines_from_pages, get_fast_lines_details, group_lines_into_page
+from backend.app.functions import get_document_style_index, get_footer_and_header, get_structure, group_structure, table_to_structured_json
+from backend.app.fonts import extract_layout_pages
+from backend.app.styles import StyleTable
+from backend.benchmarks.synthetic_pdf import generate_pdf
+
+# Sample pdf file and directory with generated synthetic pdf files
+HANDBOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input', 'Insurance_Handbook.pdf')
+SYNTHETIC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'benchmarks')
+
+# Stages of pdf_to_structured_json in order of execution
+STAGES = ['Extraction', 'LinesDetails', 'GroupLinesIntoPage', 'StyleIndex', 'FooterAndHeader', 'Structure', 'GroupStructure', 'StructuredJson']
+
+def time_stages(pdf_file, fast = False):
+  """Function that converts pdf file stage by stage the same way as pdf_to_structured_json and measures time of every stage
+
+  Parameters
+  ----------
+  pdf_file : str
+      Path to pdf file
+  fast : bool
+      If True, chars are collected without pdfminer layout analysis
+
+  Returns
+  -------
+  timings : dict
+      Seconds spent in every stage (see STAGES), number of pages and sections
+  """
+  timings = dict.fromkeys(STAGES, 0.0)
+  styles = StyleTable()
+
+  # Extraction and line details are interleaved, as pages are generated one by one
+  if fast: pages = extract_fast_lines_from_pages(pdf_file)
+  else: pages = extract_layout_pages(pdf_file)
+
+  df_lines_text = []
+  while True:
+    start = time.perf_counter()
+    page = next(pages, None)
+    timings['Extraction'] += time.perf_counter() - start
+    if page is None:
+      break
+
+    start = time.perf_counter()
+    lines = get_fast_lines_details(page, styles) if fast else get_lines_details(page, styles)
+    lines['OperationalPageNumber'] = len(df_lines_text) + 1
+    df_lines_text.append(lines)
+    timings['LinesDetails'] += time.perf_counter() - start
+
+  def timed(stage, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    timings[stage] += time.perf_counter() - start
+    return result
+
+  df_pages_text = timed('GroupLinesIntoPage', group_lines_into_page, df_lines_text)
+  style_index = timed('StyleIndex', get_document_style_index, df_pages_text, styles)
+  style_index_fh = timed('FooterAndHeader', get_footer_and_header, style_index)
+  style_index_s = timed('Structure', get_structure, style_index_fh)
+  df_pages_text_structured = timed('GroupStructure', lambda *args: styles.resolve(group_structure(*args)), style_index_s)
+  list_of_pargraphs = timed('StructuredJson', table_to_structured_json, df_pages_text_structured, os.path.basename(pdf_file))
+
+  return {**timings, 'Pages': len(df_lines_text), 'Sections': len(list_of_pargraphs)}
+
+def generate_synthetic_files(directory = SYNTHETIC_PATH, page_counts = (10, 100, 1000), font_mixes = ('plain', 'mixed')):
+  """Function that generates synthetic pdf files of every size and font mix, files generated before are reused
+
+  Returns
+  -------
+  pdf_files : list
+      Paths to synthetic pdf files
+  """
+  os.makedirs(directory, exist_ok = True)
+  pdf_files = []
+  for font_mix in font_mixes:
+    for page_count in page_counts:
+      pdf_file = os.path.join(directory, f'synthetic_{font_mix}_{page_count}.pdf')
+      if not os.path.exists(pdf_file):
+        generate_pdf(pdf_file, page_count, font_mix = font_mix)
+      pdf_files.append(pdf_file)
+  return pdf_files
+
+def run_benchmark(pdf_files, repeat = 1, fast = False):
+  """Function that measures time of every stage for every pdf file
+
+  Parameters
+  ----------
+  pdf_files : list
+      Paths to pdf files
+  repeat : int
+      Number of conversions of every file, the fastest time of every stage is reported
+  fast : bool
+      If True, chars are collected without pdfminer layout analysis
+
+  Returns
+  -------
+  results : list
+      List of dictionaries with seconds of every stage and total of every file
+  """
+  results = []
+  for pdf_file in pdf_files:
+    runs = [time_stages(pdf_file, fast = fast) for _ in range(repeat)]
+    stages = {stage: round(min(run[stage] for run in runs), 4) for stage in STAGES}
+    results.append({'FileName': os.path.basename(pdf_file),
+                    'Pages': runs[0]['Pages'],
+                    'Sections': runs[0]['Sections'],
+                    'Stages': stages,
+                    'Total': round(sum(stages.values()), 4)})
+  return results
+
+def compare_results(results, baseline):
+  """Function that compares stage times with results saved by previous run (e.g. on other commit)
+
+  Returns
+  -------
+  ratios : dict
+      Ratio of current and baseline seconds of every stage and total for every file present in both results
+  """
+  baseline_files = {result['FileName']: result for result in baseline['Results']}
+  ratios = {}
+  for result in results:
+    previous = baseline_files.get(result['FileName'])
+    if previous is None:
+      continue
+    seconds = {**result['Stages'], 'Total': result['Total']}
+    previous_seconds = {**previous['Stages'], 'Total': previous['Total']}
+    ratios[result['FileName']] = {stage: round(seconds[stage] / previous_seconds[stage], 2) if previous_seconds.get(stage) else None
+                                  for stage in seconds}
+  return ratios
+
+def _get_commit():
+  """Function that returns hash of checked out commit or None outside of git repository"""
+  try:
+    return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, check = True,
+                          cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Measure time of every stage of conversion on sample and synthetic pdf files')
+  parser.add_argument('--input', nargs = '*', default = [HANDBOOK_FILE], help = 'pdf files (default data/input/Insurance_Handbook.pdf)')
+  parser.add_argument('--pages', nargs = '*', type = int, default = [10, 100, 1000], help = 'page counts of synthetic pdf files (default 10 100 1000)')
+  parser.add_argument('--fonts', nargs = '*', default = ['plain', 'mixed'], help = 'font mixes of synthetic pdf files (default plain mixed)')
+  parser.add_argument('--synthetic-dir', default = SYNTHETIC_PATH, help = 'directory of synthetic pdf files (default data/benchmarks)')
+  parser.add_argument('--repeat', type = int, default = 1, help = 'number of conversions of every file, the fastest time of every stage is reported')
+  parser.add_argument('--fast', action = 'store_true', help = 'convert without pdfminer layout analysis')
+  parser.add_argument('--output', help = 'json file where results are saved')
+  parser.add_argument('--compare', help = 'json file with results of previous run to compare with')
+  args = parser.parse_args(args)
+
+  pdf_files = args.input + generate_synthetic_files(args.synthetic_dir, args.pages, args.fonts)
+  results = run_benchmark(pdf_files, args.repeat, args.fast)
+  for result in results:
+    print(f"{result['FileName']} ({result['Pages']} pages): {result['Total']} s - "
+          + ', '.join(f'{stage}: {seconds}' for stage, seconds in result['Stages'].items()))
+
+  benchmark = {'Commit': _get_commit(),
+               'Python': platform.python_version(),
+               'Fast': args.fast,
+               'Repeat': args.repeat,
+               'Results': results}
+
+  if args.compare:
+    with open(args.compare) as f:
+      benchmark['Ratios'] = compare_results(results, json.load(f))
+    for pdf_name, ratios in benchmark['Ratios'].items():
+      print(f'{pdf_name} compared to baseline: ' + ', '.join(f'{stage}: {ratio}x' for stage, ratio in ratios.items()))
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(benchmark, f, indent = 2)
+
+  return benchmark
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from backend.app.jobs import JobQueue
+
+# Root of repository, application is imported from there as in container
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+INPUT_PATH = os.path.join(ROOT_PATH, 'data', 'input')
+WARM_UP_FILE = os.path.join(ROOT_PATH, 'backend', 'app', 'warm_up.pdf')
+
+# Import-time budget of application - seconds of 'import backend.app.main' and modules that must not be imported by it
+IMPORT_TIME_BUDGET = 1.0
+LAZY_MODULES = ('pandas', 'numpy', 'pdfminer', 'PIL')
+
+def measure_import(module = 'backend.app.main', repeat = 3):
+  """Function that measures import of module in fresh interpreter with 'python -X importtime'
+
+  Parameters
+  ----------
+  module : str
+      Imported module
+  repeat : int
+      Number of imports, the fastest is reported
+
+  Returns
+  -------
+  report : dict
+      Seconds of import ('Seconds'), the slowest imported packages ('Slowest') and lazy modules that were imported anyway ('LazyModulesImported')
+  """
+  code = f'import sys, {module}; print(",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))'
+  # Workers are not warmed up, only import is measured
+  env = {**os.environ, 'CONVERSION_WARM_UP': '0'}
+
+  runs = []
+  for _ in range(repeat):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output = True, text = True,
+                            cwd = ROOT_PATH, env = env, check = True)
+    # Lines of importtime are 'import time: self [us] | cumulative | imported package'
+    cumulative = {}
+    for line in result.stderr.splitlines():
+      if line.startswith('import time:') and '|' in line:
+        _, seconds, name = line[len('import time:'):].split('|')
+        if seconds.strip().isdigit():
+          cumulative[name.strip()] = int(seconds) / 10**6
+    runs.append((cumulative.get(module, 0), cumulative, result.stdout.strip()))
+
+  seconds, cumulative, lazy_modules = min(runs, key = lambda run: run[0])
+  top_level = {name: value for name, value in cumulative.items() if '.' not in name and name != module}
+  return {'Seconds': round(seconds, 4),
+          'Slowest': {name: round(value, 4) for name, value in sorted(top_level.items(), key = lambda item: -item[1])[:10]},
+          'LazyModulesImported': [m for m in lazy_modules.split(',') if m != '']}
+
+def measure_first_conversion(pdf_file, warm_up):
+  """Function that measures time until worker is ready and latency of the first conversion of new job queue
+
+  Returns
+  -------
+  report : dict
+      Seconds until worker is ready ('Ready') and seconds of the first conversion ('FirstConversion')
+  """
+  start = time.perf_counter()
+  job_queue = JobQueue(max_workers = 1, max_queued = 1, warm_up_file = WARM_UP_FILE if warm_up else None)
+  try:
+    job_queue.wait_ready()
+    ready = time.perf_counter() - start
+
+    start = time.perf_counter()
+    job = job_queue.submit(os.path.dirname(pdf_file), os.path.basename(pdf_file))
+    job.wait()
+    first_conversion = time.perf_counter() - start
+  finally:
+    job_queue.shutdown()
+
+  return {'Ready': round(ready, 4), 'FirstConversion': round(first_conversion, 4), 'Workers': list(job_queue.workers.values())}
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Measure import time of application and latency of the first conversion with and without warm-up')
+  parser.add_argument('--input', default = os.path.join(INPUT_PATH, 'Factsheet Leben Risiko.pdf'),
+                      help = 'pdf file converted as the first job (default data/input/Factsheet Leben Risiko.pdf)')
+  parser.add_argument('--repeat', type = int, default = 3, help = 'number of imports, the fastest is reported')
+  parser.add_argument('--budget', type = float, default = IMPORT_TIME_BUDGET, help = f'import-time budget in seconds (default {IMPORT_TIME_BUDGET})')
+  parser.add_argument('--output', help = 'json file where results are saved')
+  args = parser.parse_args(args)
+
+  benchmark = {'Import': measure_import(repeat = args.repeat),
+               'Cold': measure_first_conversion(args.input, warm_up = False),
+               'WarmedUp': measure_first_conversion(args.input, warm_up = True)}
+
+  print(f"Import of application: {benchmark['Import']['Seconds']} s (budget {args.budget} s), slowest packages: "
+        + ', '.join(f'{name}: {seconds}' for name, seconds in benchmark['Import']['Slowest'].items()))
+  for mode in ['Cold', 'WarmedUp']:
+    print(f"{mode} worker: ready after {benchmark[mode]['Ready']} s, first conversion {benchmark[mode]['FirstConversion']} s")
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(benchmark, f, indent = 2)
+
+  # Budget is exceeded if import is too slow or if any heavy module is imported eagerly
+  over_budget = benchmark['Import']['Seconds'] > args.budget or len(benchmark['Import']['LazyModulesImported']) > 0
+  if over_budget:
+    print(f"Import-time budget exceeded, eagerly imported modules: {benchmark['Import']['LazyModulesImported']}")
+    sys.exit(1)
+
+  return benchmark
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,122 @@
+import argparse
+import random
+
+# Words used to fill synthetic documents
+WORDS = ['insurance', 'policy', 'premium', 'claim', 'coverage', 'risk', 'benefit', 'contract', 'customer', 'payment',
+         'the', 'of', 'and', 'to', 'in', 'is', 'for', 'with', 'on', 'by', 'life', 'health', 'property', 'liability',
+         'agent', 'broker', 'underwriting', 'reserve', 'annual', 'limit', 'deductible', 'loss', 'damage', 'term']
+
+# Font mixes of synthetic documents - every style is (font, size, color), headers are listed from the highest level
+FONT_MIXES = {
+  # One body font, bold headers and small header/footer
+  'plain': {'Body': [('Helvetica', 10, (0, 0, 0))],
+            'Headers': [('Helvetica-Bold', 16, (0, 0, 0)), ('Helvetica-Bold', 13, (0, 0, 0))],
+            'Margin': ('Helvetica', 8, (0, 0, 0)),
+            'Inline': []},
+  # Two body fonts, colored headers of three levels and bold or italic words inside paragraphs
+  'mixed': {'Body': [('Times-Roman', 10, (0, 0, 0)), ('Helvetica', 9.5, (0, 0, 0))],
+            'Headers': [('Helvetica-Bold', 18, (0, 0.2, 0.6)), ('Helvetica-Bold', 14, (0, 0, 0)), ('Times-Bold', 12, (0.6, 0, 0))],
+            'Margin': ('Helvetica-Oblique', 7, (0.3, 0.3, 0.3)),
+            'Inline': [('Times-Bold', 10, (0, 0, 0)), ('Times-Italic', 10, (0, 0, 0))]},
+}
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+def _text_command(font_ids, style, text):
+  """Function that returns content stream commands showing text in given style"""
+  font, size, color = style
+  return f"{' '.join(str(c) for c in color)} rg /{font_ids[font]} {size} Tf ({text}) Tj"
+
+def _page_content(rng, font_mix, font_ids, page_number):
+  """Function that returns content stream of single synthetic page with headers, paragraphs, header and footer"""
+  commands = []
+
+  def show(x, y, styled_texts):
+    commands.append(f'BT {x} {y} Td ' + ' '.join(_text_command(font_ids, style, text) for style, text in styled_texts) + ' ET')
+
+  # Page header and footer with page number
+  show(50, PAGE_HEIGHT - 40, [(font_mix['Margin'], 'Synthetic benchmark document')])
+  show(PAGE_WIDTH // 2, 30, [(font_mix['Margin'], str(page_number))])
+
+  y = PAGE_HEIGHT - 80
+  while y > 90:
+    # Section header
+    if rng.random() < 0.3:
+      style = rng.choice(font_mix['Headers'])
+      show(50, y, [(style, ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize())])
+      y -= style[1] * 2
+      continue
+
+    # Paragraph
+    body = rng.choice(font_mix['Body'])
+    for _ in range(rng.randint(3, 8)):
+      if y <= 90: break
+      words = [rng.choice(WORDS) for _ in range(rng.randint(12, 15))]
+      styled_texts = [(body, ' '.join(words))]
+      # Words with different style inside paragraph
+      if font_mix['Inline'] and rng.random() < 0.3:
+        position = rng.randint(1, len(words) - 1)
+        styled_texts = [(body, ' '.join(words[:position]) + ' '), (rng.choice(font_mix['Inline']), words[position]),
+                        (body, ' ' + ' '.join(words[position + 1:]))]
+      show(50, y, styled_texts)
+      y -= body[1] * 1.4
+    y -= body[1]
+
+  return '\n'.join(commands).encode('latin-1')
+
+def generate_pdf(pdf_file, page_count, font_mix = 'plain', seed = 0):
+  """Function that writes synthetic pdf file with standard fonts, which size and font mix are controlled
+
+  Parameters
+  ----------
+  pdf_file : str
+      Path where pdf file is saved
+  page_count : int
+      Number of pages
+  font_mix : str
+      Name of font mix (see FONT_MIXES)
+  seed : int
+      Seed of random generator, the same seed gives the same document
+  """
+  rng = random.Random(seed)
+  styles = FONT_MIXES[font_mix]
+  fonts = sorted({style[0] for style in styles['Body'] + styles['Headers'] + styles['Inline'] + [styles['Margin']]})
+  font_ids = {font: f'F{i + 1}' for i, font in enumerate(fonts)}
+
+  # Objects of pdf file: catalog, page tree, fonts and then page with its content for every page
+  first_page_object = 3 + len(fonts)
+  page_objects = [first_page_object + 2 * i for i in range(page_count)]
+  objects = [b'<< /Type /Catalog /Pages 2 0 R >>',
+             f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in page_objects)}] /Count {page_count} >>".encode()]
+  objects += [f'<< /Type /Font /Subtype /Type1 /BaseFont /{font} /Encoding /WinAnsiEncoding >>'.encode() for font in fonts]
+  resources = ' '.join(f'/{font_ids[font]} {3 + i} 0 R' for i, font in enumerate(fonts))
+
+  for page_number, page_object in enumerate(page_objects, 1):
+    content = _page_content(rng, styles, font_ids, page_number)
+    objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                   f'/Resources << /Font << {resources} >> >> /Contents {page_object + 1} 0 R >>'.encode())
+    objects.append(f'<< /Length {len(content)} >>\nstream\n'.encode() + content + b'\nendstream')
+
+  with open(pdf_file, 'wb') as f:
+    f.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+      offsets.append(f.tell())
+      f.write(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+    xref = f.tell()
+    f.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode())
+    f.write(''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode())
+    f.write(f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+def main(args = None):
+  parser = argparse.ArgumentParser(description = 'Generate synthetic pdf file for benchmarks')
+  parser.add_argument('pdf_file', help = 'path where pdf file is saved')
+  parser.add_argument('--pages', type = int, default = 10, help = 'number of pages (default 10)')
+  parser.add_argument('--fonts', choices = sorted(FONT_MIXES), default = 'plain', help = 'font mix of document (default plain)')
+  parser.add_argument('--seed', type = int, default = 0, help = 'seed of random generator (default 0)')
+  args = parser.parse_args(args)
+
+  generate_pdf(args.pdf_file, args.pages, font_mix = args.fonts, seed = args.seed)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,40 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.admission import MemoryEstimator, get_document_size, get_memory
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+
+class Testing(unittest.TestCase):
+
+    def test_memory_estimator_learns_page_memory(self):
+
+        estimator = MemoryEstimator(fixed_memory = 1000, page_memory = 100)
+        self.assertEqual(estimator.estimate(10, 50), 2050)
+        self.assertEqual(estimator.estimate(None, 50), 1150)
+
+        # Memory of page is the 90th percentile of observed conversions
+        for memory in [1000 + 10 * page_memory + 50 for page_memory in range(1, 11)]:
+            estimator.observe(10, 50, memory)
+        self.assertEqual(estimator.page_memory, 9)
+        self.assertEqual(estimator.estimate(10, 50), 1140)
+
+        # Conversion that needed less than fixed memory does not give negative memory of page
+        estimator = MemoryEstimator(fixed_memory = 1000, page_memory = 100)
+        estimator.observe(10, 50, 10)
+        self.assertEqual(estimator.page_memory, 0)
+
+    def test_get_document_size(self):
+
+        pdf_file = os.path.join(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+        self.assertEqual(get_document_size(pdf_file), (2, os.path.getsize(pdf_file)))
+        self.assertGreater(get_memory()[1], 0)
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.batch import convert_directory
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+
+class Testing(unittest.TestCase):
+
+    def test_convert_directory(self):
+
+        with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+
+            shutil.copy(os.path.join(INPUT_PATH, 'Factsheet Leben Risiko.pdf'), input_dir)
+            with open(os.path.join(input_dir, 'broken.pdf'), 'w') as f:
+                f.write('not a pdf')
+
+            report = convert_directory(input_dir, output_dir, max_workers = 2)
+
+            self.assertEqual(report['Documents'], 1)
+            self.assertEqual(report['Pages'], 2)
+            self.assertEqual(list(report['Failures']), ['broken.pdf'])
+            self.assertEqual(os.listdir(output_dir), ['Factsheet Leben Risiko.json'])
+
+            # Converted files are skipped when conversion is run again
+            report = convert_directory(input_dir, output_dir, max_workers = 2)
+
+            self.assertEqual(report['Documents'], 0)
+            self.assertEqual(report['Skipped'], 1)
+
+if __name__ == '__main__':
+
+    unittest.main()
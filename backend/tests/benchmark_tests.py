@@ -0,0 +1,60 @@
+import unittest
+import tempfile
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.functions import pdf_to_structured_json, get_page_count
+from benchmarks.synthetic_pdf import generate_pdf
+from benchmarks.startup_benchmark import measure_import
+from benchmarks.load_test import percentile, summarize
+
+class Testing(unittest.TestCase):
+
+    def test_generate_pdf(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            generate_pdf(os.path.join(directory, 'synthetic.pdf'), 3, font_mix = 'mixed')
+
+            self.assertEqual(get_page_count(os.path.join(directory, 'synthetic.pdf')), 3)
+
+            # Small texts at the top and bottom of pages are recognized as header and footer with page number
+            list_of_pargraphs = pdf_to_structured_json(directory, 'synthetic.pdf')
+
+            self.assertGreater(len(list_of_pargraphs), 0)
+            self.assertEqual({paragraph['Header'] for paragraph in list_of_pargraphs}, {'Synthetic benchmark document'})
+            self.assertEqual({paragraph['PageNumber'] for paragraph in list_of_pargraphs},
+                             {paragraph['OperationalPageNumber'] for paragraph in list_of_pargraphs})
+
+            # The same seed gives the same document
+            generate_pdf(os.path.join(directory, 'copy.pdf'), 3, font_mix = 'mixed')
+            with open(os.path.join(directory, 'synthetic.pdf'), 'rb') as f, open(os.path.join(directory, 'copy.pdf'), 'rb') as f_copy:
+                self.assertEqual(f.read(), f_copy.read())
+
+    def test_load_test_summary(self):
+
+        # Percentiles are taken with nearest-rank method
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+        self.assertEqual(percentile([5], 99), 5)
+        self.assertIsNone(percentile([], 50))
+
+        report = summarize([1.0, 2.0, 3.0], 2.0, [200, 200, 200, 503])
+        self.assertEqual(report['Statuses'], {'200': 3, '503': 1})
+        self.assertEqual(report['RequestsPerSecond'], 1.5)
+        self.assertEqual(report['Latency']['P50'], 2.0)
+        self.assertEqual(report['Latency']['Max'], 3.0)
+
+    def test_application_import_is_lazy(self):
+
+        report = measure_import(repeat = 1)
+
+        # Application is served without pandas, numpy and pdfminer, they are imported by worker processes
+        self.assertEqual(report['LazyModulesImported'], [])
+        self.assertGreater(report['Seconds'], 0)
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.cache import ResultCache
+
+class Testing(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_result_cache_hit_and_miss(self):
+
+        cache = ResultCache(self.directory.name, max_bytes = 10**6, version = '1')
+        sections = [{'FileName': 'a', 'Title': 'T', 'Text': 'text'}]
+
+        self.assertIsNone(cache.get(b'pdf', 'a'))
+        cache.put(b'pdf', sections)
+
+        # The same content uploaded under other name returns sections with new name
+        self.assertEqual(cache.get(b'pdf', 'b'), [{'FileName': 'b', 'Title': 'T', 'Text': 'text'}])
+        # Results of other pipeline version are not returned
+        self.assertIsNone(ResultCache(self.directory.name, max_bytes = 10**6, version = '2').get(b'pdf', 'a'))
+
+        self.assertEqual(cache.stats()['Hits'], 1)
+        self.assertEqual(cache.stats()['Misses'], 1)
+
+    def test_result_cache_key_of_chunks(self):
+
+        cache = ResultCache(self.directory.name, max_bytes = 10**6, version = '1')
+
+        # Key calculated from chunks of file is the same as key of whole content
+        hasher = cache.hasher()
+        for chunk in [b'p', b'df']:
+            hasher.update(chunk)
+        self.assertEqual(hasher.hexdigest(), cache.key(b'pdf'))
+
+        cache.put_by_key(hasher.hexdigest(), [{'FileName': 'a', 'Title': 'T', 'Text': 'text'}])
+        self.assertEqual(cache.get(b'pdf', 'a'), [{'FileName': 'a', 'Title': 'T', 'Text': 'text'}])
+
+        # Sections can be generated one by one, they are saved as list
+        sections = [{'FileName': 'a', 'Title': 'T', 'Text': 'text'}, {'FileName': 'a', 'Title': 'U', 'Text': 'more'}]
+        cache.put_by_key(hasher.hexdigest(), (section for section in sections))
+        self.assertEqual(cache.get(b'pdf', 'a'), sections)
+
+    def test_result_cache_lru_eviction(self):
+
+        sections = [{'FileName': 'a', 'Title': 'T', 'Text': 'x' * 100}]
+        cache = ResultCache(self.directory.name, max_bytes = 300, version = '1')
+
+        cache.put(b'first', sections)
+        cache.put(b'second', sections)
+        # Using first result makes second result the least recently used
+        cache.get(b'first', 'a')
+        cache.put(b'third', sections)
+
+        self.assertIsNotNone(cache.get(b'first', 'a'))
+        self.assertIsNone(cache.get(b'second', 'a'))
+        self.assertIsNotNone(cache.get(b'third', 'a'))
+
+if __name__ == '__main__':
+
+    unittest.main()
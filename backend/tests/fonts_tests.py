@@ -0,0 +1,91 @@
+import unittest
+import tempfile
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.fonts import FontCache, SharedFontResourceManager, set_font_cache, extract_layout_pages
+from app.functions import pdf_to_structured_json
+from app.profiling import StageProfiler
+
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'output')
+PDF_NAME = 'Factsheet Leben Risiko.pdf'
+
+class Testing(unittest.TestCase):
+
+    def setUp(self):
+        self.font_cache = FontCache(max_fonts = 100)
+        previous = set_font_cache(self.font_cache)
+        self.addCleanup(set_font_cache, previous)
+
+    def test_font_cache_evicts_least_recently_used(self):
+
+        font_cache = FontCache(max_fonts = 2)
+        font_cache.put(b'a', SimpleNamespace())
+        font_cache.put(b'b', SimpleNamespace())
+        self.assertIsNotNone(font_cache.get(b'a'))
+        font_cache.put(b'c', SimpleNamespace())
+
+        self.assertIsNone(font_cache.get(b'b'))
+        self.assertIsNotNone(font_cache.get(b'a'))
+        self.assertEqual(font_cache.stats(), {'Hits': 2, 'Misses': 1, 'Evictions': 1, 'Fonts': 2, 'MaxFonts': 2, 'HitRate': 0.6667})
+
+        # Fonts are not kept if cache is disabled
+        disabled = FontCache(max_fonts = 0)
+        disabled.put(b'a', SimpleNamespace())
+        self.assertEqual(len(disabled), 0)
+
+    def test_fonts_are_shared_by_documents(self):
+
+        with open(os.path.join(OUTPUT_PATH, 'Factsheet Leben Risiko.json')) as f:
+            expected = json.load(f)
+
+        with tempfile.TemporaryDirectory() as directory:
+            # Copy of document has the same fonts in other file
+            with open(os.path.join(INPUT_PATH, PDF_NAME), 'rb') as f:
+                data = f.read()
+            with open(os.path.join(directory, PDF_NAME), 'wb') as f:
+                f.write(data + b'\n% copy\n')
+
+            first_profiler, second_profiler = StageProfiler(), StageProfiler()
+            self.assertEqual(pdf_to_structured_json(INPUT_PATH, PDF_NAME, profiler = first_profiler), expected)
+            self.assertEqual(pdf_to_structured_json(directory, PDF_NAME, profiler = second_profiler), expected)
+
+        # Fonts of the first document are parsed, the second document takes all of them from cache
+        first, second = first_profiler.stages['Extraction'], second_profiler.stages['Extraction']
+        self.assertGreater(first['FontCacheMisses'], 0)
+        self.assertEqual(second['FontCacheMisses'], 0)
+        self.assertEqual(second['FontCacheHits'], first['FontCacheHits'] + first['FontCacheMisses'])
+
+        # Cached fonts do not keep objects of their documents
+        for font in self.font_cache._fonts.values():
+            for value in vars(font).values():
+                self.assertNotIsInstance(value, (PDFObjRef, PDFStream))
+                if isinstance(value, dict):
+                    self.assertFalse(any(isinstance(item, (PDFObjRef, PDFStream)) for item in value.values()))
+
+    def test_fast_mode_and_layout_pages_use_font_cache(self):
+
+        sections = pdf_to_structured_json(INPUT_PATH, PDF_NAME, fast = True)
+        misses = self.font_cache.stats()['Misses']
+
+        self.assertEqual(pdf_to_structured_json(INPUT_PATH, PDF_NAME, fast = True), sections)
+        self.assertEqual(self.font_cache.stats()['Misses'], misses)
+
+        # Resource manager can be given with other font cache
+        other_cache = FontCache()
+        pages = list(extract_layout_pages(os.path.join(INPUT_PATH, PDF_NAME), page_numbers = [0],
+                                          resource_manager = SharedFontResourceManager(other_cache)))
+        self.assertEqual(len(pages), 1)
+        self.assertGreater(other_cache.stats()['Misses'], 0)
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import tempfile
+import io
 import pandas as pd
 import pandas.testing as pd_testing
 import os
@@ -7,7 +9,14 @@ import sys
 sys.path.append(os.path.dirname(sys.path[0]))
 
 # Importing functions
-from app.functions import get_main_font_among_pages, group_lines_into_page
+from app.cache import PageCache
+from app.functions import get_main_font_among_pages, group_lines_into_page, get_run_starts, group_style_runs, pdf_to_structured_json
+from app.functions import get_fast_lines_details, table_to_structured_json, get_document_style_index, get_footer_and_header
+from app.functions import get_page_numbers, iter_pdf_sections, get_pdf_file, PdfBuffer, get_range_page_numbers, get_sample_page_numbers
+from app.styles import StyleTable
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
 
 class Testing(unittest.TestCase):
 
@@ -29,32 +38,255 @@ class Testing(unittest.TestCase):
         fonts['FontSize'] = [1, 2, 3, 1, 4, 2]
         fonts['FontSColor'] = ['a', 'a', 'a', 'a', 'c', 'a']
         fonts['ElementText'] = ['ertg', 'sedrtgfhyjnbvd', 'ertghgb', 'drf', 'c', 'wesddfghtr']
+        styles = StyleTable()
+        fonts = pd.DataFrame({'ElementText': fonts['ElementText'],
+                              'StyleId': styles.intern_columns(fonts['FontName'], fonts['FontSize'], fonts['FontSColor'])})
 
         # Applying function
-        func_main_font = get_main_font_among_pages([fonts, fonts, fonts])
+        func_main_font = get_main_font_among_pages([fonts, fonts, fonts], styles)
 
         self.assertEqual(func_main_font['FontName'], 'B')
         self.assertEqual(func_main_font['FontSize'], 2)
         self.assertEqual(func_main_font['FontSColor'], 'a')
 
+    def test_get_footer_and_header_returns_style_index(self):
+
+        page = pd.DataFrame()
+        page['ElementText'] = ['Header 1', 'Text of page', 'More text', 'Footer']
+        styles = StyleTable()
+        page['StyleId'] = styles.intern_columns(['A', 'B', 'B', 'A'], [8, 10, 10, 8], ['a', 'a', 'a', 'a'])
+        page['OperationalPageNumber'] = 1
+        second_page = page.copy()
+        second_page['ElementText'] = ['Header 2', 'Text', 'Text', 'Footer']
+        second_page['OperationalPageNumber'] = 2
+
+        style_index = get_document_style_index([page, second_page], styles)
+        style_index_fh = get_footer_and_header(style_index)
+        pages_test = [style_index_fh['PagesText'].iloc[start:stop].reset_index(drop = True) for start, stop in style_index_fh['PageRows']]
+
+        self.assertEqual([list(page_test['ElementText']) for page_test in pages_test], [['Text of page', 'More text'], ['Text', 'Text']])
+        self.assertEqual(list(pages_test[0]['Header']), ['Header 1', 'Header 1'])
+        self.assertEqual(list(pages_test[1]['PageNumber']), [2, 2])
+
+        # Index describes pages without headers and footers as if it was built from them
+        style_index_test = get_document_style_index(pages_test, styles)
+        self.assertEqual(style_index_fh['PageRows'], style_index_test['PageRows'])
+        self.assertEqual(style_index_fh['StyleLengths'], style_index_test['StyleLengths'])
+        self.assertEqual(style_index_fh['PagesText'], style_index_test['PagesText'])
+
+        # Given index still describes pages with headers and footers
+        self.assertEqual(style_index['PageRows'], [(0, 4), (4, 8)])
+        self.assertNotIn('Header', style_index['PagesText'].columns)
+
+    def test_get_page_numbers(self):
+
+        # Numbers in footers are shifted by 1 against operational page numbers on most elements
+        headers = [float('nan'), 'Report 2019', float('nan'), float('nan')]
+        footers = [float('nan'), float('nan'), '2', '3']
+        page_numbers = get_page_numbers([1, 2, 3, 4], headers, footers, [1, 1, 3, 3])
+
+        self.assertEqual(list(page_numbers.fillna(0)), [0, 1, 2, 3])
+
+        # Page numbers are not filled if most of elements are on pages without numbers
+        page_numbers = get_page_numbers([1, 2, 3, 4], headers, footers, [7, 1, 1, 1])
+
+        self.assertEqual(list(page_numbers), [None, '2019', '2', '3'])
+
     def test_group_lines_into_page(self):
 
         line_details = pd.DataFrame()
         line_details['ElementText'] = ['A', 'B', 'C', 'a', 'b', 'c']
-        line_details['FontName'] = ['A1', 'A1', 'A1', 'A2', 'A2', 'A2']
-        line_details['FontSize'] = [1, 1, 1, 2, 2, 2]
-        line_details['FontSColor'] = ['a', 'a', 'a', 'b', 'b', 'b']
+        styles = StyleTable()
+        line_details['StyleId'] = styles.intern_columns(['A1', 'A1', 'A1', 'A2', 'A2', 'A2'], [1, 1, 1, 2, 2, 2], ['a', 'a', 'a', 'b', 'b', 'b'])
 
-        page_details_test = group_lines_into_page(line_details)
+        page_details_test = styles.resolve(group_lines_into_page([line_details])[0])
 
         page_details = pd.DataFrame()
         page_details['ElementText'] = ['A B C', 'a b c']
         page_details['FontName'] = ['A1', 'A2']
-        page_details['FontSize'] = [1, 2]
+        page_details['FontSize'] = [1.0, 2.0]
         page_details['FontSColor'] = ['a', 'b']
 
         self.assertEqual(page_details_test, page_details)
 
+    def test_group_style_runs(self):
+
+        pages_text = pd.DataFrame()
+        pages_text['ElementText'] = ['H1', 'a', 'b', 'H2', 'H3', 'c']
+        pages_text['Structure'] = ['Header', 'Text', 'Text', 'Header', 'Header', 'Text']
+        pages_text['OperationalPageNumber'] = [1, 1, 2, 2, 11, 11]
+
+        run_starts = get_run_starts(pages_text, ['Structure'])
+        self.assertEqual(list(run_starts), [True, True, False, True, False, True])
+
+        # Headers are never merged together, texts are merged with their page numbers listed
+        run_starts[4] = True
+        grouped_test = group_style_runs(pages_text, run_starts, merged_columns = ['OperationalPageNumber'])
+
+        self.assertEqual(list(grouped_test['ElementText']), ['H1', 'a b', 'H2', 'H3', 'c'])
+        self.assertEqual(list(grouped_test['OperationalPageNumber']), [1, '1, 2', 2, 11, 11])
+
+    def test_pdf_to_structured_json_in_parallel(self):
+
+        # Extracting pages in worker processes gives the same sections as extracting them in one process
+        sections = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+        sections_parallel = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', max_workers = 2)
+
+        self.assertEqual(sections_parallel, sections)
+
+    def test_pdf_to_structured_json_from_buffer(self):
+
+        sections = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+        with open(os.path.join(INPUT_PATH, 'Factsheet Leben Risiko.pdf'), 'rb') as f:
+            data = f.read()
+
+        # Content can be given as buffer or file-like object instead of directory
+        self.assertEqual(pdf_to_structured_json(data, 'Factsheet Leben Risiko.pdf'), sections)
+        self.assertEqual(pdf_to_structured_json(memoryview(data), 'Factsheet Leben Risiko.pdf'), sections)
+        with tempfile.SpooledTemporaryFile() as f:
+            f.write(data)
+            f.seek(0)
+            self.assertEqual(pdf_to_structured_json(f, 'Factsheet Leben Risiko.pdf'), sections)
+
+    def test_pdf_buffer(self):
+
+        stream = get_pdf_file(bytearray(b'%PDF-1.4 content'), 'doc.pdf')
+
+        self.assertIsInstance(stream, PdfBuffer)
+        self.assertEqual(stream.read(4), b'%PDF')
+        self.assertEqual(stream.seek(-7, io.SEEK_END), 9)
+        self.assertEqual(stream.read(), b'content')
+        self.assertEqual(stream.read(), b'')
+
+    def test_pdf_to_structured_json_with_memory_report(self):
+
+        sections, peak_memory = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', report_memory = True)
+
+        self.assertEqual(sections, pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf'))
+        self.assertGreater(peak_memory, 0)
+
+    def test_pdf_to_structured_json_reuses_cached_pages(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            page_cache = PageCache(directory, max_bytes = 10**8, version = '1')
+
+            report = {}
+            sections = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', page_cache = page_cache, report = report)
+            self.assertEqual(report, {'ReusedPages': [], 'ParsedPages': [1, 2], 'ProcessedPages': [1, 2]})
+
+            # Second conversion takes every page from cache and gives the same sections
+            report = {}
+            self.assertEqual(pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', page_cache = page_cache, report = report), sections)
+            self.assertEqual(report, {'ReusedPages': [1, 2], 'ParsedPages': [], 'ProcessedPages': [1, 2]})
+
+    def test_iter_pdf_sections(self):
+
+        sections = iter_pdf_sections(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+
+        self.assertEqual(list(sections), pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf'))
+
+    def test_pdf_to_structured_json_preview(self):
+
+        sections = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+
+        # Preview stops extraction after the first page, which completes the first section
+        report = {}
+        preview = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', max_sections = 1, report = report)
+        self.assertEqual(preview, sections[:1])
+        self.assertEqual(report, {'ProcessedPages': [1]})
+
+        # Sections of stream are limited in the same way
+        self.assertEqual(list(iter_pdf_sections(INPUT_PATH, 'Factsheet Leben Risiko.pdf', max_sections = 1)), sections[:1])
+
+        # Main font is estimated from sampled pages, sections of other pages are not made
+        report = {}
+        preview = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', max_sections = 1, style_sample = 2, report = report)
+        self.assertEqual(preview, sections[:1])
+        self.assertEqual(report, {'ProcessedPages': [1], 'SamplePages': [1, 2]})
+
+    def test_pdf_to_structured_json_page_range(self):
+
+        sections = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+
+        # Headers before range are not known, so title of the section has only its own header
+        report = {}
+        sections_range = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', page_range = (2, None), style_sample = 2,
+                                                report = report)
+        self.assertEqual(len(sections_range), 1)
+        self.assertTrue(sections[-1]['Title'].endswith(sections_range[0]['Title']))
+        self.assertEqual(sections_range[0]['Text'], sections[-1]['Text'])
+        self.assertEqual(sections_range[0]['OperationalPageNumber'], 2)
+        self.assertEqual(report, {'ProcessedPages': [2], 'SamplePages': [1]})
+
+        with self.assertRaises(ValueError):
+            pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', page_range = (3, None))
+
+    def test_get_range_and_sample_page_numbers(self):
+
+        self.assertEqual(get_range_page_numbers(5), [0, 1, 2, 3, 4])
+        self.assertEqual(get_range_page_numbers(5, (2, 3)), [1, 2])
+        self.assertEqual(get_range_page_numbers(5, (4, 10)), [3, 4])
+        self.assertEqual(get_sample_page_numbers(9, 3), [0, 4, 8])
+        self.assertEqual(get_sample_page_numbers(9, 3, excluded = [4, 5]), [0, 8])
+        self.assertEqual(get_sample_page_numbers(2, 10), [0, 1])
+
+    def test_get_fast_lines_details(self):
+
+        lines = [[('-', 'F1', 10.004, 0), ('A', 'F1', 10.004, 0), (' ', None, None, None), ('b', 'F1', 10.004, 0), ('C', 'F2', 12, 0)],
+                 [('d', 'F2', 12, 0), ('.', 'F3', 8, 0)]]
+
+        styles = StyleTable()
+        line_details_test = styles.resolve(get_fast_lines_details(lines, styles))
+
+        # Chars before the first letter are skipped and chars that are not letters or numbers take style of previous char
+        line_details = pd.DataFrame()
+        line_details['ElementText'] = ['A b', 'C', 'd.']
+        line_details['FontName'] = ['F1', 'F2', 'F2']
+        line_details['FontSize'] = [10.0, 12.0, 12.0]
+        line_details['FontSColor'] = ['0', '0', '0']
+
+        self.assertEqual(line_details_test, line_details)
+
+    def test_style_table(self):
+
+        styles = StyleTable()
+        style_ids = styles.intern_columns(['F1', 'F2', 'F1'], [10, 12.0, 10.0], ['0', '0', '0'])
+
+        # The same style always gets the same id
+        self.assertEqual(list(style_ids), [0, 1, 0])
+        self.assertEqual(list(styles.get('FontName', [1, 0])), ['F2', 'F1'])
+
+        # Ids of other table are translated, new styles get next ids
+        self.assertEqual(list(styles.merge([('F3', 8.0, '0'), ('F1', 10.0, '0')])), [2, 0])
+        self.assertEqual(len(styles), 3)
+
+    def test_table_to_structured_json(self):
+
+        grouped_structure = pd.DataFrame()
+        grouped_structure['ElementText'] = ['Chapter', 'Part', 'a', 'Section', 'b', 'Chapter 2', 'c', 'End']
+        grouped_structure['FontSize'] = [20, 16, 10, 14, 10, 20, 10, 20]
+        grouped_structure['Structure'] = ['Header', 'Header', 'Text', 'Header', 'Text', 'Header', 'Text', 'Header']
+        grouped_structure['OperationalPageNumber'] = [1, 1, 1, 2, 2, 3, 3, 4]
+        grouped_structure['PageNumber'] = ['', '', '', '', '', '', '', '']
+        grouped_structure['Header'] = ''
+        grouped_structure['Footer'] = ''
+
+        list_of_pargraphs = table_to_structured_json(grouped_structure, 'doc')
+
+        self.assertEqual([paragraph['Title'] for paragraph in list_of_pargraphs],
+                         ['Chapter -> Part', 'Chapter -> Part -> Section', 'Chapter 2'])
+        self.assertEqual(list_of_pargraphs[0], {'FileName': 'doc', 'Title': 'Chapter -> Part', 'Text': 'a', 'OperationalPageNumber': 1})
+
+        # The same titles in form of tree
+        document_tree = table_to_structured_json(grouped_structure, 'doc', nested = True)
+
+        self.assertEqual(document_tree['FileName'], 'doc')
+        self.assertEqual([section['Title'] for section in document_tree['Sections']], ['Chapter', 'Chapter 2', 'End'])
+        part = document_tree['Sections'][0]['Sections'][0]
+        self.assertEqual((part['Title'], part['Text']), ('Part', 'a'))
+        self.assertEqual([section['Title'] for section in part['Sections']], ['Section'])
+        self.assertEqual(document_tree['Sections'][1]['Text'], 'c')
+
 if __name__ == '__main__':
 
     unittest.main()
\ No newline at end of file
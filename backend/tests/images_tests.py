@@ -0,0 +1,45 @@
+import unittest
+import tempfile
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.functions import pdf_to_structured_json
+from app.extracting_images import ImageExtractor, extract_images_from_pdf
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+
+class Testing(unittest.TestCase):
+
+    def test_images_extracted_with_text(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            images = ImageExtractor(directory)
+            sections = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', images = images)
+            extracted = images.close()
+
+            # Text is the same as without images
+            self.assertEqual(sections, pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf'))
+            self.assertEqual(len(extracted), 1)
+            self.assertEqual(extracted[0]['Pages'], [1])
+            self.assertEqual(os.listdir(directory), [f"{extracted[0]['ImageId']}.png"])
+
+            # The same images are found in the same files without collecting text
+            self.assertEqual(extract_images_from_pdf(os.path.join(INPUT_PATH, 'Factsheet Leben Risiko.pdf'), directory), extracted)
+
+    def test_fast_extraction_finds_the_same_images(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            images = ImageExtractor(directory)
+            pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', fast = True, images = images)
+            fast_images = images.close()
+
+            images = ImageExtractor(directory)
+            pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', images = images)
+            self.assertEqual(fast_images, images.close())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import unittest
+import tempfile
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.functions import pdf_to_structured_json
+from app.jobs import JobQueue, QueueFullError
+from app.profiling import ConversionMetrics
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+WARM_UP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app', 'warm_up.pdf')
+
+class Testing(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = ConversionMetrics()
+        self.job_queue = JobQueue(max_workers = 1, max_queued = 0, metrics = self.metrics)
+        self.addCleanup(self.job_queue.shutdown)
+
+    def test_job_queue_converts_pdf(self):
+
+        done_jobs = []
+        job = self.job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf', on_done = done_jobs.append)
+        job.wait()
+
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.pages_processed, 2)
+        self.assertEqual(job.result, pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf'))
+        self.assertEqual(done_jobs, [job])
+        self.assertIs(self.job_queue.get(job.id), job)
+
+    def test_job_queue_profiles_job(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            job = self.job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf', profile_directory = directory)
+            job.wait()
+
+            # Statistics of cProfile are saved and stages are added to metrics
+            self.assertEqual(job.to_dict()['ProfileFile'], os.path.join(directory, f'{job.id}.prof'))
+            self.assertTrue(os.path.exists(job.report['ProfileFile']))
+            self.assertEqual(job.to_dict()['Stages']['Extraction']['Pages'], 2)
+            self.assertEqual(self.metrics.conversions, {'done': 1, 'failed': 0})
+
+    def test_job_queue_streams_sections_to_file(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            stream_file = os.path.join(directory, 'sections.ndjson')
+            job = self.job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf', stream_file = stream_file)
+            job.wait()
+
+            # Sections are written as lines of file instead of being returned
+            self.assertIsNone(job.result)
+            self.assertEqual(job.report['StreamFile'], stream_file)
+            with open(stream_file) as f:
+                self.assertEqual([json.loads(line) for line in f], pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf'))
+
+            # Part file of job is renamed to stream file when it is complete
+            self.assertEqual(os.listdir(directory), ['sections.ndjson'])
+
+    def test_job_queue_converts_preview(self):
+
+        job = self.job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf', options = {'max_sections': 1})
+        job.wait()
+
+        # Only pages needed for the first section are processed
+        self.assertEqual(job.result, pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf')[:1])
+        self.assertEqual(job.to_dict()['ProcessedPages'], [1])
+
+    def test_job_queue_admits_jobs_within_memory_budget(self):
+
+        job_queue = JobQueue(max_workers = 2, max_queued = 2, memory_budget = 1)
+        self.addCleanup(job_queue.shutdown)
+
+        # Estimate of every job is over budget, so jobs run one by one
+        jobs = [job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf') for _ in range(2)]
+
+        # Job is admitted when its pages are counted in worker process
+        while job_queue.memory()['RunningJobs'] == 0:
+            time.sleep(0.01)
+        self.assertEqual(jobs[0].page_count, 2)
+        self.assertGreater(jobs[0].memory_estimate, 1)
+        self.assertEqual(job_queue.memory()['RunningJobs'], 1)
+        self.assertEqual(job_queue.memory()['WaitingJobs'], 1)
+
+        for job in jobs:
+            job.wait()
+            self.assertEqual(job.status, 'done')
+            self.assertGreater(job.report['PeakMemory'], 0)
+        self.assertEqual(job_queue.memory()['RunningJobs'], 0)
+
+    def test_job_queue_counts_pages_in_worker_process(self):
+
+        # Pages of jobs are counted for memory budget without importing pdfminer in process of job queue
+        script = ('import sys\n'
+                  'from app.jobs import JobQueue\n'
+                  'job_queue = JobQueue(max_workers = 1, max_queued = 1, memory_budget = 1)\n'
+                  f'job = job_queue.submit({INPUT_PATH!r}, "Factsheet Leben Risiko.pdf")\n'
+                  'job.wait()\n'
+                  'job_queue.shutdown()\n'
+                  'print(job.status, job.page_count, "pdfminer" in sys.modules)\n')
+        output = subprocess.run([sys.executable, '-c', script], cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                capture_output = True, text = True, check = True).stdout
+
+        self.assertEqual(output.split(), ['done', '2', 'False'])
+
+    def test_job_queue_adds_finished_job_with_pages(self):
+
+        with open(os.path.join(INPUT_PATH, '..', 'output', 'Factsheet Leben Risiko.json')) as f:
+            result = json.load(f)
+
+        # Pages of result taken from cache are counted from its sections
+        job = self.job_queue.add_finished('Factsheet Leben Risiko.pdf', result)
+        self.assertEqual(job.to_dict()['PageCount'], 2)
+        self.assertEqual(job.to_dict()['PagesProcessed'], 2)
+        self.assertTrue(job.wait(0))
+
+    def test_job_queue_rejects_jobs_over_queue_depth(self):
+
+        job = self.job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+        with self.assertRaises(QueueFullError):
+            self.job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+        job.wait()
+
+    def test_job_queue_warms_up_workers(self):
+
+        job_queue = JobQueue(max_workers = 2, max_queued = 0, metrics = self.metrics, warm_up_file = WARM_UP_FILE)
+        self.addCleanup(job_queue.shutdown)
+
+        # Every worker reports imports and conversion of warm-up file before queue is ready
+        self.assertTrue(job_queue.wait_ready(timeout = 120))
+        self.assertEqual(len(job_queue.workers), 2)
+        for worker in job_queue.workers.values():
+            self.assertIsNone(worker['Error'])
+            self.assertEqual(list(worker['Phases']), ['Imports', 'WarmUp'])
+        self.assertEqual(set(self.metrics.startup), {'WorkerImports', 'WorkerWarmUp', 'WorkersReady'})
+
+        job = job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+        job.wait()
+        self.assertEqual(job.status, 'done')
+
+    def test_job_queue_reports_failed_job(self):
+
+        job = self.job_queue.submit(INPUT_PATH, 'missing.pdf')
+        job.wait()
+
+        self.assertEqual(self.job_queue.get(job.id).status, 'failed')
+        self.assertIn('missing.pdf', job.error)
+
+    def test_job_queue_recovers_from_killed_worker(self):
+
+        job = self.job_queue.submit(INPUT_PATH, 'Insurance_Handbook.pdf')
+        deadline = time.time() + 60
+        while job.status != 'running' and time.time() < deadline:
+            time.sleep(0.05)
+
+        # Worker process is killed as by lack of memory, its job fails and pool of workers is replaced
+        for pid in list(self.job_queue._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        self.assertTrue(job.wait(timeout = 60))
+        self.assertEqual(job.status, 'failed')
+
+        next_job = self.job_queue.submit(INPUT_PATH, 'Factsheet Leben Risiko.pdf')
+        self.assertTrue(next_job.wait(timeout = 60))
+        self.assertEqual(next_job.status, 'done')
+        self.assertEqual(next_job.result, pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf'))
+
+    def test_job_queue_shutdown_finishes_cancelled_jobs(self):
+
+        job_queue = JobQueue(max_workers = 1, max_queued = 4)
+        finished = []
+        jobs = [job_queue.submit(INPUT_PATH, 'Insurance_Handbook.pdf', on_finished = finished.append) for _ in range(4)]
+        job_queue.shutdown()
+
+        # Jobs that did not start are failed as cancelled, every job is finished
+        for job in jobs:
+            self.assertTrue(job.wait(timeout = 60))
+        self.assertIn('Job was cancelled', [job.error for job in jobs])
+        self.assertEqual({job.status for job in jobs if job.error == 'Job was cancelled'}, {'failed'})
+        self.assertCountEqual(finished, jobs)
+
+if __name__ == '__main__':
+
+    unittest.main()
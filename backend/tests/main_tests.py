@@ -0,0 +1,70 @@
+import unittest
+import uuid
+import json
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from benchmarks.load_test import start_server, stop_server, _free_port, INPUT_PATH, ROOT_PATH
+
+OUTPUT_PATH = os.path.join(ROOT_PATH, 'data', 'output')
+
+class Testing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.port = _free_port()
+        cls.server = start_server(cls.port, workers = 1, warm_up = False)
+
+    @classmethod
+    def tearDownClass(cls):
+        stop_server(cls.server)
+
+    def test_result_of_streamed_job(self):
+
+        with open(os.path.join(OUTPUT_PATH, 'Factsheet Leben Risiko.json')) as f:
+            expected = json.load(f)
+
+        # File with unique content is not in cache of converted documents, so it is converted by job
+        with open(os.path.join(INPUT_PATH, 'Factsheet Leben Risiko.pdf'), 'rb') as f:
+            data = f.read() + f'\n% {uuid.uuid4().hex}\n'.encode()
+        output_file = os.path.join(OUTPUT_PATH, 'Stream result test.ndjson')
+        self.addCleanup(lambda: os.path.exists(output_file) and os.remove(output_file))
+
+        with httpx.Client(base_url = f'http://127.0.0.1:{self.port}', timeout = 120) as client:
+            with client.stream('POST', '/stream', files = {'pdf_name': ('Stream result test.pdf', data, 'application/pdf')}) as response:
+                self.assertEqual(response.status_code, 200)
+                job_id = response.headers['X-Job-Id']
+                streamed = [json.loads(line) for line in response.iter_lines() if line]
+
+            # Result is read after workspace of request was removed
+            response = client.get(f'/jobs/{job_id}/result')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([json.loads(line) for line in response.text.splitlines()], streamed)
+
+        self.assertEqual(streamed, [{**paragraph, 'FileName': 'Stream result test'} for paragraph in expected])
+
+    def test_client_directories_are_not_used_in_output_paths(self):
+
+        with open(os.path.join(INPUT_PATH, 'Factsheet Leben Risiko.pdf'), 'rb') as f:
+            data = f.read()
+        output_file = os.path.join(OUTPUT_PATH, 'Path test.ndjson')
+        outside_file = os.path.join(ROOT_PATH, 'Path test.ndjson')
+        for path in [output_file, outside_file]:
+            self.addCleanup(lambda path = path: os.path.exists(path) and os.remove(path))
+
+        with httpx.Client(base_url = f'http://127.0.0.1:{self.port}', timeout = 120) as client:
+            response = client.post('/stream', files = {'pdf_name': ('../../Path test.pdf', data, 'application/pdf')})
+            self.assertEqual(response.status_code, 200)
+
+        # Output file is written to output directory under name of uploaded file
+        self.assertTrue(os.path.exists(output_file))
+        self.assertFalse(os.path.exists(outside_file))
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.pipeline import save_tables, load_tables, run_pipeline, run_directory, STAGES
+from app.functions import pdf_to_structured_json
+
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+PDF_NAME = 'Factsheet Leben Risiko.pdf'
+
+class Testing(unittest.TestCase):
+
+    def test_tables_round_trip(self):
+
+        table = pd.DataFrame({'ElementText': ['Überschrift', '', 'Text 😀'],
+                              'StyleId': np.array([0, 1, 0], dtype = np.int32),
+                              'PageNumber': pd.Series([1, np.nan, '3'], dtype = object),
+                              'FontSize': [10.5, 12.0, np.nan],
+                              'Bold': [True, False, True]})
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tables.npz')
+            save_tables(path, {'Pages': table, 'Empty': table.iloc[0:0]})
+            tables = load_tables(path)
+
+        # Values, types of values and dtypes of columns are kept
+        pd.testing.assert_frame_equal(tables['Pages'], table)
+        self.assertEqual([type(value) for value in tables['Pages']['PageNumber']], [int, float, str])
+        self.assertEqual(tables['Empty'].shape, (0, 5))
+        self.assertEqual(list(tables['Empty'].columns), list(table.columns))
+
+    def test_restart_from_every_stage(self):
+
+        list_of_pargraphs = pdf_to_structured_json(INPUT_PATH, PDF_NAME)
+
+        with tempfile.TemporaryDirectory() as directory:
+            report = {}
+            self.assertEqual(run_pipeline(INPUT_PATH, PDF_NAME, directory, report = report), list_of_pargraphs)
+            self.assertEqual(report, {'Resumed': None, 'Stages': list(STAGES)})
+
+            # Every stage gives the same result from checkpoint of previous stage
+            for stage in STAGES[1:]:
+                report = {}
+                self.assertEqual(run_pipeline(INPUT_PATH, PDF_NAME, directory, start_stage = stage, report = report), list_of_pargraphs)
+                self.assertEqual(report['Resumed'], STAGES[STAGES.index(stage) - 1])
+
+            # By default conversion continues after the last saved stage
+            report = {}
+            run_pipeline(INPUT_PATH, PDF_NAME, directory, report = report)
+            self.assertEqual(report['Stages'], ['StructuredJson'])
+
+    def test_checkpoints_of_changed_file_are_not_used(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_dir, checkpoint_dir = os.path.join(directory, 'input'), os.path.join(directory, 'checkpoints')
+            os.makedirs(input_dir)
+            shutil.copy(os.path.join(INPUT_PATH, PDF_NAME), input_dir)
+            run_pipeline(input_dir, PDF_NAME, checkpoint_dir, stop_stage = 'Structure')
+
+            # Missing checkpoint
+            with self.assertRaises(FileNotFoundError):
+                run_pipeline(input_dir, PDF_NAME, checkpoint_dir, start_stage = 'StructuredJson')
+
+            # Checkpoints are used without pdf file, but not after pdf file changes
+            pdf_file = os.path.join(input_dir, PDF_NAME)
+            os.rename(pdf_file, f'{pdf_file}.moved')
+            self.assertEqual(len(run_pipeline(input_dir, PDF_NAME, checkpoint_dir, start_stage = 'GroupStructure', save = False)), 4)
+            os.rename(f'{pdf_file}.moved', pdf_file)
+            os.utime(pdf_file, (0, 0))
+            with self.assertRaises(FileNotFoundError):
+                run_pipeline(input_dir, PDF_NAME, checkpoint_dir, start_stage = 'GroupStructure')
+
+            report = {}
+            run_pipeline(input_dir, PDF_NAME, checkpoint_dir, report = report)
+            self.assertEqual(report['Resumed'], None)
+
+    def test_run_directory_from_checkpoints(self):
+
+        list_of_pargraphs = pdf_to_structured_json(INPUT_PATH, PDF_NAME)
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_dir, checkpoint_dir, output_dir = (os.path.join(directory, name) for name in ['input', 'checkpoints', 'output'])
+            os.makedirs(input_dir)
+            shutil.copy(os.path.join(INPUT_PATH, PDF_NAME), input_dir)
+
+            # Nothing is saved to output directory before the last stage
+            report = run_directory(input_dir, checkpoint_dir, output_dir, stop_stage = 'Structure', max_workers = 1)
+            self.assertEqual((report['Documents'], report['Failed']), (1, 0))
+            self.assertFalse(os.path.exists(os.path.join(output_dir, 'Factsheet Leben Risiko.json')))
+
+            # Document is finished from its checkpoints after its pdf file was removed
+            os.remove(os.path.join(input_dir, PDF_NAME))
+            report = run_directory(input_dir, checkpoint_dir, output_dir, start_stage = 'GroupStructure', max_workers = 1)
+            self.assertEqual((report['Documents'], report['Failed']), (1, 0))
+            with open(os.path.join(output_dir, 'Factsheet Leben Risiko.json')) as f:
+                self.assertEqual(json.load(f), list_of_pargraphs)
+
+if __name__ == '__main__':
+
+    unittest.main()
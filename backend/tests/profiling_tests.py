@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.functions import pdf_to_structured_json
+from app.profiling import StageProfiler, ConversionMetrics
+
+# Directory with sample pdf files
+INPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'input')
+
+class Testing(unittest.TestCase):
+
+    def test_stage_profiler_records_every_stage(self):
+
+        profiler = StageProfiler(trace_memory = True)
+        sections = pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf', profiler = profiler)
+
+        self.assertEqual(sections, pdf_to_structured_json(INPUT_PATH, 'Factsheet Leben Risiko.pdf'))
+        self.assertEqual(list(profiler.stages), ['Extraction', 'GroupLinesIntoPage', 'StyleIndex', 'FooterAndHeader',
+                                                 'Structure', 'GroupStructure', 'StructuredJson'])
+        self.assertEqual(profiler.stages['Extraction']['Pages'], 2)
+        self.assertGreater(profiler.stages['Extraction']['Characters'], 0)
+        self.assertEqual(profiler.stages['StructuredJson']['Sections'], len(sections))
+        for stage in profiler.stages.values():
+            self.assertGreaterEqual(stage['Seconds'], 0)
+            self.assertGreater(stage['PeakMemory'], 0)
+
+    def test_conversion_metrics_render(self):
+
+        metrics = ConversionMetrics()
+        metrics.observe({'Extraction': {'Seconds': 0.2, 'PeakMemory': 2 ** 21, 'Pages': 3}})
+        metrics.observe({'Extraction': {'Seconds': 20, 'Pages': 2}}, memory = 2 ** 23)
+        metrics.observe_failure()
+        metrics.observe_admission({'MemoryBudget': 2 ** 30, 'RunningJobs': 1})
+
+        lines = metrics.render().splitlines()
+
+        self.assertIn('pdf_conversions_total{status="done"} 2', lines)
+        self.assertIn('pdf_conversions_total{status="failed"} 1', lines)
+        # Buckets are cumulative
+        self.assertIn('pdf_conversion_stage_seconds_bucket{stage="Extraction",le="0.5"} 1', lines)
+        self.assertIn('pdf_conversion_stage_seconds_bucket{stage="Extraction",le="30"} 2', lines)
+        self.assertIn('pdf_conversion_stage_seconds_count{stage="Extraction"} 2', lines)
+        self.assertIn('pdf_conversion_stage_peak_memory_bytes_count{stage="Extraction"} 1', lines)
+        self.assertIn('pdf_conversion_stage_items_total{stage="Extraction",item="Pages"} 5', lines)
+        # Memory of whole conversion and state of admission
+        self.assertIn('pdf_conversion_stage_peak_memory_bytes_bucket{stage="Conversion",le="16777216"} 1', lines)
+        self.assertIn('pdf_admission_state{value="MemoryBudget"} 1073741824', lines)
+
+if __name__ == '__main__':
+
+    unittest.main()
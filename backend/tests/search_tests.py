@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.search import SearchIndex, index_directory
+
+SECTIONS = [{'FileName': 'Handbook', 'Title': 'Auto Insurance Basics', 'Text': 'Liability coverage pays for injuries.', 'OperationalPageNumber': '10, 11'},
+            {'FileName': 'Handbook', 'Title': 'Auto Insurance Basics -> Collision', 'Text': 'Collision coverage pays for damage to the car.', 'OperationalPageNumber': 12},
+            {'FileName': 'Handbook', 'Title': 'Homeowners Insurance', 'Text': 'Damage from fire is covered.', 'OperationalPageNumber': 13, 'Footer': 'Handbook'}]
+
+class Testing(unittest.TestCase):
+
+    def setUp(self):
+        self.search_index = SearchIndex(':memory:')
+        self.addCleanup(self.search_index.close)
+
+    def test_search_returns_sections(self):
+
+        self.assertTrue(self.search_index.update('Handbook', SECTIONS))
+
+        # Every word has to match, the whole section is returned
+        results = self.search_index.search('collision')
+        self.assertEqual([result['Position'] for result in results], [1])
+        self.assertEqual({k: v for k, v in results[0].items() if k not in ('Position', 'Score')}, SECTIONS[1])
+        self.assertEqual({result['Title'] for result in self.search_index.search('damage')},
+                         {'Auto Insurance Basics -> Collision', 'Homeowners Insurance'})
+        self.assertEqual(self.search_index.search('damage fire')[0]['Footer'], 'Handbook')
+
+        # Page numbers, prefixes and characters of query syntax
+        self.assertEqual([result['Position'] for result in self.search_index.search('12')], [1])
+        self.assertEqual(len(self.search_index.search('insur*', limit = 2)), 2)
+        self.assertEqual(self.search_index.search('"fire" AND ('), [])
+        self.assertEqual(self.search_index.search('  '), [])
+
+    def test_search_by_printed_page_number(self):
+
+        sections = [{**SECTIONS[0], 'PageNumber': ', 1'}, {**SECTIONS[1], 'PageNumber': 2}, {**SECTIONS[2], 'PageNumber': 13}]
+        self.search_index.update('Handbook', sections)
+
+        # Printed and operational page numbers are both searched, page without printed number is skipped
+        self.assertEqual([result['Position'] for result in self.search_index.search('2')], [1])
+        self.assertEqual([result['Position'] for result in self.search_index.search('11')], [0])
+        self.assertEqual([result['Position'] for result in self.search_index.search('13')], [2])
+        self.assertEqual(self.search_index.search('None'), [])
+
+    def test_index_of_older_version_is_built_again(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.sqlite')
+            search_index = SearchIndex(path)
+            search_index.update('Handbook', SECTIONS, key = 'a')
+            search_index._connection.execute('PRAGMA user_version = 1')
+            search_index.close()
+
+            search_index = SearchIndex(path)
+            self.addCleanup(search_index.close)
+            self.assertEqual(search_index.keys(), {})
+            self.assertTrue(search_index.update('Handbook', SECTIONS, key = 'a'))
+
+    def test_update_replaces_sections_of_document(self):
+
+        self.search_index.update('Handbook', SECTIONS, key = 'a')
+        self.search_index.update('Other', SECTIONS[:1], key = 'b')
+
+        # Unchanged document is not indexed again, changed document replaces its sections (they can be generated one by one)
+        self.assertFalse(self.search_index.update('Handbook', SECTIONS, key = 'a'))
+        self.assertTrue(self.search_index.update('Handbook', (section for section in SECTIONS[2:]), key = 'c'))
+        self.assertEqual(self.search_index.search('collision'), [])
+        self.assertEqual(len(self.search_index.search('liability')), 1)
+        self.assertEqual(len(self.search_index.search('liability', pdf_name = 'Handbook')), 0)
+        self.assertEqual([(d['FileName'], d['Sections']) for d in self.search_index.documents()], [('Handbook', 1), ('Other', 1)])
+
+        self.search_index.remove('Other')
+        self.assertEqual(self.search_index.search('liability'), [])
+
+    def test_index_directory(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'Handbook.json'), 'w') as f:
+                json.dump(SECTIONS, f)
+            with open(os.path.join(directory, 'broken.json'), 'w') as f:
+                f.write('{')
+
+            self.assertEqual(index_directory(self.search_index, directory), {'Indexed': 1, 'Unchanged': 0, 'Failed': 1})
+            self.assertEqual(index_directory(self.search_index, directory), {'Indexed': 0, 'Unchanged': 1, 'Failed': 1})
+            self.assertEqual(len(self.search_index.search('coverage')), 2)
+
+if __name__ == '__main__':
+
+    unittest.main()
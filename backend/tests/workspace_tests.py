@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+import os
+import sys
+
+sys.path.append(os.path.dirname(sys.path[0]))
+
+# Importing functions
+from app.workspace import Workspace, remove_stale_workspaces, atomic_write
+
+class Testing(unittest.TestCase):
+
+    def test_workspaces_are_isolated(self):
+
+        with tempfile.TemporaryDirectory() as root:
+            first, second = Workspace(root), Workspace(root)
+
+            # Files with the same name are kept apart, name cannot point outside of workspace
+            self.assertNotEqual(first.path('doc.pdf'), second.path('doc.pdf'))
+            self.assertEqual(os.path.dirname(first.path('../doc.pdf')), first.directory)
+
+            first.cleanup()
+            self.assertFalse(os.path.exists(first.directory))
+            self.assertTrue(os.path.exists(second.directory))
+
+    def test_workspace_is_removed_by_last_user(self):
+
+        with tempfile.TemporaryDirectory() as root:
+            workspace = Workspace(root, users = 2)
+
+            workspace.release()
+            self.assertTrue(os.path.exists(workspace.directory))
+            workspace.release()
+            self.assertFalse(os.path.exists(workspace.directory))
+
+    def test_remove_stale_workspaces(self):
+
+        with tempfile.TemporaryDirectory() as root:
+            stale, fresh = Workspace(root), Workspace(root)
+            os.utime(stale.directory, (0, 0))
+
+            self.assertEqual(remove_stale_workspaces(root), 1)
+            self.assertEqual(os.listdir(root), [os.path.basename(fresh.directory)])
+
+    def test_atomic_write(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.json')
+            with atomic_write(path) as f:
+                f.write('[]')
+
+            # Failed writing keeps previous file and leaves no temporary file
+            with self.assertRaises(ValueError):
+                with atomic_write(path) as f:
+                    f.write('[1')
+                    raise ValueError('conversion failed')
+
+            with open(path) as f:
+                self.assertEqual(f.read(), '[]')
+            self.assertEqual(os.listdir(directory), ['out.json'])
+
+if __name__ == '__main__':
+
+    unittest.main()